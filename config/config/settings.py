@@ -161,3 +161,5 @@ SIMPLE_JWT = {
 ALLOWED_NOTIFICATION_DATA = False
 # Settings for defined user serializer
 NOTIFICATION_USER_SERIALIZER = 'notifications.serializers.CustomUserSerializer'
+# Seconds to merge websocket pushes across transactions, 0 pushes right after commit
+NOTIFICATION_PUSH_DEBOUNCE = 0
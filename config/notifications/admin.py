@@ -1,19 +1,68 @@
 from django.contrib import admin
 
-from notifications.models import Notification, NotificationSettings
+from notifications.models import (
+    Notification,
+    ArchivedNotification,
+    NotificationSettings,
+    NotificationCounter,
+    NotificationMessage,
+    BroadcastNotification,
+    BroadcastNotificationState,
+)
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     list_display = ("user", "is_read", "created_at", "updated_at")
     list_filter = ("user", "is_read", "status", "created_at", "updated_at")
-    search_fields = ("user__username", "notification")
+    search_fields = ("user__username", "notification", "message__notification")
+    raw_id_fields = ("message",)
     readonly_fields = ("uid", "created_at", "updated_at")
 
 
+@admin.register(ArchivedNotification)
+class ArchivedNotificationAdmin(admin.ModelAdmin):
+    list_display = ("user", "status", "is_read", "created_at", "archived_at")
+    list_filter = ("status", "is_read", "archived_at")
+    search_fields = ("user__username",)
+    raw_id_fields = ("user", "message", "created_by")
+    readonly_fields = ("id", "uid", "archived_at")
+
+
+@admin.register(NotificationMessage)
+class NotificationMessageAdmin(admin.ModelAdmin):
+    list_display = ("uid", "payload_hash", "created_at")
+    search_fields = ("notification", "payload_hash")
+    readonly_fields = ("uid", "payload_hash", "created_at", "updated_at")
+
+
 @admin.register(NotificationSettings)
 class NotificationSettingsAdmin(admin.ModelAdmin):
     list_display = ("user", "is_enable_notification")
     list_filter = ("user", "is_enable_notification")
     search_fields = ("user__username",)
     readonly_fields = ("uid", "created_at", "updated_at")
+
+
+@admin.register(NotificationCounter)
+class NotificationCounterAdmin(admin.ModelAdmin):
+    list_display = ("user", "total_notifications", "unread_notifications")
+    search_fields = ("user__username",)
+    readonly_fields = ("uid", "created_at", "updated_at")
+
+
+@admin.register(BroadcastNotification)
+class BroadcastNotificationAdmin(admin.ModelAdmin):
+    list_display = ("message", "status", "created_at")
+    list_filter = ("status", "created_at")
+    raw_id_fields = ("message",)
+    readonly_fields = ("uid", "position", "created_at", "updated_at")
+
+
+@admin.register(BroadcastNotificationState)
+class BroadcastNotificationStateAdmin(admin.ModelAdmin):
+    list_display = ("user", "broadcast", "is_read", "status")
+    list_filter = ("is_read", "status")
+    search_fields = ("user__username",)
+    raw_id_fields = ("broadcast",)
+    readonly_fields = ("uid", "created_at", "updated_at")
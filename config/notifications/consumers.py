@@ -1,20 +1,74 @@
 import json
 import logging
+import time
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 
+from notifications.choices import NotificationsActionChoices
+from notifications.dispatchers import notification_dispatcher
+from notifications.models import NOTIFICATION_BROADCASTS
+from notifications.serializers import UserNotificationListWithCountSerializer
 from notifications.utils import (
-    get_user_serialized_notifications,
+    aget_user_serialized_notifications,
+    aget_user_notification_page,
     get_user,
+    NotificationPrincipal,
     get_group_name,
+    get_broadcast_group_name,
+    get_user_notification_seq_key,
 )
 
-from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncWebsocketConsumer
 
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
+# Run the consumer on the token claims instead of loading the user on connect
+NOTIFICATION_WS_STATELESS_AUTH = getattr(
+    settings, "NOTIFICATION_WS_STATELESS_AUTH", False
+)
+# Commands per second and burst size of a websocket connection, 0 disables the limit
+NOTIFICATION_WS_COMMAND_RATE = getattr(settings, "NOTIFICATION_WS_COMMAND_RATE", 5)
+NOTIFICATION_WS_COMMAND_BURST = getattr(settings, "NOTIFICATION_WS_COMMAND_BURST", 20)
+
+
+# Websocket commands applied as notification list actions
+NOTIFICATION_COMMAND_ACTIONS = {
+    "mark_read": NotificationsActionChoices.MARK_AS_READ,
+    "mark_all_read": NotificationsActionChoices.MARK_ALL_AS_READ,
+    "remove": NotificationsActionChoices.MARK_AS_REMOVED,
+}
+
+
+class TokenBucket:
+    """
+    Token bucket limiting the commands of one websocket connection to
+    ``rate`` per second with bursts of up to ``burst`` commands.
+    """
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+
+    def consume(self):
+        """Take a token, return False when the bucket is empty"""
+        if not self.rate:
+            return True
+
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+        return True
 
 
 class NotificationConsumer(AsyncWebsocketConsumer):
@@ -22,6 +76,9 @@ class NotificationConsumer(AsyncWebsocketConsumer):
     async def connect(self):
         # Accept connection
         await self.accept()
+        self.rate_limiter = TokenBucket(
+            rate=NOTIFICATION_WS_COMMAND_RATE, burst=NOTIFICATION_WS_COMMAND_BURST
+        )
 
         if self.is_error_exists():
             error = {"error": str(self.scope["error"])}
@@ -32,8 +89,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
         # Get the user_id from the scope
         user_id = self.scope.get("user_id")
 
-        # Get the user instance
-        user = await get_user(user_id)
+        # Get the user instance, or a principal from the token claims
+        if NOTIFICATION_WS_STATELESS_AUTH:
+            user = NotificationPrincipal(self.scope["token_payload"])
+        else:
+            user = await get_user(user_id)
         if not user:
             user_error = {"error": "User not found"}
             await self.send(text_data=json.dumps(user_error))
@@ -49,25 +109,83 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             self.group_name,
             self.channel_name,
         )
+        if NOTIFICATION_BROADCASTS:
+            await self.channel_layer.group_add(
+                get_broadcast_group_name(),
+                self.channel_name,
+            )
 
         # Send the user's notifications
         await self.receive()
 
     async def receive(self, text_data=None):
-        user = self.scope.get("user")
+        user = self.get_user()
 
-        try:
-            # Get the user's notifications
-            notifications = await database_sync_to_async(get_user_serialized_notifications)(
-                user=user
-            )
-        except ValueError as e:
-            # Handle the error when user not enabled the notification settings
-            await self.send(text_data=json.dumps({"error": str(e)}))
+        # Send the snapshot on connect
+        if text_data is None:
+            await self.send_snapshot(user=user)
             return
 
+        if not self.rate_limiter.consume():
+            await self.send(text_data=json.dumps({"error": "Too many commands."}))
+            return
+
+        command = self.get_command(text_data)
+        name = command.get("command")
+
+        if name == "ping":
+            await self.send(text_data=json.dumps({"event": "pong"}))
+
+        # Resync after a gap in the event sequence numbers
+        elif name == "resync":
+            await self.send_snapshot(user=user)
+
+        # Page older notifications after the snapshot window
+        elif name == "fetch_page":
+            page = await aget_user_notification_page(
+                user=user,
+                cursor=command.get("cursor"),
+                page_size=command.get("page_size"),
+            )
+            await self.send(text_data=json.dumps(page))
+
+        elif name in NOTIFICATION_COMMAND_ACTIONS:
+            response = await self.apply_command_action(user=user, command=command)
+            await self.send(text_data=json.dumps(response))
+
+        else:
+            await self.send(text_data=json.dumps({"error": "Unknown command."}))
+
+    async def send_snapshot(self, user):
+        if notification_dispatcher.mode == "delta":
+            # Read the sequence number first, replayed events are idempotent
+            seq = await cache.aget(get_user_notification_seq_key(user_id=user.pk), 0)
+
+        # Get the user's notifications through the async ORM
+        notifications = await aget_user_serialized_notifications(user=user)
+
+        if notification_dispatcher.mode == "delta" and "error" not in notifications:
+            notifications = {"event": "snapshot", "seq": seq, **notifications}
+
         await self.send(text_data=json.dumps(notifications))
 
+    async def apply_command_action(self, user, command):
+        # Validate and apply the action the same way the HTTP list endpoint does
+        serializer = UserNotificationListWithCountSerializer(
+            data={
+                "action_choice": NOTIFICATION_COMMAND_ACTIONS[command["command"]],
+                "notification_uids": command.get("uids"),
+            }
+        )
+        if not serializer.is_valid():
+            return {"error": serializer.errors}
+
+        # The bulk update runs in a transaction, which needs the sync ORM
+        updated = await database_sync_to_async(serializer.apply_action)(
+            user=user, **serializer.validated_data
+        )
+        return {"event": "ack", "command": command["command"], "updated": updated}
+
     async def disconnect(self, close_code):
         # Remove user from the group
         if self.scope.get("user"):
@@ -75,6 +193,11 @@ class NotificationConsumer(AsyncWebsocketConsumer):
                 self.group_name,
                 self.channel_name,
             )
+            if NOTIFICATION_BROADCASTS:
+                await self.channel_layer.group_discard(
+                    get_broadcast_group_name(),
+                    self.channel_name,
+                )
             logger.warning(f"disconnected {close_code}")
 
         await self.close()
@@ -86,6 +209,37 @@ class NotificationConsumer(AsyncWebsocketConsumer):
             notifications = event["user_notifications"]
             await self.send(text_data=json.dumps(notifications))
 
+    async def notification_delta(self, event):
+        # Forward the user's notification change events in sequence order
+        user = self.scope.get("user")
+        if user:
+            for notification_event in event["events"]:
+                await self.send(text_data=json.dumps(notification_event))
+
+    async def notification_broadcast(self, event):
+        # A broadcast changed, send the user's merged inbox again
+        user = self.get_user()
+        if user:
+            await self.send_snapshot(user=user)
+
+    def get_user(self):
+        user = self.scope.get("user")
+
+        # The connection outlives a request, forget the memoized settings
+        if user is not None:
+            user.__dict__.pop("_is_enable_notification", None)
+
+        return user
+
+    @staticmethod
+    def get_command(text_data):
+        # Parse a JSON command message, anything else is an empty command
+        try:
+            command = json.loads(text_data) if text_data else {}
+        except ValueError:
+            return {}
+        return command if isinstance(command, dict) else {}
+
     def is_error_exists(self):
         # Checks if error exists during websockets
         return True if "error" in self.scope else False
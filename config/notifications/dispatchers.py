@@ -0,0 +1,300 @@
+import logging
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import close_old_connections, transaction
+from django.utils.module_loading import import_string
+
+from channels.layers import get_channel_layer
+
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+NOTIFICATION_PUSH_DEBOUNCE = getattr(settings, "NOTIFICATION_PUSH_DEBOUNCE", 0)
+# "snapshot" pushes the recomputed notifications, "delta" pushes change events
+NOTIFICATION_PUSH_MODE = getattr(settings, "NOTIFICATION_PUSH_MODE", "snapshot")
+# Dotted path of a push queue backend, None pushes on the committing thread
+NOTIFICATION_PUSH_QUEUE = getattr(settings, "NOTIFICATION_PUSH_QUEUE", None)
+NOTIFICATION_PUSH_QUEUE_OPTIONS = getattr(
+    settings, "NOTIFICATION_PUSH_QUEUE_OPTIONS", {}
+)
+
+
+class LocalPushQueue:
+    """
+    In-process push queue served by a background worker thread.
+
+    Jobs map user ids to their change events. Jobs of a user that is already
+    queued are merged into the waiting job, and the worker hands the users
+    to ``handler`` in batches of ``batch_size``.
+
+    The queue holds at most ``max_size`` jobs. When it is full new users are
+    dropped with the "drop" policy. With the "merge" policy they are folded,
+    without their events, into a single resync job that takes the place of
+    the newest job, so they receive a resync instead of the changes. The
+    resync job is handed to ``handler`` in batches of ``batch_size`` too.
+    """
+
+    # Key of the job holding the user ids folded by the "merge" policy
+    RESYNC_JOB = object()
+
+    def __init__(self, handler, max_size=10000, batch_size=100, policy="merge"):
+        if max_size < 1 or batch_size < 1:
+            raise ValueError(
+                "The push queue max_size and batch_size must be at least 1."
+            )
+
+        self.handler = handler
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.policy = policy
+        self.dropped = 0
+        self._jobs = OrderedDict()
+        self._in_flight = False
+        self._condition = threading.Condition()
+        self._worker = None
+
+    def put(self, pending_events):
+        """Queue the users and their events, merging with waiting jobs"""
+        with self._condition:
+            for user_id, events in pending_events.items():
+                if user_id in self._jobs:
+                    if self._jobs[user_id] is not None and events is not None:
+                        self._jobs[user_id].extend(events)
+                    else:
+                        self._jobs[user_id] = None
+                elif user_id in self._jobs.get(self.RESYNC_JOB, ()):
+                    # The resync covers the new events
+                    continue
+                elif len(self._jobs) < self.max_size:
+                    self._jobs[user_id] = None if events is None else list(events)
+                elif self.policy == "merge":
+                    self._fold(user_id)
+                else:
+                    self.dropped += 1
+                    logger.warning(f"Push queue is full, dropped user {user_id}")
+
+            self._condition.notify()
+
+        self._start()
+
+    def _fold(self, user_id):
+        """Fold the user into the resync job, making room with the newest job"""
+        if self.RESYNC_JOB not in self._jobs:
+            newest_user_id, _ = self._jobs.popitem(last=True)
+            self._jobs[self.RESYNC_JOB] = {newest_user_id}
+
+        self._jobs[self.RESYNC_JOB].add(user_id)
+
+    def join(self, timeout=None):
+        """Wait until every queued job is handled, return False on timeout"""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._jobs and not self._in_flight, timeout=timeout
+            )
+
+    def _start(self):
+        with self._condition:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, daemon=True)
+                self._worker.start()
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            try:
+                self.handler(batch)
+            except Exception as e:
+                logger.error(f"{e}")
+            finally:
+                close_old_connections()
+                with self._condition:
+                    self._in_flight = False
+                    self._condition.notify_all()
+
+    def _take_batch(self):
+        with self._condition:
+            self._condition.wait_for(lambda: self._jobs)
+            self._in_flight = True
+
+            batch = {}
+            while self._jobs and len(batch) < self.batch_size:
+                key, events = next(iter(self._jobs.items()))
+                if key is self.RESYNC_JOB:
+                    # Take the folded users a batch at a time, the rest wait
+                    while events and len(batch) < self.batch_size:
+                        batch[events.pop()] = None
+                    if events:
+                        break
+                else:
+                    batch[key] = events
+                del self._jobs[key]
+
+            return batch
+
+
+class TransactionEvents:
+    """
+    Change events of the users marked dirty at one savepoint of a transaction.
+
+    The instance is the on_commit callback that flushes the events, so rolling
+    back the savepoint discards the events along with the callback.
+    """
+
+    def __init__(self, dispatcher):
+        self.dispatcher = dispatcher
+        self.pending_events = {}
+        self.flushed = False
+
+    def __call__(self):
+        self.flushed = True
+        self.dispatcher.flush(self.pending_events)
+
+
+class NotificationDispatcher:
+    """
+    Coalesce websocket pushes of changed user notifications.
+
+    Users marked dirty during a transaction are collected with the on_commit
+    callback of their savepoint and flushed once the transaction commits, so
+    a burst of saves results in one recompute and one push per user, and a
+    rolled back savepoint pushes nothing. With a ``debounce`` window (seconds)
+    the flushed users are merged across transactions and pushed from a timer.
+
+    In ``delta`` mode the change events of each user are collected along with
+    the user and pushed instead of a full snapshot. With a ``queue`` backend
+    the pushes are handed to the queue instead of running on the committing
+    thread.
+    """
+
+    def __init__(
+        self, debounce=0, mode="snapshot", queue_class=None, queue_options=None
+    ):
+        self.debounce = debounce
+        self.mode = mode
+        self.queue = None
+        if queue_class is not None:
+            self.queue = queue_class(handler=self.push, **(queue_options or {}))
+        self._lock = threading.Lock()
+        self._debounced_events = {}
+        self._timer = None
+
+    def mark_dirty(self, user_ids, using=None, events=None):
+        """
+        Mark users whose notifications changed in the current transaction,
+        with their change ``events`` keyed by user id in delta mode.
+        """
+        if not isinstance(user_ids, (list, tuple, set, frozenset)):
+            user_ids = [user_ids]
+
+        transaction_events = self.get_transaction_events(using=using)
+        is_registered = transaction_events is not None
+        if not is_registered:
+            transaction_events = TransactionEvents(dispatcher=self)
+
+        self.merge_events(transaction_events.pending_events, user_ids, events)
+
+        # Outside a transaction the callback runs right away
+        if not is_registered:
+            transaction.on_commit(transaction_events, using=using)
+
+    def get_transaction_events(self, using=None):
+        """
+        Get the events waiting for the commit that were marked at the current
+        savepoint. Events of other savepoints are not shared, one of them may
+        be rolled back on its own.
+
+        Returns:
+            TransactionEvents: The waiting events, or None.
+        """
+        connection = transaction.get_connection(using)
+        savepoint_ids = set(connection.savepoint_ids)
+
+        for callback_savepoint_ids, callback, _ in reversed(connection.run_on_commit):
+            if (
+                isinstance(callback, TransactionEvents)
+                and callback.dispatcher is self
+                and not callback.flushed
+                and callback_savepoint_ids == savepoint_ids
+            ):
+                return callback
+
+        return None
+
+    def flush(self, pending_events):
+        """Push the pending users now, or hand them to the debounce window"""
+        if not pending_events:
+            return
+
+        if self.debounce:
+            self._schedule(pending_events)
+        else:
+            self.deliver(pending_events)
+
+    def deliver(self, pending_events):
+        """Hand the pending events to the queue, or push them right away"""
+        if self.queue is not None:
+            self.queue.put(pending_events)
+        else:
+            self.push(pending_events)
+
+    def push(self, pending_events):
+        """Recompute and send the notifications, or the events, of each user once"""
+        from notifications.utils import (
+            add_user_notification_to_group,
+            add_user_notification_events_to_group,
+        )
+
+        if not isinstance(pending_events, dict):
+            pending_events = {user_id: [] for user_id in pending_events}
+
+        channel_layer = get_channel_layer()
+        for user in User.objects.filter(id__in=list(pending_events)):
+            if self.mode == "delta":
+                add_user_notification_events_to_group(
+                    user=user,
+                    events=pending_events[user.id],
+                    channel_layer=channel_layer,
+                )
+            else:
+                add_user_notification_to_group(user=user, channel_layer=channel_layer)
+
+    @staticmethod
+    def merge_events(pending_events, user_ids, events=None):
+        """Merge the users and their events into the pending events"""
+        events = events or {}
+        for user_id in user_ids:
+            pending_events.setdefault(user_id, []).extend(events.get(user_id, []))
+
+    def _schedule(self, pending_events):
+        with self._lock:
+            self.merge_events(self._debounced_events, pending_events, pending_events)
+            if self._timer is None:
+                self._timer = threading.Timer(self.debounce, self._flush_debounced)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _flush_debounced(self):
+        with self._lock:
+            pending_events = self._debounced_events
+            self._debounced_events = {}
+            self._timer = None
+
+        try:
+            self.deliver(pending_events)
+        except Exception as e:
+            logger.error(f"{e}")
+        finally:
+            close_old_connections()
+
+
+notification_dispatcher = NotificationDispatcher(
+    debounce=NOTIFICATION_PUSH_DEBOUNCE,
+    mode=NOTIFICATION_PUSH_MODE,
+    queue_class=(
+        import_string(NOTIFICATION_PUSH_QUEUE) if NOTIFICATION_PUSH_QUEUE else None
+    ),
+    queue_options=NOTIFICATION_PUSH_QUEUE_OPTIONS,
+)
@@ -0,0 +1,254 @@
+"""Inbox of a user that merges broadcasts into the user's notifications"""
+
+import operator
+from bisect import bisect_left
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Count, Q
+
+# Lookups the broadcasts of the inbox are matched with in memory
+BROADCAST_LOOKUPS = {
+    "exact": operator.eq,
+    "in": lambda value, values: value in values,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gt": operator.gt,
+    "gte": operator.ge,
+}
+
+
+def get_inbox_key(notification):
+    """
+    Get the sort key of an inbox item, the inbox is ordered by descending key.
+
+    Notifications are ordered by id. A broadcast is placed right above the
+    last notification that existed when it was sent, which is its position.
+    """
+    broadcast = getattr(notification, "broadcast", None)
+    if broadcast is not None:
+        return (broadcast.position, 1, broadcast.id)
+    return (notification.pk, 0, 0)
+
+
+def get_inbox_cursor(notification):
+    """Get the cursor of the items after the given inbox item"""
+    broadcast = getattr(notification, "broadcast", None)
+    if broadcast is not None:
+        return f"{broadcast.position}:{broadcast.id}"
+    return str(notification.pk)
+
+
+def parse_inbox_cursor(cursor):
+    """
+    Parse a cursor into the inbox key it stands for.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    position, _, broadcast_id = str(cursor).partition(":")
+    if broadcast_id:
+        return (int(position), 1, int(broadcast_id))
+    return (int(position), 0, 0)
+
+
+def get_notifications_before(notifications, before):
+    """Filter notifications in inbox order to the ones after the ``before`` key"""
+    # Notifications come after a broadcast at the same position
+    if before[1]:
+        return notifications.filter(pk__lte=before[0])
+    return notifications.filter(pk__lt=before[0])
+
+
+def get_broadcast_matcher(model, field_lookup, value):
+    """
+    Get a function matching a broadcast of the inbox against a queryset
+    lookup of the notifications, such as ``uid__in`` or ``created_at__lt``.
+    A broadcast has no primary key, ``pk`` lookups only match notifications.
+
+    Raises:
+        TypeError: If the field or the lookup is not supported on broadcasts.
+    """
+    field_name, _, lookup = field_lookup.partition("__")
+    lookup = lookup or "exact"
+    if lookup not in [*BROADCAST_LOOKUPS, "isnull"]:
+        raise TypeError(
+            f"Unsupported lookup {field_lookup!r} for the inbox broadcasts, "
+            f"use one of {', '.join([*BROADCAST_LOOKUPS, 'isnull'])}."
+        )
+
+    try:
+        if field_name == "pk":
+            field = model._meta.pk
+        else:
+            field = model._meta.get_field(field_name)
+    except FieldDoesNotExist:
+        raise TypeError(f"Unsupported field {field_name!r} for the inbox broadcasts.")
+    if field.many_to_many or field.one_to_many:
+        raise TypeError(f"Unsupported field {field_name!r} for the inbox broadcasts.")
+
+    attname = field.attname
+    if field.is_relation:
+        field = field.target_field
+
+    if lookup == "isnull":
+        return lambda broadcast: (getattr(broadcast, attname) is None) == bool(value)
+
+    # Convert the values the way the queryset does, e.g. uids given as strings
+    def to_python(value):
+        return field.to_python(getattr(value, "pk", value))
+
+    if lookup == "in":
+        value = [to_python(item) for item in value]
+    else:
+        value = to_python(value)
+    compare = BROADCAST_LOOKUPS[lookup]
+
+    def match(broadcast):
+        broadcast_value = getattr(broadcast, attname)
+        if broadcast_value is None or value is None:
+            return False
+        return compare(broadcast_value, value)
+
+    return match
+
+
+def merge_inbox_window(notifications, broadcasts, limit=None, before=None):
+    """
+    Merge the broadcasts into a window of notifications fetched in inbox
+    order, keeping the items before the ``before`` key.
+    """
+    if before is not None:
+        broadcasts = [
+            broadcast for broadcast in broadcasts if get_inbox_key(broadcast) < before
+        ]
+
+    notifications = sorted(
+        [*notifications, *broadcasts], key=get_inbox_key, reverse=True
+    )
+    return notifications[:limit] if limit is not None else notifications
+
+
+class NotificationInbox:
+    """
+    Notifications of a user merged with the user's broadcasts.
+
+    It supports the queryset operations the inbox is used with: filtering,
+    counting, iteration and slicing for pagination. Only the visible slice of
+    the notifications is fetched, the broadcasts are few and kept in memory.
+    """
+
+    # Tell the paginator the items are ordered
+    ordered = True
+
+    def __init__(self, notifications, broadcasts):
+        self.notifications = notifications
+        self.broadcasts = sorted(broadcasts, key=get_inbox_key, reverse=True)
+        self._broadcast_indexes = None
+
+    def all(self):
+        return self.__class__(self.notifications.all(), self.broadcasts)
+
+    def filter(self, **kwargs):
+        """
+        Filter the notifications and the broadcasts. The broadcasts support
+        the ``exact``, ``in``, ``lt``, ``lte``, ``gt``, ``gte`` and ``isnull``
+        lookups on the notification fields.
+
+        Raises:
+            TypeError: If a lookup is not supported on the broadcasts.
+        """
+        matchers = [
+            get_broadcast_matcher(self.notifications.model, field_lookup, value)
+            for field_lookup, value in kwargs.items()
+        ]
+        broadcasts = [
+            broadcast
+            for broadcast in self.broadcasts
+            if all(match(broadcast) for match in matchers)
+        ]
+        return self.__class__(self.notifications.filter(**kwargs), broadcasts)
+
+    def count(self):
+        return self.notifications.count() + len(self.broadcasts)
+
+    def exists(self):
+        return bool(self.broadcasts) or self.notifications.exists()
+
+    def first(self):
+        return next(iter(self[:1]), None)
+
+    def __len__(self):
+        return self.count()
+
+    def __iter__(self):
+        return iter(merge_inbox_window(self.notifications, self.broadcasts))
+
+    def __getitem__(self, index):
+        if isinstance(index, int):
+            items = self[index : index + 1]
+            if not items:
+                raise IndexError("Inbox index out of range")
+            return items[0]
+
+        start, stop = index.start or 0, index.stop
+        if stop is None:
+            stop = self.count()
+        if stop <= start:
+            return []
+
+        # Map the merged range to the range of the notifications
+        broadcast_indexes = self.get_broadcast_indexes()
+        notification_start = start - bisect_left(broadcast_indexes, start)
+        notification_stop = stop - bisect_left(broadcast_indexes, stop)
+        notifications = iter(self.notifications[notification_start:notification_stop])
+        broadcasts = dict(zip(broadcast_indexes, self.broadcasts))
+
+        items = []
+        for merged_index in range(start, stop):
+            if merged_index in broadcasts:
+                items.append(broadcasts[merged_index])
+            else:
+                notification = next(notifications, None)
+                if notification is not None:
+                    items.append(notification)
+
+        return items
+
+    def get_window(self, limit=None, before=None):
+        """
+        Get at most ``limit`` inbox items after the ``before`` key, fetching
+        only that window of the notifications.
+        """
+        notifications = self.notifications
+        if before is not None:
+            notifications = get_notifications_before(notifications, before)
+        if limit is not None:
+            notifications = notifications[:limit]
+
+        return merge_inbox_window(
+            notifications, self.broadcasts, limit=limit, before=before
+        )
+
+    def get_broadcast_indexes(self):
+        """
+        Get the merged index of every broadcast. It is the number of
+        notifications above the broadcast plus the number of broadcasts above
+        it. The notifications above every position are counted in a single
+        query over the inbox range above the oldest broadcast.
+        """
+        if self._broadcast_indexes is None:
+            positions = {broadcast.broadcast.position for broadcast in self.broadcasts}
+            counts = {}
+            if positions:
+                counts = self.notifications.filter(pk__gt=min(positions)).aggregate(
+                    **{
+                        f"above_{position}": Count("pk", filter=Q(pk__gt=position))
+                        for position in positions
+                    }
+                )
+
+            self._broadcast_indexes = [
+                counts[f"above_{broadcast.broadcast.position}"] + rank
+                for rank, broadcast in enumerate(self.broadcasts)
+            ]
+        return self._broadcast_indexes
@@ -1,4 +1,4 @@
-from notifications.utils import validate_token, get_token_from_scope
+from notifications.utils import get_token_payload, get_token_from_scope
 
 from channels.middleware import BaseMiddleware
 
@@ -11,10 +11,11 @@ class JWTAuthMiddleware(BaseMiddleware):
 
         if token:
             # Validate the token
-            user_id = validate_token(token)
+            payload = get_token_payload(token)
 
-            if user_id:
-                scope["user_id"] = user_id
+            if payload and payload.get("user_id"):
+                scope["user_id"] = payload["user_id"]
+                scope["token_payload"] = payload
             else:
                 scope["error"] = "Token is invalid or expired"
 
@@ -0,0 +1,63 @@
+from django.core.management.base import BaseCommand
+
+from tqdm import tqdm
+
+from notifications.models import ArchivedNotification
+
+
+class Command(BaseCommand):
+    help = "Move old, read and removed notifications to the archive table"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Archive read and inactive notifications older than this many days",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+
+        # Archived rows leave this queryset, so an interrupted run resumes
+        notifications = ArchivedNotification().get_archivable_notifications(
+            older_than_days=kwargs["older_than_days"]
+        )
+
+        total_archived = 0
+        last_pk = 0
+        progress = tqdm(
+            total=notifications.count(),
+            desc="Archiving notifications",
+            disable=not kwargs["verbosity"],
+        )
+
+        while True:
+            pks = list(
+                notifications.filter(pk__gt=last_pk).values_list("pk", flat=True)[
+                    :batch_size
+                ]
+            )
+            if not pks:
+                break
+            last_pk = pks[-1]
+
+            # Rows changed since they were listed are checked again while locked
+            archived = ArchivedNotification().archive_notifications(
+                notifications=notifications.filter(pk__in=pks)
+            )
+
+            total_archived += archived
+            progress.update(len(pks))
+
+        progress.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully archived {total_archived} notifications")
+        )
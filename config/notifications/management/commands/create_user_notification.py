@@ -49,10 +49,13 @@ class Command(BaseCommand):
             "object": {"uid": "baebd6f0-be33-481f-894d-07f3404e87a5"},
         }
         kwargs = {"created_by": default_user}
-        Notification().create_notification_for_users(
+        summary = Notification().create_notification_for_users(
             notification_data=notification, users=user_list, **kwargs
         )
 
         self.stdout.write(
-            self.style.SUCCESS(f"Successfully created notifications for each user")
+            self.style.SUCCESS(
+                f"Successfully created {summary['created']} notifications "
+                f"in {summary['chunks']} chunks ({summary['elapsed']:.2f}s)"
+            )
         )
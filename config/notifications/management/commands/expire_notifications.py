@@ -0,0 +1,46 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from tqdm import tqdm
+
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Flip expired active notifications to inactive in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications per batch",
+        )
+        parser.add_argument(
+            "--interval",
+            type=float,
+            default=None,
+            help="Keep sweeping every this many seconds instead of sweeping once",
+        )
+
+    def handle(self, *args, **kwargs):
+        while True:
+            progress = tqdm(
+                desc="Expiring notifications", disable=not kwargs["verbosity"]
+            )
+            summary = Notification().expire_notifications(
+                batch_size=kwargs["batch_size"], progress=progress.update
+            )
+            progress.close()
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"Successfully expired {summary['expired']} notifications "
+                    f"in {summary['batches']} batches"
+                )
+            )
+
+            if kwargs["interval"] is None:
+                break
+            time.sleep(kwargs["interval"])
@@ -0,0 +1,98 @@
+from collections import defaultdict
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from tqdm import tqdm
+
+from notifications.models import Notification, NotificationMessage
+
+
+class Command(BaseCommand):
+    help = "Move the notification data of existing notifications to shared messages"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of notifications per batch",
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+
+        # Normalized rows leave this queryset, so an interrupted run resumes
+        notifications = Notification.objects.filter(
+            message__isnull=True, notification__isnull=False
+        ).order_by("pk")
+
+        total_notifications = 0
+        total_messages = 0
+        last_pk = 0
+        progress = tqdm(
+            total=notifications.count(),
+            desc="Normalizing notification messages",
+            disable=not kwargs["verbosity"],
+        )
+
+        while True:
+            batch = list(
+                notifications.filter(pk__gt=last_pk).values_list(
+                    "pk", "notification"
+                )[:batch_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1][0]
+
+            # Group the notifications of identical data
+            payloads = {}
+            notification_ids = defaultdict(list)
+            for pk, notification_data in batch:
+                payload_hash = NotificationMessage.get_payload_hash(notification_data)
+                payloads[payload_hash] = notification_data
+                notification_ids[payload_hash].append(pk)
+
+            with transaction.atomic():
+                existing_hashes = set(
+                    NotificationMessage.objects.filter(
+                        payload_hash__in=payloads
+                    ).values_list("payload_hash", flat=True)
+                )
+                # Messages created by a concurrent fan-out in between are kept
+                NotificationMessage.objects.bulk_create(
+                    [
+                        NotificationMessage(
+                            notification=notification_data, payload_hash=payload_hash
+                        )
+                        for payload_hash, notification_data in payloads.items()
+                        if payload_hash not in existing_hashes
+                    ],
+                    ignore_conflicts=True,
+                )
+                messages = {
+                    message.payload_hash: message
+                    for message in NotificationMessage.objects.filter(
+                        payload_hash__in=payloads
+                    )
+                }
+
+                # The data does not change, so the caches and counters stay valid
+                for payload_hash, pks in notification_ids.items():
+                    Notification.objects.filter(pk__in=pks).update(
+                        message=messages[payload_hash], notification=None
+                    )
+
+            total_notifications += len(batch)
+            total_messages += len(payloads) - len(existing_hashes)
+            progress.update(len(batch))
+
+        progress.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully normalized {total_notifications} notifications "
+                f"into {total_messages} new messages"
+            )
+        )
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from notifications.utils import (
+    get_notification_cache_metrics,
+    reset_notification_cache_metrics,
+)
+
+
+class Command(BaseCommand):
+    help = "Show the notification cache hit-rate metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--reset", action="store_true", help="Reset the metrics after showing them"
+        )
+
+    def handle(self, *args, **kwargs):
+        metrics = get_notification_cache_metrics()
+
+        for name, value in metrics.items():
+            if name == "hit_rate":
+                value = f"{value:.2%}"
+            self.stdout.write(f"{name}: {value}")
+
+        if kwargs["reset"]:
+            reset_notification_cache_metrics()
+            self.stdout.write(self.style.SUCCESS("Successfully reset the metrics"))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+
+from tqdm import tqdm
+
+from notifications.choices import NotificationsStatus
+from notifications.models import Notification
+
+
+class Command(BaseCommand):
+    help = "Delete removed and deleted notifications in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--statuses",
+            nargs="+",
+            choices=NotificationsStatus.values,
+            help="Statuses to delete, removed and deleted by default",
+        )
+        parser.add_argument(
+            "--older-than-days",
+            type=int,
+            default=None,
+            help="Only delete notifications not updated for this many days",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Size of the id range deleted per batch",
+        )
+        parser.add_argument(
+            "--sleep",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches",
+        )
+
+    def handle(self, *args, **kwargs):
+        progress = tqdm(desc="Purging notifications", disable=not kwargs["verbosity"])
+
+        summary = Notification().purge_notifications(
+            statuses=kwargs["statuses"],
+            older_than_days=kwargs["older_than_days"],
+            batch_size=kwargs["batch_size"],
+            sleep=kwargs["sleep"],
+            progress=progress.update,
+        )
+
+        progress.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Successfully purged {summary['purged']} notifications of "
+                f"{summary['users']} users in {summary['batches']} batches"
+            )
+        )
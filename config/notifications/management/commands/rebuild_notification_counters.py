@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from tqdm import tqdm
+
+from notifications.models import Notification, NotificationCounter
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = "Rebuild the notification counters of users from scratch"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--users",
+            type=int,
+            nargs="+",
+            help="Ids of the users to rebuild, all users by default",
+        )
+        parser.add_argument(
+            "--batch-size", type=int, default=1000, help="Number of users per batch"
+        )
+
+    def handle(self, *args, **kwargs):
+        batch_size = kwargs["batch_size"]
+
+        users = User.objects.all()
+        if kwargs["users"]:
+            users = users.filter(id__in=kwargs["users"])
+
+        total_users = 0
+        progress = tqdm(
+            total=users.count(),
+            desc="Rebuilding notification counters",
+            disable=not kwargs["verbosity"],
+        )
+
+        for user_ids in Notification.iter_user_id_chunks(users, chunk_size=batch_size):
+            with transaction.atomic():
+                NotificationCounter().rebuild_counters(user_ids=user_ids)
+
+            total_users += len(user_ids)
+            progress.update(len(user_ids))
+
+        progress.close()
+
+        self.stdout.write(
+            self.style.SUCCESS(f"Successfully rebuilt counters for {total_users} users")
+        )
@@ -0,0 +1,76 @@
+# Generated by Django 5.0.7 on 2026-10-16 20:53
+
+import dirtyfields.dirtyfields
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Case, Count, When
+
+
+def backfill_notification_counters(apps, schema_editor):
+    """Create the counters of the existing users from their active notifications"""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    Notification = apps.get_model("notifications", "Notification")
+    NotificationCounter = apps.get_model("notifications", "NotificationCounter")
+    batch_size = 1000
+
+    user_ids = list(User.objects.order_by("pk").values_list("pk", flat=True))
+    for start in range(0, len(user_ids), batch_size):
+        batch_user_ids = user_ids[start : start + batch_size]
+        counts = {
+            user_id: {"total_notifications": 0, "unread_notifications": 0}
+            for user_id in batch_user_ids
+        }
+        aggregated_counts = (
+            Notification.objects.filter(
+                user_id__in=batch_user_ids, status="ACTIVE"
+            )
+            .order_by()
+            .values("user_id")
+            .annotate(
+                total_notifications=Count("id"),
+                unread_notifications=Count(Case(When(is_read=False, then=1))),
+            )
+        )
+        for aggregated_count in aggregated_counts:
+            counts[aggregated_count.pop("user_id")] = aggregated_count
+
+        NotificationCounter.objects.bulk_create(
+            [
+                NotificationCounter(user_id=user_id, **user_counts)
+                for user_id, user_counts in counts.items()
+            ],
+            ignore_conflicts=True,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0003_alter_notification_created_at_alter_notification_uid_and_more'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, help_text='Unique identifier for this model instance.', unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp indicating when the instance was created.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp indicating when the instance was last updated.')),
+                ('total_notifications', models.IntegerField(default=0, help_text='Number of active notifications of the user.')),
+                ('unread_notifications', models.IntegerField(default=0, help_text='Number of active unread notifications of the user.')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='notification_counter', to=settings.AUTH_USER_MODEL, verbose_name='User')),
+            ],
+            options={
+                'verbose_name': 'Notification Counter',
+                'verbose_name_plural': 'Notification Counters',
+            },
+            bases=(dirtyfields.dirtyfields.DirtyFieldsMixin, models.Model),
+        ),
+        migrations.RunPython(
+            backfill_notification_counters, migrations.RunPython.noop
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-16 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+from notifications.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0004_notificationcounter'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['user', 'status', '-id'], name='notification_user_status_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(fields=['user', 'status', 'is_read', '-id'], name='notification_user_read_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('is_read', False), ('status', 'ACTIVE')), fields=['user', '-id'], name='notification_user_unread_idx'),
+        ),
+        # The composite indexes lead with the user, they cover its foreign key
+        migrations.AlterField(
+            model_name='notification',
+            name='user',
+            field=models.ForeignKey(db_index=False, help_text='The user to whom this notification belongs.', on_delete=django.db.models.deletion.CASCADE, related_name='user_notification', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 5.0.7 on 2026-10-16 21:10
+
+import dirtyfields.dirtyfields
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0005_notification_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, help_text='Unique identifier for this model instance.', unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp indicating when the instance was created.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp indicating when the instance was last updated.')),
+                ('notification', models.JSONField(help_text='Notification data in JSON format.')),
+                ('payload_hash', models.CharField(db_index=True, help_text='SHA-256 hash of the notification data.', max_length=64)),
+            ],
+            options={
+                'verbose_name': 'Notification Message',
+                'verbose_name_plural': 'Notification Messages',
+            },
+            bases=(dirtyfields.dirtyfields.DirtyFieldsMixin, models.Model),
+        ),
+        migrations.AlterField(
+            model_name='notification',
+            name='notification',
+            field=models.JSONField(blank=True, help_text='Notification data in JSON format, empty when stored in the message.', null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='message',
+            field=models.ForeignKey(blank=True, help_text='Shared notification data of the notification.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='notifications', to='notifications.notificationmessage'),
+        ),
+    ]
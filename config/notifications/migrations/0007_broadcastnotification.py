@@ -0,0 +1,71 @@
+# Generated by Django 5.0.7 on 2026-10-16 21:14
+
+import dirtyfields.dirtyfields
+import django.db.models.deletion
+import django_currentuser.db.models.fields
+import django_currentuser.middleware
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0006_notificationmessage'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserBroadcastNotification',
+            fields=[
+            ],
+            options={
+                'proxy': True,
+                'indexes': [],
+                'constraints': [],
+            },
+            bases=('notifications.notification',),
+        ),
+        migrations.CreateModel(
+            name='BroadcastNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, help_text='Unique identifier for this model instance.', unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp indicating when the instance was created.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp indicating when the instance was last updated.')),
+                ('position', models.BigIntegerField(default=0, help_text='Last notification id when the broadcast was sent.')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('INACTIVE', 'Inactive'), ('DRAFT', 'DRAFT'), ('REMOVED', 'Removed'), ('DELETED', 'Deleted')], db_index=True, default='ACTIVE', help_text='Status of the broadcast.', max_length=20)),
+                ('created_by', django_currentuser.db.models.fields.CurrentUserField(default=django_currentuser.middleware.get_current_authenticated_user, help_text='The user who created this broadcast.', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='created_broadcasts', to=settings.AUTH_USER_MODEL)),
+                ('message', models.ForeignKey(help_text='Notification data of the broadcast.', on_delete=django.db.models.deletion.PROTECT, related_name='broadcasts', to='notifications.notificationmessage')),
+            ],
+            options={
+                'verbose_name': 'Broadcast Notification',
+                'verbose_name_plural': 'Broadcast Notifications',
+            },
+            bases=(dirtyfields.dirtyfields.DirtyFieldsMixin, models.Model),
+        ),
+        migrations.CreateModel(
+            name='BroadcastNotificationState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('uid', models.UUIDField(db_index=True, default=uuid.uuid4, editable=False, help_text='Unique identifier for this model instance.', unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, help_text='Timestamp indicating when the instance was created.')),
+                ('updated_at', models.DateTimeField(auto_now=True, help_text='Timestamp indicating when the instance was last updated.')),
+                ('is_read', models.BooleanField(default=False, help_text='Indicates whether the user has read the broadcast or not.')),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('INACTIVE', 'Inactive'), ('DRAFT', 'DRAFT'), ('REMOVED', 'Removed'), ('DELETED', 'Deleted')], default='ACTIVE', help_text='Status of the broadcast for the user.', max_length=20)),
+                ('broadcast', models.ForeignKey(help_text='The broadcast of the state.', on_delete=django.db.models.deletion.CASCADE, related_name='states', to='notifications.broadcastnotification')),
+                ('user', models.ForeignKey(help_text='The user of the broadcast state.', on_delete=django.db.models.deletion.CASCADE, related_name='broadcast_states', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Broadcast Notification State',
+                'verbose_name_plural': 'Broadcast Notification States',
+            },
+            bases=(dirtyfields.dirtyfields.DirtyFieldsMixin, models.Model),
+        ),
+        migrations.AddConstraint(
+            model_name='broadcastnotificationstate',
+            constraint=models.UniqueConstraint(fields=('user', 'broadcast'), name='broadcast_state_user_unique'),
+        ),
+    ]
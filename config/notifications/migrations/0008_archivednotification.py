@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-16 21:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0007_broadcastnotification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedNotification',
+            fields=[
+                ('id', models.BigIntegerField(help_text='Id of the archived notification.', primary_key=True, serialize=False)),
+                ('uid', models.UUIDField(editable=False, help_text='Unique identifier of the archived notification.', unique=True)),
+                ('notification', models.JSONField(blank=True, help_text='Notification data in JSON format, empty when stored in the message.', null=True)),
+                ('is_read', models.BooleanField(default=False, help_text='Indicates whether the notification has been read or not.')),
+                ('custom_info', models.JSONField(blank=True, help_text='Additional custom information related to the notification.', null=True)),
+                ('status', models.CharField(choices=[('ACTIVE', 'Active'), ('INACTIVE', 'Inactive'), ('DRAFT', 'DRAFT'), ('REMOVED', 'Removed'), ('DELETED', 'Deleted')], help_text='Status of the notification when it was archived.', max_length=20)),
+                ('created_at', models.DateTimeField(help_text='Timestamp indicating when the notification was created.')),
+                ('updated_at', models.DateTimeField(help_text='Timestamp indicating when the notification was last updated.')),
+                ('archived_at', models.DateTimeField(auto_now_add=True, db_index=True, help_text='Timestamp indicating when the notification was archived.')),
+                ('created_by', models.ForeignKey(blank=True, help_text='The user who created this notification.', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+                ('message', models.ForeignKey(blank=True, help_text='Shared notification data of the notification.', null=True, on_delete=django.db.models.deletion.PROTECT, related_name='archived_notifications', to='notifications.notificationmessage')),
+                ('user', models.ForeignKey(help_text='The user to whom this notification belongs.', on_delete=django.db.models.deletion.CASCADE, related_name='archived_notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Archived Notification',
+                'verbose_name_plural': 'Archived Notifications',
+                'indexes': [models.Index(fields=['user', '-id'], name='archived_notif_user_idx')],
+            },
+        ),
+    ]
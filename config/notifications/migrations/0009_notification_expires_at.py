@@ -0,0 +1,38 @@
+# Generated by Django 5.0.7 on 2026-10-16 21:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+from notifications.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+
+    # The indexes are built concurrently on PostgreSQL, outside a transaction
+    atomic = False
+
+    dependencies = [
+        ('notifications', '0008_archivednotification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivednotification',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Timestamp after which the notification expires.', null=True),
+        ),
+        migrations.AddField(
+            model_name='notification',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, help_text='Timestamp after which the notification expires.', null=True),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('status', 'ACTIVE')), fields=['user', 'expires_at'], name='notification_user_expiry_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('expires_at__isnull', False), ('status', 'ACTIVE')), fields=['expires_at'], name='notification_expiry_idx'),
+        ),
+    ]
@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def merge_duplicate_messages(apps, schema_editor):
+    """Point the rows of duplicate messages to the first one and delete the others"""
+    NotificationMessage = apps.get_model("notifications", "NotificationMessage")
+    referencing_models = [
+        apps.get_model("notifications", model_name)
+        for model_name in [
+            "Notification",
+            "ArchivedNotification",
+            "BroadcastNotification",
+        ]
+    ]
+
+    duplicates = (
+        NotificationMessage.objects.order_by()
+        .values("payload_hash")
+        .annotate(count=Count("id"), first_id=Min("id"))
+        .filter(count__gt=1)
+    )
+    for duplicate in duplicates:
+        duplicate_ids = list(
+            NotificationMessage.objects.filter(
+                payload_hash=duplicate["payload_hash"]
+            )
+            .exclude(pk=duplicate["first_id"])
+            .values_list("pk", flat=True)
+        )
+        for model in referencing_models:
+            model.objects.filter(message_id__in=duplicate_ids).update(
+                message_id=duplicate["first_id"]
+            )
+        NotificationMessage.objects.filter(pk__in=duplicate_ids).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('notifications', '0009_notification_expires_at'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_messages, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='notificationmessage',
+            name='payload_hash',
+            field=models.CharField(help_text='SHA-256 hash of the notification data.', max_length=64, unique=True),
+        ),
+    ]
@@ -1,18 +1,77 @@
+import hashlib
+import json
+import time
 import uuid
+from collections import Counter, defaultdict
+from datetime import timedelta
+from itertools import islice
 
-from django.db import transaction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
 from django.db import models
 from django.contrib.auth import get_user_model
 from django_currentuser.db.models import CurrentUserField
 from django.db.models.query import QuerySet
-from django.db.models import Count, When, Case
+from django.db.models import (
+    Count,
+    When,
+    Case,
+    F,
+    Q,
+    Min,
+    Max,
+    Subquery,
+    Exists,
+    OuterRef,
+)
+from django.utils import timezone
 
 from notifications.choices import NotificationsStatus
+from notifications.inbox import (
+    NotificationInbox,
+    merge_inbox_window,
+    get_notifications_before,
+)
 
 from dirtyfields import DirtyFieldsMixin
+from asgiref.sync import sync_to_async
 
 
 User = get_user_model()
+NOTIFICATION_BULK_CHUNK_SIZE = getattr(settings, "NOTIFICATION_BULK_CHUNK_SIZE", 1000)
+# Merge broadcast notifications into the inbox of every user at read time
+NOTIFICATION_BROADCASTS = getattr(settings, "NOTIFICATION_BROADCASTS", False)
+# Age in days after which broadcasts leave the inbox, None keeps them
+NOTIFICATION_BROADCAST_RETENTION_DAYS = getattr(
+    settings, "NOTIFICATION_BROADCAST_RETENTION_DAYS", 90
+)
+# Store the data of a fan-out once in a shared NotificationMessage
+NOTIFICATION_SHARED_PAYLOADS = getattr(settings, "NOTIFICATION_SHARED_PAYLOADS", False)
+# Age in days after which read and inactive notifications are archived
+NOTIFICATION_ARCHIVE_AFTER_DAYS = getattr(
+    settings, "NOTIFICATION_ARCHIVE_AFTER_DAYS", 90
+)
+# Statuses of the notifications archived regardless of their age
+NOTIFICATION_ARCHIVE_STATUSES = getattr(
+    settings,
+    "NOTIFICATION_ARCHIVE_STATUSES",
+    [NotificationsStatus.REMOVED, NotificationsStatus.DELETED],
+)
+# Statuses of the notifications deleted by the purge
+NOTIFICATION_PURGE_STATUSES = getattr(
+    settings,
+    "NOTIFICATION_PURGE_STATUSES",
+    [NotificationsStatus.REMOVED, NotificationsStatus.DELETED],
+)
+# Leave expired notifications out of the inbox and the counts before they are swept
+NOTIFICATION_EXPIRY = getattr(settings, "NOTIFICATION_EXPIRY", False)
+# Fields of a notification counted by the user's counter
+COUNTER_FIELDS = {"user", "user_id", "status", "is_read"}
+NOTIFICATION_SETTINGS_CACHE_TIMEOUT = getattr(
+    settings, "NOTIFICATION_SETTINGS_CACHE_TIMEOUT", 60 * 60
+)
 
 
 class BaseModel(DirtyFieldsMixin, models.Model):
@@ -44,16 +103,29 @@ class BaseModel(DirtyFieldsMixin, models.Model):
 class Notification(BaseModel):
     """Notification model to store user notifications."""
 
-    # The user associated with this notification.
+    # The user associated with this notification, indexed by the inbox indexes.
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
-        db_index=True,
+        db_index=False,
         related_name="user_notification",
         help_text="The user to whom this notification belongs.",
     )
     # JSON field to store the notification data.
-    notification = models.JSONField(help_text="Notification data in JSON format.")
+    notification = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Notification data in JSON format, empty when stored in the message.",
+    )
+    # Shared notification data of a fan-out, stored once for all recipients.
+    message = models.ForeignKey(
+        "NotificationMessage",
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="notifications",
+        help_text="Shared notification data of the notification.",
+    )
     # Indicates whether the notification has been read or not.
     is_read = models.BooleanField(
         default=False,
@@ -77,9 +149,50 @@ class Notification(BaseModel):
         help_text="Status of the notification.",
     )
 
+    # Time after which the notification is left out of the inbox, never when empty.
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp after which the notification expires.",
+    )
+
     class Meta:
         verbose_name = "Notification"
         verbose_name_plural = "Notifications"
+        indexes = [
+            # Inbox of the user: filter(user=..., status=...).order_by("-pk")
+            models.Index(
+                fields=["user", "status", "-id"],
+                name="notification_user_status_idx",
+            ),
+            # Inbox filtered by read status
+            models.Index(
+                fields=["user", "status", "is_read", "-id"],
+                name="notification_user_read_idx",
+            ),
+            # Unread active notifications, ignored by backends without partial indexes
+            models.Index(
+                fields=["user", "-id"],
+                condition=Q(status=NotificationsStatus.ACTIVE, is_read=False),
+                name="notification_user_unread_idx",
+            ),
+            # Expired active notifications of the user, subtracted from the counts
+            models.Index(
+                fields=["user", "expires_at"],
+                condition=Q(
+                    status=NotificationsStatus.ACTIVE, expires_at__isnull=False
+                ),
+                name="notification_user_expiry_idx",
+            ),
+            # Expired active notifications flipped by the sweeper
+            models.Index(
+                fields=["expires_at"],
+                condition=Q(
+                    status=NotificationsStatus.ACTIVE, expires_at__isnull=False
+                ),
+                name="notification_expiry_idx",
+            ),
+        ]
 
     def __str__(self):
         """
@@ -88,7 +201,17 @@ class Notification(BaseModel):
         Returns:
             str: String representation of the notification.
         """
-        return f"{self.user} - {self.notification.get('message', '')} - {self.is_read}"
+        return f"{self.user} - {self.payload.get('message', '')} - {self.is_read}"
+
+    @property
+    def payload(self):
+        """
+        Notification data of the notification, read from the shared message
+        when the notification has one.
+        """
+        if self.message_id:
+            return self.message.notification
+        return self.notification
 
     def clean(self):
         """
@@ -97,7 +220,104 @@ class Notification(BaseModel):
         from notifications.utils import validate_notification
 
         super().clean()
-        validate_notification(notification_data=self.notification, use_for_model=True)
+        validate_notification(notification_data=self.payload, use_for_model=True)
+
+    def save(self, *args, **kwargs):
+        """
+        Save the notification and update the user's counter in the same transaction.
+        """
+        update_fields = kwargs.get("update_fields")
+        using = kwargs.get("using")
+
+        # Without a savepoint the pushes of the saves in a transaction coalesce
+        with transaction.atomic(using=using, savepoint=False):
+            previous_state = self.get_stored_counter_state(
+                update_fields=update_fields, using=using
+            )
+            super().save(*args, **kwargs)
+            current_state = self.get_counter_state(
+                previous_state=previous_state, update_fields=update_fields
+            )
+
+            deltas = defaultdict(lambda: (0, 0))
+            for state, sign in ((previous_state, -1), (current_state, 1)):
+                if state:
+                    total, unread = self.get_counter_contribution(
+                        status=state["status"], is_read=state["is_read"]
+                    )
+                    delta = deltas[state["user"]]
+                    deltas[state["user"]] = (
+                        delta[0] + sign * total,
+                        delta[1] + sign * unread,
+                    )
+            NotificationCounter().apply_deltas(deltas=deltas)
+
+    def get_stored_counter_state(self, update_fields=None, using=None):
+        """
+        Get the counted state (user, status, is_read) of the stored row.
+
+        The row is locked until the transaction ends, so concurrent saves of
+        the same notification count from the state the other one committed
+        instead of both subtracting the same in-memory previous state.
+
+        Returns:
+            dict: Stored state, None for new instances and unsaved rows.
+        """
+        if self._state.adding or self.pk is None:
+            return None
+
+        # Saving other fields leaves the counted state as it is
+        if update_fields is not None and not COUNTER_FIELDS & set(update_fields):
+            return None
+
+        stored_state = (
+            self.__class__.objects.using(using or self._state.db)
+            .select_for_update()
+            .filter(pk=self.pk)
+            .values_list("user_id", "status", "is_read")
+            .first()
+        )
+        if stored_state is None:
+            return None
+
+        return dict(zip(("user", "status", "is_read"), stored_state))
+
+    def get_counter_state(self, previous_state=None, update_fields=None):
+        """
+        Get the counted state (user, status, is_read) after saving, fields
+        left out of ``update_fields`` keep their stored value.
+
+        Returns:
+            dict: Current state, None when the counted state did not change.
+        """
+        current_state = {
+            "user": self.user_id,
+            "status": self.status,
+            "is_read": self.is_read,
+        }
+        if update_fields is None:
+            return current_state
+        if not COUNTER_FIELDS & set(update_fields):
+            return None
+
+        return {
+            field: value
+            if field in update_fields or f"{field}_id" in update_fields
+            else previous_state[field]
+            for field, value in current_state.items()
+        }
+
+    @staticmethod
+    def get_counter_contribution(status, is_read):
+        """
+        Get how much a notification adds to its user's counter.
+
+        Returns:
+            tuple: Contribution to the total and unread notifications count.
+        """
+        if status != NotificationsStatus.ACTIVE:
+            return 0, 0
+        return 1, 0 if is_read else 1
 
     def get_active_notifications(self):
         """
@@ -106,16 +326,83 @@ class Notification(BaseModel):
         Returns:
             QuerySet: A queryset of active notifications.
         """
-        return self.__class__.objects.filter(
+        notifications = self.__class__.objects.filter(
             status=NotificationsStatus.ACTIVE
         ).order_by("-pk")
 
+        # Expired notifications are left out until the sweeper flips them
+        if NOTIFICATION_EXPIRY:
+            notifications = notifications.filter(
+                Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now())
+            )
+
+        return notifications
+
+    def get_expired_notifications(self, now=None):
+        """
+        Retrieve the active notifications that expired at ``now``.
+
+        Returns:
+            QuerySet: A queryset of expired active notifications.
+        """
+        return self.__class__.objects.filter(
+            status=NotificationsStatus.ACTIVE,
+            expires_at__isnull=False,
+            expires_at__lte=now or timezone.now(),
+        )
+
+    def expire_notifications(self, batch_size: int = None, progress=None):
+        """
+        Flip the expired active notifications to inactive in batches.
+
+        Each batch is a single set-based update that adjusts the counters and
+        refreshes its affected users once. ``progress`` is called with the
+        number of rows of each batch.
+
+        Returns:
+            dict: Number of expired notifications, batches and elapsed seconds.
+        """
+        from notifications.utils import update_notification_status
+
+        batch_size = batch_size or NOTIFICATION_BULK_CHUNK_SIZE
+        # Rows expiring during the sweep are left for the next one
+        notifications = self.get_expired_notifications(now=timezone.now())
+        started_at = time.perf_counter()
+        total_expired = 0
+        total_batches = 0
+
+        while True:
+            # Flipped rows leave the expired notifications, take the next batch
+            pks = list(
+                notifications.order_by("pk").values_list("pk", flat=True)[:batch_size]
+            )
+            if not pks:
+                break
+
+            expired = update_notification_status(
+                notifications=notifications.filter(pk__in=pks),
+                status=NotificationsStatus.INACTIVE,
+            )
+
+            total_expired += expired
+            total_batches += 1
+            if progress is not None:
+                progress(expired)
+
+        return {
+            "expired": total_expired,
+            "batches": total_batches,
+            "elapsed": time.perf_counter() - started_at,
+        }
+
     def get_current_user_notifications(self, user):
         """
         Retrieve notifications for the current user if notifications are enabled.
 
         Returns:
-            QuerySet: A queryset of notifications, total, read and unread notifications count belonging to the current user.
+            dict: The notifications, total, read and unread notifications count belonging to the current user.
+            The notifications are a QuerySet, or a NotificationInbox merging in the broadcasts when
+            ``NOTIFICATION_BROADCASTS`` is on.
 
         Raises:
             ValueError: If notifications are not enabled for the current user.
@@ -125,26 +412,88 @@ class Notification(BaseModel):
             user_notifications = (
                 Notification()
                 .get_active_notifications()
-                .filter(user=user)
-                .select_related("user", "created_by")
-            )
-            # Aggregate the counts
-            notification_counts = user_notifications.aggregate(
-                total_notifications=Count("id"),
-                read_notifications=Count(Case(When(is_read=True, then=1))),
+                .filter(user_id=user.pk)
+                .select_related("user", "created_by", "message")
             )
+            # Read the denormalized counts
+            notification_counts = NotificationCounter().get_user_counts(user=user)
+
+            # Merge the broadcasts into the inbox at read time
+            if NOTIFICATION_BROADCASTS:
+                broadcasts = BroadcastNotification().get_user_broadcasts(user=user)
+                user_notifications = NotificationInbox(user_notifications, broadcasts)
+                notification_counts = BroadcastNotification.add_broadcast_counts(
+                    counts=notification_counts, broadcasts=broadcasts
+                )
 
             return {
                 "notifications": user_notifications,
-                "total_notifications": notification_counts["total_notifications"],
-                "read_notifications": notification_counts["read_notifications"],
-                "unread_notifications": notification_counts["total_notifications"]
-                - notification_counts["read_notifications"],
+                **notification_counts,
             }
 
         else:
             raise ValueError("Notifications are not enabled for the current user.")
 
+    async def aget_current_user_notifications(
+        self, user, with_notifications=True, limit=None, before=None
+    ):
+        """
+        Async version of ``get_current_user_notifications`` for consumers.
+
+        The notifications are fetched with async iteration into a list, or
+        skipped entirely when ``with_notifications`` is False. ``limit`` and
+        ``before`` (an inbox key) select a window of the inbox.
+
+        Raises:
+            ValueError: If notifications are not enabled for the current user.
+        """
+
+        if not await NotificationSettings().ais_user_enable_notification(user=user):
+            raise ValueError("Notifications are not enabled for the current user.")
+
+        user_notifications = []
+        if with_notifications:
+            notifications = (
+                Notification()
+                .get_active_notifications()
+                .filter(user_id=user.pk)
+                .select_related("user", "created_by", "message")
+            )
+            if before is not None:
+                notifications = get_notifications_before(notifications, before)
+            if limit is not None:
+                notifications = notifications[:limit]
+
+            user_notifications = [
+                notification async for notification in notifications
+            ]
+        notification_counts = await NotificationCounter().aget_user_counts(user=user)
+
+        if NOTIFICATION_BROADCASTS:
+            broadcasts = await BroadcastNotification().aget_user_broadcasts(user=user)
+            notification_counts = BroadcastNotification.add_broadcast_counts(
+                counts=notification_counts, broadcasts=broadcasts
+            )
+            if with_notifications:
+                user_notifications = merge_inbox_window(
+                    user_notifications, broadcasts, limit=limit, before=before
+                )
+
+        return {
+            "notifications": user_notifications,
+            **notification_counts,
+        }
+
+    @staticmethod
+    def filter_by_read_status(notifications, is_read):
+        """
+        Filter the notifications by read status, seeking ``notification_user_read_idx``.
+
+        The value is compared with ``is_read__in``, SQLite cannot seek an index
+        on the bare ``is_read`` and ``NOT is_read`` conditions of ``is_read=``.
+        """
+        return notifications.filter(is_read__in=[is_read])
+
     def get_current_user_unread_notifications(self):
         """
         Retrieve unread notifications of current user.
@@ -172,27 +521,842 @@ class Notification(BaseModel):
         )
 
     def create_notification_for_users(
-        self, notification_data: dict, users: QuerySet, **kwargs
+        self,
+        notification_data: dict,
+        users,
+        chunk_size: int = None,
+        shared_payload: bool = None,
+        **kwargs,
     ):
-        """Create notifications for multiple users efficiently."""
-        from notifications.utils import validate_notification
+        """
+        Create notifications for multiple users with chunked bulk inserts.
+
+        Recipients are streamed as user ids and each chunk is written with a
+        single ``bulk_create`` inside its own transaction. ``bulk_create`` does
+        not fire ``post_save``, so the affected users are refreshed once per
+        chunk after it commits instead of once per row. With the write-through
+        cache strategy their cached first page is patched with the new rows.
+
+        With ``shared_payload`` the notification data is stored once in a
+        ``NotificationMessage`` referenced by every recipient's row.
+
+        Returns:
+            dict: Number of created notifications, chunks and elapsed seconds.
+        """
+        from notifications.utils import (
+            validate_notification,
+            refresh_users_notifications,
+            get_created_notification_events,
+            get_created_notification_changes,
+        )
 
         # Validate notification data
         validate_notification(notification_data=notification_data)
 
-        # If users is a single user instance, convert it to a queryset
-        if not isinstance(users, QuerySet):
-            users = QuerySet(model=User).filter(id=users.id)
+        chunk_size = chunk_size or NOTIFICATION_BULK_CHUNK_SIZE
+        if shared_payload is None:
+            shared_payload = NOTIFICATION_SHARED_PAYLOADS
+
+        # Recipients hold either the shared message or their own copy of the data
+        if shared_payload:
+            kwargs["message"] = NotificationMessage().get_or_create_message(
+                notification_data=notification_data
+            )
+        else:
+            kwargs["notification"] = notification_data
+        contribution = self.get_counter_contribution(
+            status=kwargs.get("status", NotificationsStatus.ACTIVE),
+            is_read=kwargs.get("is_read", False),
+        )
+        started_at = time.perf_counter()
+        total_created = 0
+        total_chunks = 0
+
+        for user_ids in self.iter_user_id_chunks(users, chunk_size=chunk_size):
+            with transaction.atomic():
+                notifications = self.__class__.objects.bulk_create(
+                    [
+                        self.__class__(user_id=user_id, **kwargs)
+                        for user_id in user_ids
+                    ],
+                    batch_size=chunk_size,
+                )
+                # Update the counters of the chunk's users with F-expressions
+                NotificationCounter().apply_deltas(
+                    deltas={
+                        user_id: (contribution[0] * count, contribution[1] * count)
+                        for user_id, count in Counter(user_ids).items()
+                    }
+                )
+                # One cache refresh and post-commit push per affected user
+                refresh_users_notifications(
+                    user_ids=user_ids,
+                    events=get_created_notification_events(notifications),
+                    changes=get_created_notification_changes(notifications),
+                )
+
+            total_created += len(notifications)
+            total_chunks += 1
+
+        return {
+            "created": total_created,
+            "chunks": total_chunks,
+            "elapsed": time.perf_counter() - started_at,
+        }
+
+    def purge_notifications(
+        self,
+        statuses=None,
+        older_than_days: int = None,
+        batch_size: int = None,
+        sleep: float = 0,
+        progress=None,
+    ):
+        """
+        Delete the notifications in the purged statuses in bounded pk-range batches.
+
+        An empty range jumps straight to the next purged row, so sparse
+        statuses are not walked one empty range at a time. Each batch is
+        removed with a raw delete inside its own transaction, so no
+        ``post_delete`` is sent per row. The counters are updated per batch
+        and the affected users are refreshed once after the last batch.
+        ``sleep`` seconds are waited between batches to throttle the deletes,
+        and ``progress`` is called with the number of rows of each batch.
+
+        Returns:
+            dict: Number of purged notifications, batches, affected users and
+            elapsed seconds.
+        """
+        from notifications.utils import (
+            refresh_users_notifications,
+            get_removed_notification_events,
+        )
+
+        batch_size = batch_size or NOTIFICATION_BULK_CHUNK_SIZE
+        notifications = self.__class__.objects.filter(
+            status__in=statuses or NOTIFICATION_PURGE_STATUSES
+        )
+        if older_than_days is not None:
+            notifications = notifications.filter(
+                updated_at__lt=timezone.now() - timedelta(days=older_than_days)
+            )
+
+        pk_range = notifications.aggregate(min_pk=Min("pk"), max_pk=Max("pk"))
+        started_at = time.perf_counter()
+        total_purged = 0
+        total_batches = 0
+        user_ids = set()
+        events = {}
+
+        start = pk_range["min_pk"]
+        while start is not None and start <= pk_range["max_pk"]:
+            batch = notifications.filter(pk__gte=start, pk__lt=start + batch_size)
+            start += batch_size
+
+            with transaction.atomic():
+                rows = list(
+                    batch.select_for_update()
+                    .order_by()
+                    .values("id", "uid", "user_id", "status", "is_read", "message_id")
+                )
+                if not rows:
+                    # Skip the ids up to the next purged row
+                    start = notifications.filter(pk__gte=start).aggregate(
+                        min_pk=Min("pk")
+                    )["min_pk"]
+                    continue
+
+                queryset = self.__class__.objects.filter(
+                    pk__in=[row["id"] for row in rows]
+                )
+                queryset._raw_delete(queryset.db)
+                NotificationCounter().apply_deltas(
+                    deltas=NotificationCounter.get_removal_deltas(notifications=rows)
+                )
+
+            # Messages shared by the purged rows only are deleted with them
+            NotificationMessage().delete_unused_messages(
+                message_ids=[row["message_id"] for row in rows]
+            )
+
+            user_ids.update(row["user_id"] for row in rows)
+            for user_id, user_events in (
+                get_removed_notification_events(rows) or {}
+            ).items():
+                events.setdefault(user_id, []).extend(user_events)
+
+            total_purged += len(rows)
+            total_batches += 1
+            if progress is not None:
+                progress(len(rows))
+            if sleep and start <= pk_range["max_pk"]:
+                time.sleep(sleep)
+
+        # One cache invalidation and push per affected user
+        if user_ids:
+            refresh_users_notifications(user_ids=user_ids, events=events)
+
+        return {
+            "purged": total_purged,
+            "batches": total_batches,
+            "users": len(user_ids),
+            "elapsed": time.perf_counter() - started_at,
+        }
+
+    @staticmethod
+    def iter_user_id_chunks(users, chunk_size: int):
+        """
+        Yield lists of user ids of at most ``chunk_size`` items.
+
+        Accepts a user queryset, an iterable of users or user ids, or a single
+        user instance. Querysets are streamed from the database as ids only.
+        """
+        if isinstance(users, QuerySet):
+            user_ids = (
+                users.order_by()
+                .values_list("id", flat=True)
+                .iterator(chunk_size=chunk_size)
+            )
+        elif isinstance(users, models.Model):
+            user_ids = iter([users.pk])
+        else:
+            user_ids = (getattr(user, "pk", user) for user in users)
+
+        while True:
+            chunk = list(islice(user_ids, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+
+class NotificationMessage(BaseModel):
+    """Model to store notification data shared by the recipients of a fan-out."""
+
+    # JSON field to store the notification data.
+    notification = models.JSONField(help_text="Notification data in JSON format.")
+    # Hash of the notification data to reuse the message of identical data.
+    payload_hash = models.CharField(
+        max_length=64,
+        unique=True,
+        help_text="SHA-256 hash of the notification data.",
+    )
+
+    class Meta:
+        verbose_name = "Notification Message"
+        verbose_name_plural = "Notification Messages"
+
+    def __str__(self):
+        """
+        Return a string representation of the notification message
+
+        Returns:
+            str: String representation of the notification message
+        """
+        return f"{self.notification.get('message', '')}"
+
+    def get_or_create_message(self, notification_data: dict):
+        """
+        Get the message holding the notification data, or create it. The hash
+        is unique, a fan-out racing to create the same message gets the one
+        created first.
+
+        Returns:
+            NotificationMessage: The message of the notification data.
+        """
+        message, _ = self.__class__.objects.get_or_create(
+            payload_hash=self.get_payload_hash(notification_data=notification_data),
+            defaults={"notification": notification_data},
+        )
+
+        return message
+
+    def delete_unused_messages(self, message_ids):
+        """
+        Delete the given messages once no notification, archived notification
+        or broadcast references them. Called after their notifications are
+        purged, in its own transaction.
+
+        A message referenced again by a concurrent fan-out fails the delete
+        and is kept.
+
+        Returns:
+            int: Number of deleted messages.
+        """
+        message_ids = {message_id for message_id in message_ids if message_id}
+        if not message_ids:
+            return 0
+
+        try:
+            with transaction.atomic():
+                deleted, _ = (
+                    self.__class__.objects.filter(pk__in=message_ids)
+                    .exclude(
+                        Exists(Notification.objects.filter(message=OuterRef("pk")))
+                    )
+                    .exclude(
+                        Exists(
+                            ArchivedNotification.objects.filter(message=OuterRef("pk"))
+                        )
+                    )
+                    .exclude(
+                        Exists(
+                            BroadcastNotification.objects.filter(message=OuterRef("pk"))
+                        )
+                    )
+                    .delete()
+                )
+        except IntegrityError:
+            return 0
+
+        return deleted
+
+    @staticmethod
+    def get_payload_hash(notification_data: dict):
+        """Get the hash of the notification data, independent of key order"""
+        return hashlib.sha256(
+            json.dumps(
+                notification_data, sort_keys=True, cls=DjangoJSONEncoder
+            ).encode("utf-8")
+        ).hexdigest()
+
+
+class BroadcastNotification(BaseModel):
+    """
+    Model to store a notification sent to all users once.
+
+    The broadcast is merged into the inbox of every user at read time and the
+    users' read and removed states are kept as sparse overrides.
+    """
+
+    # Notification data of the broadcast.
+    message = models.ForeignKey(
+        NotificationMessage,
+        on_delete=models.PROTECT,
+        related_name="broadcasts",
+        help_text="Notification data of the broadcast.",
+    )
+    # Last notification id when the broadcast was sent, its place in the inbox.
+    position = models.BigIntegerField(
+        default=0,
+        help_text="Last notification id when the broadcast was sent.",
+    )
+    # The user who created this broadcast.
+    created_by = CurrentUserField(
+        related_name="created_broadcasts",
+        help_text="The user who created this broadcast.",
+    )
+    # Status of the broadcast (e.g., active, removed).
+    status = models.CharField(
+        max_length=20,
+        choices=NotificationsStatus.choices,
+        db_index=True,
+        default=NotificationsStatus.ACTIVE,
+        help_text="Status of the broadcast.",
+    )
+
+    class Meta:
+        verbose_name = "Broadcast Notification"
+        verbose_name_plural = "Broadcast Notifications"
+
+    def __str__(self):
+        """
+        Return a string representation of the broadcast notification
+
+        Returns:
+            str: String representation of the broadcast notification
+        """
+        return f"{self.message} - {self.status}"
+
+    def send_broadcast(self, notification_data: dict, **kwargs):
+        """
+        Send the notification to all users with a single row.
+
+        Returns:
+            BroadcastNotification: The created broadcast.
+        """
+        from notifications.utils import validate_notification
+
+        validate_notification(notification_data=notification_data)
+
+        with transaction.atomic():
+            message = NotificationMessage().get_or_create_message(
+                notification_data=notification_data
+            )
+            position = (
+                Notification.objects.order_by("-pk")
+                .values_list("pk", flat=True)
+                .first()
+            )
+            return self.__class__.objects.create(
+                message=message, position=position or 0, **kwargs
+            )
+
+    def get_active_broadcasts(self):
+        """
+        Retrieve active broadcasts in inbox order.
+
+        Returns:
+            QuerySet: A queryset of active broadcasts.
+        """
+        return (
+            self.__class__.objects.filter(status=NotificationsStatus.ACTIVE)
+            .select_related("message", "created_by")
+            .order_by("-position", "-id")
+        )
+
+    def get_visible_broadcasts(self, user):
+        """
+        Retrieve the active broadcasts the user can see: the ones sent after
+        the user joined and within the retention window.
+
+        Returns:
+            QuerySet: A queryset of the user's broadcasts in inbox order.
+        """
+        broadcasts = self.get_active_broadcasts()
+
+        if NOTIFICATION_BROADCAST_RETENTION_DAYS is not None:
+            broadcasts = broadcasts.filter(
+                created_at__gte=timezone.now()
+                - timedelta(days=NOTIFICATION_BROADCAST_RETENTION_DAYS)
+            )
+
+        # Users do not receive the broadcasts sent before they joined
+        if hasattr(User, "date_joined"):
+            if isinstance(user, User):
+                date_joined = user.date_joined
+            else:
+                date_joined = Subquery(
+                    User.objects.filter(pk=user.pk).values("date_joined")[:1]
+                )
+            broadcasts = broadcasts.filter(created_at__gte=date_joined)
+
+        return broadcasts
+
+    @staticmethod
+    def get_user_states(user, broadcasts):
+        """
+        Retrieve the user's states of the broadcasts.
+
+        Returns:
+            QuerySet: A queryset of the user's broadcast states.
+        """
+        return BroadcastNotificationState.objects.filter(
+            user_id=user.pk, broadcast_id__in=[broadcast.id for broadcast in broadcasts]
+        )
+
+    def get_user_broadcasts(self, user):
+        """
+        Get the visible broadcasts of the user as inbox notifications, with the
+        user's state applied and removed broadcasts left out.
+
+        Returns:
+            list: Broadcasts of the user as UserBroadcastNotification instances.
+        """
+        broadcasts = list(self.get_visible_broadcasts(user=user))
+        states = {}
+        if broadcasts:
+            states = {
+                state.broadcast_id: state
+                for state in self.get_user_states(user=user, broadcasts=broadcasts)
+            }
+
+        return self.build_user_broadcasts(
+            user=user, broadcasts=broadcasts, states=states
+        )
 
-        # Create notification instances for each user
-        notification_instance = [
-            Notification(user=user, notification=notification_data, **kwargs)
-            for user in users
+    async def aget_user_broadcasts(self, user):
+        """Async version of ``get_user_broadcasts``"""
+        broadcasts = [
+            broadcast async for broadcast in self.get_visible_broadcasts(user=user)
         ]
-        for notification in notification_instance:
-            notification.save()
+        states = {}
+        if broadcasts:
+            states = {
+                state.broadcast_id: state
+                async for state in self.get_user_states(
+                    user=user, broadcasts=broadcasts
+                )
+            }
+            # Serializers read the user of the broadcast notifications
+            if not isinstance(user, User):
+                user = await user.aget_user()
+
+        return self.build_user_broadcasts(
+            user=user, broadcasts=broadcasts, states=states
+        )
 
-        return
+    @staticmethod
+    def build_user_broadcasts(user, broadcasts, states):
+        """Build the inbox notifications of the broadcasts with the user's states"""
+        user_broadcasts = []
+        for broadcast in broadcasts:
+            state = states.get(broadcast.id)
+            if state is not None and state.status != NotificationsStatus.ACTIVE:
+                continue
+
+            user_broadcasts.append(
+                UserBroadcastNotification.from_broadcast(
+                    broadcast=broadcast, user=user, state=state
+                )
+            )
+
+        return user_broadcasts
+
+    @staticmethod
+    def add_broadcast_counts(counts: dict, broadcasts: list):
+        """Add the broadcasts of the user to the user's notification counts"""
+        unread = sum(1 for broadcast in broadcasts if not broadcast.is_read)
+
+        return {
+            "total_notifications": counts["total_notifications"] + len(broadcasts),
+            "read_notifications": counts["read_notifications"]
+            + len(broadcasts)
+            - unread,
+            "unread_notifications": counts["unread_notifications"] + unread,
+        }
+
+    def apply_user_state(self, user, uids=None, **fields):
+        """
+        Store the user's state (``is_read`` or ``status``) of the visible
+        broadcasts, or of the broadcasts with the given uids.
+
+        Returns:
+            int: Number of broadcasts whose state changed.
+        """
+        from notifications.utils import refresh_users_notifications
+
+        broadcasts = self.get_visible_broadcasts(user=user)
+        if uids is not None:
+            broadcasts = broadcasts.filter(uid__in=uids)
+        broadcasts = list(broadcasts)
+
+        states = {
+            state.broadcast_id: state
+            for state in self.get_user_states(user=user, broadcasts=broadcasts)
+        }
+
+        changed_states = []
+        for broadcast in broadcasts:
+            state = states.get(broadcast.id) or BroadcastNotificationState()
+            # Removed broadcasts stay removed
+            if state.status != NotificationsStatus.ACTIVE:
+                continue
+            if all(getattr(state, field) == value for field, value in fields.items()):
+                continue
+
+            changed_states.append(
+                BroadcastNotificationState(
+                    user_id=user.pk,
+                    broadcast=broadcast,
+                    **{"is_read": state.is_read, "status": state.status, **fields},
+                )
+            )
+
+        if changed_states:
+            BroadcastNotificationState.objects.bulk_create(
+                changed_states,
+                update_conflicts=True,
+                unique_fields=["user", "broadcast"],
+                update_fields=[*fields, "updated_at"],
+            )
+            refresh_users_notifications(user_ids=[user.pk])
+
+        return len(changed_states)
+
+
+class BroadcastNotificationState(BaseModel):
+    """Model to store the read or removed state of a broadcast for a user."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="broadcast_states",
+        help_text="The user of the broadcast state.",
+    )
+    broadcast = models.ForeignKey(
+        BroadcastNotification,
+        on_delete=models.CASCADE,
+        related_name="states",
+        help_text="The broadcast of the state.",
+    )
+    # Indicates whether the user has read the broadcast or not.
+    is_read = models.BooleanField(
+        default=False,
+        help_text="Indicates whether the user has read the broadcast or not.",
+    )
+    # Status of the broadcast for the user.
+    status = models.CharField(
+        max_length=20,
+        choices=NotificationsStatus.choices,
+        default=NotificationsStatus.ACTIVE,
+        help_text="Status of the broadcast for the user.",
+    )
+
+    class Meta:
+        verbose_name = "Broadcast Notification State"
+        verbose_name_plural = "Broadcast Notification States"
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "broadcast"], name="broadcast_state_user_unique"
+            )
+        ]
+
+    def __str__(self):
+        """
+        Return a string representation of the broadcast state
+
+        Returns:
+            str: String representation of the broadcast state
+        """
+        return f"{self.user} - {self.broadcast_id} - {self.status} - {self.is_read}"
+
+
+class UserBroadcastNotification(Notification):
+    """
+    A broadcast shown as a notification in the inbox of a user.
+
+    Instances are never stored as notifications, saving one stores the
+    user's state of the broadcast instead.
+    """
+
+    class Meta:
+        proxy = True
+
+    @classmethod
+    def from_broadcast(cls, broadcast, user, state=None):
+        """Build the inbox notification of the broadcast for the user"""
+        notification = cls(
+            uid=broadcast.uid,
+            user_id=user.pk,
+            message=broadcast.message,
+            is_read=state.is_read if state is not None else False,
+            created_by=broadcast.created_by,
+            status=NotificationsStatus.ACTIVE,
+            created_at=broadcast.created_at,
+            updated_at=state.updated_at if state is not None else broadcast.updated_at,
+        )
+        if isinstance(user, User):
+            notification.user = user
+        notification.broadcast = broadcast
+
+        return notification
+
+    def save(self, *args, **kwargs):
+        """Store the user's state of the broadcast instead of a notification"""
+        from dirtyfields.dirtyfields import reset_state
+        from notifications.utils import refresh_users_notifications
+
+        BroadcastNotificationState.objects.update_or_create(
+            user_id=self.user_id,
+            broadcast=self.broadcast,
+            defaults={"is_read": self.is_read, "status": self.status},
+        )
+        refresh_users_notifications(user_ids=[self.user_id])
+        reset_state(sender=self.__class__, instance=self)
+
+
+class ArchivedNotification(models.Model):
+    """
+    Model to store notifications moved out of the notification table.
+
+    Rows keep the id and the fields of the notification they archive, so the
+    inbox queries only scan the hot table and archived rows stay readable.
+    """
+
+    # Id of the archived notification.
+    id = models.BigIntegerField(
+        primary_key=True, help_text="Id of the archived notification."
+    )
+    # Unique identifier of the archived notification.
+    uid = models.UUIDField(
+        editable=False,
+        unique=True,
+        help_text="Unique identifier of the archived notification.",
+    )
+    # The user associated with this notification.
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="archived_notifications",
+        help_text="The user to whom this notification belongs.",
+    )
+    # JSON field to store the notification data.
+    notification = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Notification data in JSON format, empty when stored in the message.",
+    )
+    # Shared notification data of a fan-out, stored once for all recipients.
+    message = models.ForeignKey(
+        NotificationMessage,
+        on_delete=models.PROTECT,
+        null=True,
+        blank=True,
+        related_name="archived_notifications",
+        help_text="Shared notification data of the notification.",
+    )
+    # Indicates whether the notification has been read or not.
+    is_read = models.BooleanField(
+        default=False,
+        help_text="Indicates whether the notification has been read or not.",
+    )
+    # Additional custom information related to the notification.
+    custom_info = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Additional custom information related to the notification.",
+    )
+    # The user who created this notification.
+    created_by = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        help_text="The user who created this notification.",
+    )
+    # Time after which the notification expired, never when empty.
+    expires_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        help_text="Timestamp after which the notification expires.",
+    )
+    # Status of the notification when it was archived.
+    status = models.CharField(
+        max_length=20,
+        choices=NotificationsStatus.choices,
+        help_text="Status of the notification when it was archived.",
+    )
+    # Timestamps of the notification.
+    created_at = models.DateTimeField(
+        help_text="Timestamp indicating when the notification was created."
+    )
+    updated_at = models.DateTimeField(
+        help_text="Timestamp indicating when the notification was last updated."
+    )
+    # Timestamp indicating when the notification was archived.
+    archived_at = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        help_text="Timestamp indicating when the notification was archived.",
+    )
+
+    class Meta:
+        verbose_name = "Archived Notification"
+        verbose_name_plural = "Archived Notifications"
+        indexes = [
+            # Archive of the user: filter(user=...).order_by("-pk")
+            models.Index(fields=["user", "-id"], name="archived_notif_user_idx"),
+        ]
+
+    def __str__(self):
+        """
+        Return a string representation of the archived notification.
+
+        Returns:
+            str: String representation of the archived notification.
+        """
+        return f"{self.user} - {self.payload.get('message', '')} - {self.status}"
+
+    @property
+    def payload(self):
+        """
+        Notification data of the notification, read from the shared message
+        when the notification has one.
+        """
+        if self.message_id:
+            return self.message.notification
+        return self.notification
+
+    def get_archivable_notifications(self, older_than_days: int = None):
+        """
+        Get the notifications to archive: the ones in the archived statuses,
+        and the ones older than ``older_than_days`` except the active unread
+        ones, which stay in the inbox until they are read.
+
+        Returns:
+            QuerySet: Archivable notifications ordered by id.
+        """
+        if older_than_days is None:
+            older_than_days = NOTIFICATION_ARCHIVE_AFTER_DAYS
+        cutoff = timezone.now() - timedelta(days=older_than_days)
+
+        return Notification.objects.filter(
+            Q(status__in=NOTIFICATION_ARCHIVE_STATUSES)
+            | (
+                Q(created_at__lt=cutoff)
+                & ~Q(status=NotificationsStatus.ACTIVE, is_read=False)
+            )
+        ).order_by("pk")
+
+    def archive_notifications(self, notifications: QuerySet):
+        """
+        Move the notifications to the archive in a single transaction.
+
+        The rows are copied with ``bulk_create`` and removed with a raw delete,
+        so no per-row signal is sent. The counters are updated by the archived
+        active rows, and the affected users are refreshed once.
+
+        Returns:
+            int: Number of archived notifications.
+
+        Raises:
+            IntegrityError: If a row is already archived, nothing is removed.
+        """
+        from notifications.utils import (
+            refresh_users_notifications,
+            get_removed_notification_events,
+        )
+
+        field_names = [field.attname for field in Notification._meta.concrete_fields]
+
+        with transaction.atomic():
+            rows = list(
+                notifications.select_for_update().order_by().values(*field_names)
+            )
+            if not rows:
+                return 0
+
+            self.__class__.objects.bulk_create([self.__class__(**row) for row in rows])
+            queryset = Notification.objects.filter(pk__in=[row["id"] for row in rows])
+            queryset._raw_delete(queryset.db)
+
+            deltas = NotificationCounter.get_removal_deltas(notifications=rows)
+            NotificationCounter().apply_deltas(deltas=deltas)
+
+            # Only archived active rows leave an inbox
+            user_ids = [user_id for user_id, delta in deltas.items() if any(delta)]
+            if user_ids:
+                refresh_users_notifications(
+                    user_ids=user_ids, events=get_removed_notification_events(rows)
+                )
+
+        # Archived rows reference the messages too, only unreferenced ones go
+        NotificationMessage().delete_unused_messages(
+            message_ids=[row["message_id"] for row in rows]
+        )
+
+        return len(rows)
+
+    def get_user_archived_notifications(self, user):
+        """
+        Retrieve the archived notifications of the user, the opt-in read path
+        of notifications that left the inbox.
+
+        Returns:
+            QuerySet: Archived notifications of the user, newest first.
+
+        Raises:
+            ValueError: If notifications are not enabled for the user.
+        """
+        if not NotificationSettings().is_user_enable_notification(user=user):
+            raise ValueError("Notifications are not enabled for the current user.")
+
+        return (
+            self.__class__.objects.filter(user_id=user.pk)
+            .select_related("user", "created_by", "message")
+            .order_by("-pk")
+        )
 
 
 class NotificationSettings(BaseModel):
@@ -221,8 +1385,350 @@ class NotificationSettings(BaseModel):
         return f"{self.user.username} - Notifications Enabled: {self.is_enable_notification}"
 
     def is_user_enable_notification(self, user):
-        """ Check if notifications are enabled for the user """
-        try:
-            return self.__class__.objects.get(user=user).is_enable_notification
-        except self.__class__.DoesNotExist:
-            raise ValueError("Notification settings instance missing for this user")
+        """
+        Check if notifications are enabled for the user.
+
+        The flag is memoized on the user instance, which lives for one request
+        or task, and shared through the cache until the settings change.
+        """
+        if hasattr(user, "_is_enable_notification"):
+            return user._is_enable_notification
+
+        cache_key = self.get_cache_key(user_id=user.pk)
+        is_enable_notification = cache.get(cache_key)
+
+        if is_enable_notification is None:
+            try:
+                is_enable_notification = self.__class__.objects.values_list(
+                    "is_enable_notification", flat=True
+                ).get(user_id=user.pk)
+            except self.__class__.DoesNotExist:
+                raise ValueError("Notification settings instance missing for this user")
+
+            cache.set(
+                cache_key, is_enable_notification, NOTIFICATION_SETTINGS_CACHE_TIMEOUT
+            )
+
+        user._is_enable_notification = is_enable_notification
+        return is_enable_notification
+
+    async def ais_user_enable_notification(self, user):
+        """Async version of ``is_user_enable_notification``"""
+        if hasattr(user, "_is_enable_notification"):
+            return user._is_enable_notification
+
+        cache_key = self.get_cache_key(user_id=user.pk)
+        is_enable_notification = await cache.aget(cache_key)
+
+        if is_enable_notification is None:
+            try:
+                is_enable_notification = await self.__class__.objects.values_list(
+                    "is_enable_notification", flat=True
+                ).aget(user_id=user.pk)
+            except self.__class__.DoesNotExist:
+                raise ValueError("Notification settings instance missing for this user")
+
+            await cache.aset(
+                cache_key, is_enable_notification, NOTIFICATION_SETTINGS_CACHE_TIMEOUT
+            )
+
+        user._is_enable_notification = is_enable_notification
+        return is_enable_notification
+
+    def invalidate_cache(self):
+        """ Invalidate the cached and memoized settings of the user """
+        cache.delete(self.get_cache_key(user_id=self.user_id))
+
+        if self.__class__.user.is_cached(self):
+            self.user.__dict__.pop("_is_enable_notification", None)
+
+    @staticmethod
+    def get_cache_key(user_id):
+        """ Get the cache key of the user's notification settings """
+        return f"notif:{user_id}:settings"
+
+
+class NotificationCounter(BaseModel):
+    """Model to store denormalized notification counts of a user."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        related_name="notification_counter",
+        verbose_name="User",
+    )
+    # Number of active notifications of the user.
+    total_notifications = models.IntegerField(
+        default=0, help_text="Number of active notifications of the user."
+    )
+    # Number of active unread notifications of the user.
+    unread_notifications = models.IntegerField(
+        default=0, help_text="Number of active unread notifications of the user."
+    )
+
+    class Meta:
+        verbose_name = "Notification Counter"
+        verbose_name_plural = "Notification Counters"
+
+    def __str__(self):
+        """
+        Return a string representation of the notification counter
+
+        Returns:
+            str: String representation of the notification counter
+        """
+        return f"{self.user} - {self.unread_notifications}/{self.total_notifications}"
+
+    def get_user_counts(self, user):
+        """
+        Get the notification counts of the user, rebuilding a missing counter.
+
+        Returns:
+            dict: Total, read and unread notifications count of the user.
+        """
+        counts = (
+            self.__class__.objects.filter(user_id=user.pk)
+            .values("total_notifications", "unread_notifications")
+            .first()
+        )
+        if counts is None:
+            self.create_missing_counters(user_ids=[user.pk])
+            counts = (
+                self.__class__.objects.filter(user_id=user.pk)
+                .values("total_notifications", "unread_notifications")
+                .get()
+            )
+
+        if NOTIFICATION_EXPIRY:
+            counts = self.subtract_expired_counts(
+                counts=counts,
+                expired_counts=self.get_expired_counts_queryset(user=user).aggregate(
+                    **self.get_count_aggregates()
+                ),
+            )
+
+        return self.build_user_counts(counts=counts)
+
+    async def aget_user_counts(self, user):
+        """Async version of ``get_user_counts``"""
+        counts = await (
+            self.__class__.objects.filter(user_id=user.pk)
+            .values("total_notifications", "unread_notifications")
+            .afirst()
+        )
+        if counts is None:
+            # Rebuilding writes the counter, keep it on the sync path
+            return await sync_to_async(self.get_user_counts)(user=user)
+
+        if NOTIFICATION_EXPIRY:
+            counts = self.subtract_expired_counts(
+                counts=counts,
+                expired_counts=await self.get_expired_counts_queryset(
+                    user=user
+                ).aaggregate(**self.get_count_aggregates()),
+            )
+
+        return self.build_user_counts(counts=counts)
+
+    @staticmethod
+    def build_user_counts(counts: dict):
+        """Build the total, read and unread counts from the stored counts"""
+        return {
+            "total_notifications": counts["total_notifications"],
+            "read_notifications": counts["total_notifications"]
+            - counts["unread_notifications"],
+            "unread_notifications": counts["unread_notifications"],
+        }
+
+    @staticmethod
+    def get_count_aggregates():
+        """Get the aggregates of the total and unread notifications count"""
+        return {
+            "total_notifications": Count("id"),
+            "unread_notifications": Count(Case(When(is_read=False, then=1))),
+        }
+
+    @staticmethod
+    def get_expired_counts_queryset(user):
+        """
+        Get the expired active notifications of the user not swept yet, read
+        through the partial expiry index.
+        """
+        return Notification().get_expired_notifications().filter(user_id=user.pk)
+
+    @staticmethod
+    def subtract_expired_counts(counts: dict, expired_counts: dict):
+        """Subtract the counts of the expired notifications from the stored counts"""
+        return {
+            field: counts[field] - expired_counts[field]
+            for field in ("total_notifications", "unread_notifications")
+        }
+
+    def apply_deltas(self, deltas: dict):
+        """
+        Add ``{user_id: (total, unread)}`` deltas to the counters with F-expressions.
+
+        The deltas are applied after the write they count, in its transaction.
+        Users sharing the same delta are updated in a single statement. Missing
+        counters are created from the notifications, which already include the
+        write, so their delta is not added again.
+        """
+        deltas = {
+            user_id: delta
+            for user_id, delta in deltas.items()
+            if user_id is not None and any(delta)
+        }
+        created_user_ids = self.create_missing_counters(user_ids=list(deltas))
+
+        users_by_delta = defaultdict(list)
+        for user_id, delta in deltas.items():
+            if user_id not in created_user_ids:
+                users_by_delta[tuple(delta)].append(user_id)
+
+        for (total, unread), user_ids in users_by_delta.items():
+            self.__class__.objects.filter(user_id__in=user_ids).update(
+                total_notifications=F("total_notifications") + total,
+                unread_notifications=F("unread_notifications") + unread,
+                updated_at=timezone.now(),
+            )
+
+    def get_update_deltas(self, notifications: QuerySet, **fields):
+        """
+        Get the counter deltas of applying ``fields`` to the notifications.
+
+        Returns:
+            dict: ``{user_id: (total, unread)}`` deltas of the affected users.
+        """
+        deltas = defaultdict(lambda: (0, 0))
+        grouped_notifications = (
+            notifications.order_by()
+            .values("user_id", "status", "is_read")
+            .annotate(count=Count("id"))
+        )
+        for group in grouped_notifications:
+            previous_total, previous_unread = Notification.get_counter_contribution(
+                status=group["status"], is_read=group["is_read"]
+            )
+            total, unread = Notification.get_counter_contribution(
+                status=fields.get("status", group["status"]),
+                is_read=fields.get("is_read", group["is_read"]),
+            )
+            delta = deltas[group["user_id"]]
+            deltas[group["user_id"]] = (
+                delta[0] + (total - previous_total) * group["count"],
+                delta[1] + (unread - previous_unread) * group["count"],
+            )
+
+        return dict(deltas)
+
+    @staticmethod
+    def get_removal_deltas(notifications):
+        """
+        Get the counter deltas of removing notification rows from the table,
+        given as dicts with their ``user_id``, ``status`` and ``is_read``.
+
+        Returns:
+            dict: ``{user_id: (total, unread)}`` deltas of the affected users.
+        """
+        deltas = defaultdict(lambda: (0, 0))
+        for notification in notifications:
+            total, unread = Notification.get_counter_contribution(
+                status=notification["status"], is_read=notification["is_read"]
+            )
+            delta = deltas[notification["user_id"]]
+            deltas[notification["user_id"]] = (delta[0] - total, delta[1] - unread)
+
+        return dict(deltas)
+
+    def create_missing_counters(self, user_ids):
+        """
+        Create the counters of the users that have none from their notifications.
+
+        The users are locked first, so a counter is only created by one
+        transaction. A transaction that waited on the lock finds the counter
+        and adds its delta to it instead of overwriting it with its own counts.
+
+        Returns:
+            set: Ids of the users whose counter was created.
+        """
+        user_ids = set(user_ids) - set(
+            self.__class__.objects.filter(user_id__in=user_ids).values_list(
+                "user_id", flat=True
+            )
+        )
+        if not user_ids:
+            return set()
+
+        with transaction.atomic():
+            list(
+                User.objects.select_for_update()
+                .filter(pk__in=user_ids)
+                .order_by("pk")
+                .values_list("pk", flat=True)
+            )
+            user_ids -= set(
+                self.__class__.objects.filter(user_id__in=user_ids).values_list(
+                    "user_id", flat=True
+                )
+            )
+            if user_ids:
+                self.__class__.objects.bulk_create(
+                    [
+                        self.__class__(user_id=user_id, **user_counts)
+                        for user_id, user_counts in self.get_rebuilt_counts(
+                            user_ids=user_ids
+                        ).items()
+                    ]
+                )
+
+        return user_ids
+
+    def rebuild_counters(self, user_ids):
+        """
+        Recompute the counters of the given users from their notifications,
+        overwriting the stored counts. Used to repair drifted counters.
+
+        Returns:
+            dict: Rebuilt counts keyed by user id.
+        """
+        counts = self.get_rebuilt_counts(user_ids=user_ids)
+
+        self.__class__.objects.bulk_create(
+            [
+                self.__class__(user_id=user_id, **user_counts)
+                for user_id, user_counts in counts.items()
+            ],
+            update_conflicts=True,
+            unique_fields=["user"],
+            update_fields=[
+                "total_notifications",
+                "unread_notifications",
+                "updated_at",
+            ],
+        )
+
+        return counts
+
+    def get_rebuilt_counts(self, user_ids):
+        """
+        Count the active and unread notifications of the given users.
+
+        Returns:
+            dict: Counts keyed by user id.
+        """
+        counts = {
+            user_id: {"total_notifications": 0, "unread_notifications": 0}
+            for user_id in user_ids
+        }
+        aggregated_counts = (
+            Notification.objects.filter(
+                user_id__in=user_ids, status=NotificationsStatus.ACTIVE
+            )
+            .order_by()
+            .values("user_id")
+            .annotate(**self.get_count_aggregates())
+        )
+        for aggregated_count in aggregated_counts:
+            counts[aggregated_count.pop("user_id")] = aggregated_count
+
+        return counts
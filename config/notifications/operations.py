@@ -0,0 +1,40 @@
+"""Migration operations for notification"""
+
+from django.db import migrations
+
+
+class AddIndexConcurrently(migrations.AddIndex):
+    """
+    Add an index without blocking writes to the table on PostgreSQL, and
+    with a plain ``CREATE INDEX`` on the other backends.
+
+    ``CREATE INDEX CONCURRENTLY`` cannot run inside a transaction, so the
+    migration using it must set ``atomic = False``.
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        model = to_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.add_index(schema_editor, model, self.index)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        model = from_state.apps.get_model(app_label, self.model_name)
+        if self.allow_migrate_model(schema_editor.connection.alias, model):
+            self.remove_index(schema_editor, model, self.index)
+
+    def describe(self):
+        return f"Concurrently {super().describe().lower()}"
+
+    @staticmethod
+    def add_index(schema_editor, model, index):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.add_index(model, index, concurrently=True)
+        else:
+            schema_editor.add_index(model, index)
+
+    @staticmethod
+    def remove_index(schema_editor, model, index):
+        if schema_editor.connection.vendor == "postgresql":
+            schema_editor.remove_index(model, index, concurrently=True)
+        else:
+            schema_editor.remove_index(model, index)
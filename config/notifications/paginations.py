@@ -1,6 +1,20 @@
+from django.conf import settings
+
 from rest_framework import pagination
 
+NOTIFICATION_CURSOR_ORDERING = getattr(settings, "NOTIFICATION_CURSOR_ORDERING", "-id")
+
+
 class CustomPagination(pagination.PageNumberPagination):
     page_size = 25
     page_size_query_param = 'page_size'
-    max_page_size = 100
\ No newline at end of file
+    max_page_size = 100
+
+
+class CustomCursorPagination(pagination.CursorPagination):
+    """Keyset pagination without OFFSET scans or COUNT queries"""
+
+    page_size = 25
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = NOTIFICATION_CURSOR_ORDERING
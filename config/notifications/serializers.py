@@ -6,10 +6,22 @@ from django.contrib.auth import get_user_model
 
 from rest_framework import serializers
 
-from notifications.models import Notification
+from notifications.models import (
+    Notification,
+    ArchivedNotification,
+    BroadcastNotification,
+    NOTIFICATION_BROADCASTS,
+)
 from notifications.choices import NotificationsStatus, NotificationsActionChoices
 
 User = get_user_model()
+# State of a broadcast for the user after each action
+BROADCAST_ACTION_FIELDS = {
+    NotificationsActionChoices.MARK_ALL_AS_READ: {"is_read": True},
+    NotificationsActionChoices.MARK_AS_READ: {"is_read": True},
+    NotificationsActionChoices.REMOVED_ALL: {"status": NotificationsStatus.REMOVED},
+    NotificationsActionChoices.MARK_AS_REMOVED: {"status": NotificationsStatus.REMOVED},
+}
 
 def get_user_serializer():
     # Get the serializer path from settings, fallback to PrimaryKeyRelatedField
@@ -39,6 +51,7 @@ class NotificationSerializer(serializers.ModelSerializer):
 
     user = get_user_serializer()(read_only=True)
     created_by = get_user_serializer()(read_only=True)
+    notification = serializers.JSONField(source="payload", read_only=True)
 
     class Meta:
         model = Notification
@@ -51,6 +64,7 @@ class NotificationSerializer(serializers.ModelSerializer):
             "custom_info",
             "created_by",
             "status",
+            "expires_at",
             "created_at",
             "updated_at",
         ]
@@ -74,6 +88,32 @@ class NotificationSerializer(serializers.ModelSerializer):
     #     return validated_data
 
 
+class ArchivedNotificationSerializer(serializers.ModelSerializer):
+    """Serializer for archived notification"""
+
+    user = get_user_serializer()(read_only=True)
+    created_by = get_user_serializer()(read_only=True)
+    notification = serializers.JSONField(source="payload", read_only=True)
+
+    class Meta:
+        model = ArchivedNotification
+        fields = [
+            "id",
+            "uid",
+            "user",
+            "notification",
+            "is_read",
+            "custom_info",
+            "created_by",
+            "status",
+            "expires_at",
+            "created_at",
+            "updated_at",
+            "archived_at",
+        ]
+        read_only_fields = fields
+
+
 class UserNotificationListWithCountSerializer(serializers.Serializer):
     """Serializer for user notification with count instance"""
 
@@ -81,6 +121,9 @@ class UserNotificationListWithCountSerializer(serializers.Serializer):
     read_notifications = serializers.IntegerField(min_value=0, read_only=True)
     unread_notifications = serializers.IntegerField(min_value=0, read_only=True)
     notifications = NotificationSerializer(many=True, read_only=True)
+    # Only present for cursor pagination
+    next = serializers.CharField(read_only=True)
+    previous = serializers.CharField(read_only=True)
     action_choice = serializers.ChoiceField(
         choices=NotificationsActionChoices.choices,
         default=NotificationsActionChoices.UNDEFINED,
@@ -109,28 +152,32 @@ class UserNotificationListWithCountSerializer(serializers.Serializer):
         return attrs
 
     def update(self, instance, validated_data):
+        self.apply_action(
+            user=self.context["request"].user,
+            action_choice=validated_data.get("action_choice"),
+            notification_uids=validated_data.get("notification_uids", []),
+        )
+
+        return validated_data
+
+    def apply_action(self, user, action_choice, notification_uids=None):
+        """Apply the action to the user's notifications, return the updated count"""
         from notifications.utils import (
             update_notification_read_status,
             update_notification_status,
         )
 
-        action_choice = validated_data.get("action_choice")
-        notifications = instance["notifications"]
-        notification_uids = validated_data.get("notification_uids", [])
-        user = self.context["request"].user
+        updated = 0
 
         # Mark all as read
         if action_choice == NotificationsActionChoices.MARK_ALL_AS_READ:
             # Update all notifications as read status
             notifications = (
-                Notification()
-                .get_active_notifications()
-                .filter(
-                    user=user,
-                    is_read=False,
-                )
+                Notification().get_active_notifications().filter(is_read=False)
+            )
+            updated = update_notification_read_status(
+                notifications=notifications, user=user
             )
-            update_notification_read_status(notifications=notifications)
 
         # Mark as read all selected notifications
         elif action_choice == NotificationsActionChoices.MARK_AS_READ:
@@ -140,14 +187,18 @@ class UserNotificationListWithCountSerializer(serializers.Serializer):
                 .get_active_notifications()
                 .filter(uid__in=notification_uids, is_read=False)
             )
-            update_notification_read_status(notifications=notifications)
+            updated = update_notification_read_status(
+                notifications=notifications, user=user
+            )
 
         # Removed all notifications
         elif action_choice == NotificationsActionChoices.REMOVED_ALL:
             # Remove all notifications
-            notifications = Notification().get_active_notifications().filter(user=user)
-            update_notification_status(
-                notifications=notifications, status=NotificationsStatus.REMOVED
+            notifications = Notification().get_active_notifications()
+            updated = update_notification_status(
+                notifications=notifications,
+                status=NotificationsStatus.REMOVED,
+                user=user,
             )
 
         # Mark as removed all selected notifications
@@ -158,8 +209,22 @@ class UserNotificationListWithCountSerializer(serializers.Serializer):
                 .get_active_notifications()
                 .filter(uid__in=notification_uids)
             )
-            update_notification_status(
-                notifications=notifications, status=NotificationsStatus.REMOVED
+            updated = update_notification_status(
+                notifications=notifications,
+                status=NotificationsStatus.REMOVED,
+                user=user,
             )
 
-        return validated_data
+        # Broadcasts keep the user's state as sparse overrides
+        if NOTIFICATION_BROADCASTS and action_choice in BROADCAST_ACTION_FIELDS:
+            is_selected = action_choice in [
+                NotificationsActionChoices.MARK_AS_READ,
+                NotificationsActionChoices.MARK_AS_REMOVED,
+            ]
+            updated += BroadcastNotification().apply_user_state(
+                user=user,
+                uids=notification_uids if is_selected else None,
+                **BROADCAST_ACTION_FIELDS[action_choice],
+            )
+
+        return updated
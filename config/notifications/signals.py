@@ -1,37 +1,138 @@
-from django.db.models.signals import post_save, post_delete
-from django.dispatch import receiver
+from django.apps import apps
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from django.dispatch import receiver, Signal
 from django.contrib.auth import get_user_model
-from django.core.cache import cache
 
-from notifications.models import NotificationSettings, Notification
+from notifications.models import (
+    NotificationSettings,
+    Notification,
+    NotificationCounter,
+    BroadcastNotification,
+)
 from notifications.utils import (
-    add_user_notification_to_group,
+    refresh_broadcasts,
+    refresh_users_notifications,
+    refresh_user_notification_change,
+    get_notification_change,
+    get_notification_events,
+    track_m2m_changes,
+    reset_tracked_m2m_changes,
 )
 
-from channels.layers import get_channel_layer
-
-# Get the channel layer
-channel_layer = get_channel_layer()
+from dirtyfields import DirtyFieldsMixin
 
 User = get_user_model()
 
+# Sent once after a set-based update of notifications with ``user_ids``, ``fields``,
+# the change ``events`` of the users in delta push mode and the write-through
+# cache ``changes`` of the users
+notification_bulk_change = Signal()
+
 
 @receiver(post_save, sender=User)
 def create_notification_settings(sender, instance, created, **kwargs):
     """Handles the post_save signal for User instances."""
     if created:
         NotificationSettings.objects.create(user=instance)
+        NotificationCounter.objects.create(user=instance)
+
+
+@receiver(post_save, sender=NotificationSettings)
+@receiver(post_delete, sender=NotificationSettings)
+def notification_settings_change(sender, instance, **kwargs):
+    """Handles the post_save and post_delete signals for NotificationSettings instances."""
+    instance.invalidate_cache()
+
+
+@receiver(post_delete, sender=Notification)
+def notification_delete(sender, instance, **kwargs):
+    """Handles the post_delete signal to keep the user's counter in sync."""
+    total, unread = Notification.get_counter_contribution(
+        status=instance.status, is_read=instance.is_read
+    )
+    NotificationCounter().apply_deltas(deltas={instance.user_id: (-total, -unread)})
 
 
 @receiver(post_save, sender=Notification)
 @receiver(post_delete, sender=Notification)
-def notification_change(sender, instance, **kwargs):
+def notification_change(sender, instance, signal, using=None, created=False, **kwargs):
     """Handles the post_save and post_delete signals for Notification instances."""
-    if instance.user:
-        user = instance.user
+    if instance.user_id:
+        deleted = signal is post_delete
+        change = get_notification_change(
+            instance=instance, created=created, deleted=deleted
+        )
+        events = get_notification_events(
+            instance=instance, created=created, deleted=deleted
+        )
+
+        # Refresh cache for the user and push once the transaction commits
+        refresh_user_notification_change(
+            instance=instance, change=change, using=using, events=events
+        )
+
+
+@receiver(post_save, sender=BroadcastNotification)
+@receiver(post_delete, sender=BroadcastNotification)
+def broadcast_change(sender, instance, using=None, **kwargs):
+    """Handles the post_save and post_delete signals for BroadcastNotification instances."""
+    refresh_broadcasts(using=using)
+
+
+@receiver(notification_bulk_change, sender=Notification)
+def notification_bulk_change_handler(
+    sender, user_ids, events=None, changes=None, **kwargs
+):
+    """Handles the bulk change signal for set-based Notification updates."""
+    refresh_users_notifications(user_ids=user_ids, events=events, changes=changes)
+
+
+def m2m_change_tracker(sender, instance, action, reverse, pk_set, **kwargs):
+    """Handles the m2m_changed signal to track changes of DirtyFieldsMixin instances."""
+    if reverse or not isinstance(instance, DirtyFieldsMixin):
+        return
+
+    if action not in ["post_add", "post_remove", "pre_clear"]:
+        return
+
+    for field in instance._meta.many_to_many:
+        if field.remote_field.through is sender:
+            # Clearing does not provide the removed primary keys
+            if action == "pre_clear":
+                pk_set = set(
+                    getattr(instance, field.name).values_list("pk", flat=True)
+                )
+            track_m2m_changes(
+                instance=instance,
+                field_name=field.name,
+                action=action,
+                pk_set=set(pk_set),
+            )
+
+
+def m2m_change_tracker_reset(sender, instance, **kwargs):
+    """Handles the post_save signal to reset the tracked M2M changes."""
+    reset_tracked_m2m_changes(instance=instance)
+
+
+def connect_m2m_change_tracker(model):
+    """
+    Connect the M2M change tracker to a DirtyFieldsMixin model, scoped to the
+    model and its through models instead of every save of the project.
+    """
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(
+            m2m_change_tracker,
+            sender=field.remote_field.through,
+            dispatch_uid="m2m_change_tracker",
+        )
+    post_save.connect(
+        m2m_change_tracker_reset,
+        sender=model,
+        dispatch_uid="m2m_change_tracker_reset",
+    )
 
-        # Add user notification to group
-        add_user_notification_to_group(user=user, channel_layer=channel_layer)
 
-        # Remove cache for the user
-        cache.delete(user.id)
+for model in apps.get_models():
+    if issubclass(model, DirtyFieldsMixin):
+        connect_m2m_change_tracker(model)
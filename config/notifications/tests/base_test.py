@@ -1,3 +1,5 @@
+from django.core.cache import cache
+
 from rest_framework.test import APITestCase, APIClient
 
 from notifications.serializers import get_user_serializer
@@ -10,6 +12,9 @@ class BaseTest(APITestCase):
     """Create a base test class to use multiple places"""
 
     def setUp(self):
+        # Clear the cache, it outlives the rolled back test transactions
+        cache.clear()
+
         # Set up a test client
         self.client = APIClient()
 
@@ -0,0 +1,225 @@
+import json
+import sys
+import timeit
+from unittest import mock, skipUnless
+
+import jsonschema
+from django.contrib.auth.models import Group
+from django.core.exceptions import ValidationError
+from django.db import connection
+from django.test import SimpleTestCase
+
+from notifications.models import Notification
+from notifications.schema_validations import NOTIFICATION_SCHEMA
+from notifications.utils import (
+    get_notification_validator,
+    validate_notification,
+    validate_notifications,
+    handle_many_to_many_field_comparison,
+)
+
+from . import base_test
+
+
+@skipUnless(connection.vendor == "sqlite", "Query plans are asserted for SQLite")
+class TestNotificationQueryPlans(base_test.BaseTest):
+    """Benchmark case for the inbox query plans"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.user_notifications = (
+            Notification().get_current_user_notifications(user=self.user)["notifications"]
+        )
+
+    def assert_index_range_scan(self, queryset, index_names, covering=False):
+        """Assert the query searches one of the index ranges and does not sort"""
+        plan = queryset.explain()
+
+        index_scans = [
+            f"USING {'COVERING ' if covering else ''}INDEX {index_name}"
+            for index_name in index_names
+        ]
+        self.assertTrue(any(index_scan in plan for index_scan in index_scans), plan)
+        self.assertIn("SEARCH", plan)
+        self.assertNotIn("USE TEMP B-TREE", plan)
+
+    def test_inbox_query_uses_composite_index(self):
+        """Benchmark case for the inbox list query"""
+
+        self.assert_index_range_scan(
+            self.user_notifications, ["notification_user_status_idx"]
+        )
+        self.assert_index_range_scan(
+            self.user_notifications.values_list("id", flat=True),
+            ["notification_user_status_idx"],
+            covering=True,
+        )
+
+    def test_read_filter_query_uses_composite_index(self):
+        """Benchmark case for the inbox list query filtered by read status"""
+
+        # The read filter of the inbox seeks the (user, status, is_read, -id) range
+        for is_read in [True, False]:
+            self.assert_index_range_scan(
+                Notification.filter_by_read_status(
+                    self.user_notifications, is_read=is_read
+                ),
+                ["notification_user_read_idx"],
+            )
+            self.assertIn(
+                "notification_user_read_idx (user_id=? AND status=? AND is_read=?)",
+                Notification.filter_by_read_status(
+                    self.user_notifications, is_read=is_read
+                ).explain(),
+            )
+
+    def test_unread_partial_index_exists(self):
+        """Benchmark case for the partial index of unread notifications"""
+
+        with connection.cursor() as cursor:
+            constraints = connection.introspection.get_constraints(
+                cursor, Notification._meta.db_table
+            )
+
+        self.assertIn("notification_user_unread_idx", constraints)
+        self.assertEqual(
+            constraints["notification_user_unread_idx"]["columns"], ["user_id", "id"]
+        )
+
+
+class TestNotificationValidationBenchmark(SimpleTestCase):
+    """Microbenchmark case for the notification schema validation"""
+
+    iterations = 200
+
+    def setUp(self):
+        self.notification_data = {
+            "message": "This is a test notification",
+            "model": "User",
+            "instance": {"id": 1, "email": "test1@gmail.com"},
+            "method": "POST",
+            "changed_data": {},
+        }
+
+    def legacy_validate_notification(self, notification_data):
+        """Validation as done before the validator was precompiled"""
+        jsonschema.validate(instance=notification_data, schema=NOTIFICATION_SCHEMA)
+
+    def test_precompiled_validator_timings(self):
+        """Microbenchmark case comparing the legacy and precompiled validation"""
+
+        # Both paths accept and reject the same payloads
+        invalid_notification_data = {**self.notification_data, "method": "INVALID"}
+        self.legacy_validate_notification(self.notification_data)
+        validate_notification(self.notification_data)
+        with self.assertRaises(jsonschema.ValidationError):
+            self.legacy_validate_notification(invalid_notification_data)
+        with self.assertRaises(ValueError):
+            validate_notification(invalid_notification_data)
+
+        timings = {
+            "legacy": timeit.timeit(
+                lambda: self.legacy_validate_notification(self.notification_data),
+                number=self.iterations,
+            ),
+            "precompiled": timeit.timeit(
+                lambda: validate_notification(self.notification_data),
+                number=self.iterations,
+            ),
+            "batch": timeit.timeit(
+                lambda: validate_notifications(
+                    [self.notification_data] * self.iterations
+                ),
+                number=1,
+            ),
+        }
+
+        # Timings are reported, not asserted, they depend on the machine
+        sys.stderr.write(
+            f"\nValidation of {self.iterations} notifications: "
+            + ", ".join(f"{name} {elapsed:.4f}s" for name, elapsed in timings.items())
+            + "\n"
+        )
+
+    def test_validator_is_compiled_once(self):
+        """Microbenchmark case for the precompiled validator"""
+
+        get_notification_validator.cache_clear()
+
+        with mock.patch("notifications.utils.jsonschema.validate") as mock_validate:
+            for _ in range(self.iterations):
+                validate_notification(self.notification_data)
+            validate_notifications([self.notification_data] * self.iterations)
+
+        # The schema is checked and compiled once, every other call reuses it
+        cache_info = get_notification_validator.cache_info()
+        self.assertEqual(cache_info.misses, 1)
+        self.assertEqual(cache_info.hits, self.iterations)
+        mock_validate.assert_not_called()
+
+    def test_validate_notifications_rejects_invalid_payload(self):
+        """Test case for the batch validation of notifications"""
+
+        invalid_notification_data = {**self.notification_data, "method": "INVALID"}
+
+        validate_notifications([self.notification_data] * 3)
+        with self.assertRaises(ValueError):
+            validate_notifications([self.notification_data, invalid_notification_data])
+        with self.assertRaises(ValidationError):
+            validate_notification(invalid_notification_data, use_for_model=True)
+
+
+class TestManyToManyComparisonBenchmark(base_test.BaseTest):
+    """Benchmark case for the many to many field comparison"""
+
+    total_members = 10000
+    max_ids = 100
+
+    def setUp(self):
+        super().setUp()
+
+        groups = Group.objects.bulk_create(
+            [Group(name=f"group_{index}") for index in range(self.total_members + 10)]
+        )
+
+        # Both relations hold 10k members and differ by 10 on each side
+        self.user.groups.add(*groups[: self.total_members])
+        self.user2.groups.add(*groups[10:])
+
+    def test_pk_only_comparison_on_large_relation(self):
+        """Benchmark case for the pk only comparison of 10k+ members"""
+
+        changed_data = handle_many_to_many_field_comparison(
+            {}, self.user2, self.user
+        )
+
+        # One primary key query for each side of every many to many field
+        with self.assertNumQueries(2 * len(self.user._meta.many_to_many)):
+            pk_changed_data = handle_many_to_many_field_comparison(
+                {}, self.user2, self.user, pk_only=True, max_ids=self.max_ids
+            )
+
+        groups = pk_changed_data["groups"]
+        self.assertEqual(groups["added_count"], 10)
+        self.assertEqual(groups["removed_count"], 10)
+        self.assertEqual(len(groups["added"]), 10)
+
+        # The pk only payload is a fraction of the full rows payload
+        payload_size = len(json.dumps(changed_data, default=str))
+        pk_payload_size = len(json.dumps(pk_changed_data))
+        self.assertLess(pk_payload_size * 100, payload_size)
+
+    def test_pk_only_comparison_caps_ids(self):
+        """Benchmark case for capping the ids stored in the payload"""
+
+        self.user2.groups.clear()
+
+        pk_changed_data = handle_many_to_many_field_comparison(
+            {}, self.user2, self.user, pk_only=True, max_ids=self.max_ids
+        )
+
+        groups = pk_changed_data["groups"]
+        self.assertIsNone(groups["added"])
+        self.assertEqual(len(groups["removed"]), self.max_ids)
+        self.assertEqual(groups["removed_count"], self.total_members)
@@ -0,0 +1,255 @@
+import json
+from datetime import timedelta
+from unittest import mock
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from rest_framework import status
+
+from notifications.choices import NotificationsActionChoices
+from notifications.models import (
+    Notification,
+    BroadcastNotification,
+    BroadcastNotificationState,
+)
+from notifications.serializers import get_user_serializer
+from notifications.utils import create_notification_json, aget_user_notification_page
+
+from . import urlhelpers, base_test, test_helpers
+
+from asgiref.sync import async_to_sync
+
+
+class TestBroadcastNotification(base_test.BaseTest):
+    """Test case for broadcasts merged into the inbox at read time"""
+
+    def setUp(self):
+        for target in [
+            "notifications.models.NOTIFICATION_BROADCASTS",
+            "notifications.utils.NOTIFICATION_BROADCASTS",
+            "notifications.serializers.NOTIFICATION_BROADCASTS",
+        ]:
+            patcher = mock.patch(target, True)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        super().setUp()
+
+        self.notification_data = create_notification_json(
+            message="This is a broadcast",
+            method="POST",
+            instance=self.user,
+            serializer=get_user_serializer(),
+        )
+        total_notifications = Notification.objects.count()
+        self.broadcast = BroadcastNotification().send_broadcast(
+            notification_data=self.notification_data
+        )
+
+        # Sending is a single row whatever the number of users
+        self.assertEqual(Notification.objects.count(), total_notifications)
+
+        # Notifications sent after the broadcast are placed above it
+        self.total_newer_notification = 3
+        for _ in range(self.total_newer_notification):
+            Notification().create_notification_for_users(
+                notification_data=self.notification_data, users=self.user
+            )
+
+    def get_inbox_uids(self, user):
+        inbox = Notification().get_current_user_notifications(user=user)
+        return [str(notification.uid) for notification in inbox["notifications"]]
+
+    def test_inbox_merges_broadcast_in_order(self):
+        """Test case for counts, ordering and slicing of the merged inbox"""
+
+        inbox = Notification().get_current_user_notifications(user=self.user)
+        total = self.total_created_notification + self.total_newer_notification + 1
+        self.assertEqual(inbox["total_notifications"], total)
+        self.assertEqual(inbox["unread_notifications"], total)
+        self.assertEqual(inbox["notifications"].count(), total)
+
+        uids = self.get_inbox_uids(user=self.user)
+        self.assertEqual(
+            uids.index(str(self.broadcast.uid)), self.total_newer_notification
+        )
+
+        # Every page of the merged inbox matches the merged order
+        for start in range(0, total, 4):
+            page = inbox["notifications"].all()[start : start + 4]
+            self.assertEqual(
+                [str(notification.uid) for notification in page],
+                uids[start : start + 4],
+            )
+
+    def test_inbox_places_broadcasts_in_one_query(self):
+        """Test case for the merged positions counted in a single query"""
+
+        for _ in range(3):
+            BroadcastNotification().send_broadcast(
+                notification_data=self.notification_data
+            )
+        inbox = Notification().get_current_user_notifications(user=self.user)
+
+        with CaptureQueriesContext(connection) as context:
+            page = inbox["notifications"].all()[0:4]
+
+        # One query places every broadcast, one fetches the notifications,
+        # ignoring the profiler's EXPLAIN queries
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if not query["sql"].startswith("EXPLAIN")
+        ]
+        self.assertEqual(len(statements), 2)
+        self.assertEqual(
+            [str(notification.uid) for notification in page],
+            self.get_inbox_uids(user=self.user)[0:4],
+        )
+
+    def test_inbox_leaves_out_old_broadcasts(self):
+        """Test case for broadcasts sent before the user joined or out of retention"""
+
+        # A user joining after the broadcast does not receive it
+        new_user = async_to_sync(test_helpers.create_user)(
+            username="test_user_3", email="test3@gmail.com", password="test_password3"
+        )
+        self.assertNotIn(str(self.broadcast.uid), self.get_inbox_uids(user=new_user))
+        self.assertIn(str(self.broadcast.uid), self.get_inbox_uids(user=self.user))
+
+        # Broadcasts older than the retention window leave every inbox
+        self.user.date_joined = timezone.now() - timedelta(days=365)
+        self.user.save()
+        BroadcastNotification.objects.filter(pk=self.broadcast.pk).update(
+            created_at=timezone.now() - timedelta(days=91)
+        )
+        self.assertNotIn(str(self.broadcast.uid), self.get_inbox_uids(user=self.user))
+
+    def test_inbox_filter_lookups(self):
+        """Test case for the queryset lookups on the merged inbox"""
+
+        notifications = Notification().get_current_user_notifications(
+            user=self.user
+        )["notifications"]
+        broadcast_uid = str(self.broadcast.uid)
+
+        def get_uids(**kwargs):
+            return [
+                str(notification.uid)
+                for notification in notifications.filter(**kwargs)
+            ]
+
+        # Uids given as strings match the broadcast like the notifications
+        uids = get_uids(uid__in=[broadcast_uid, *self.get_inbox_uids(self.user)[:2]])
+        self.assertEqual(len(uids), 3)
+        self.assertIn(broadcast_uid, uids)
+        self.assertEqual(get_uids(uid=broadcast_uid), [broadcast_uid])
+        self.assertEqual(get_uids(is_read=False), self.get_inbox_uids(self.user))
+
+        # Range lookups compare the values, primary keys only match notifications
+        created_at = self.broadcast.created_at
+        self.assertIn(broadcast_uid, get_uids(created_at__lte=created_at))
+        self.assertNotIn(broadcast_uid, get_uids(created_at__lt=created_at))
+        self.assertNotIn(broadcast_uid, get_uids(pk__in=[0, 1]))
+        self.assertNotIn(broadcast_uid, get_uids(expires_at__isnull=False))
+
+        # Other lookups are rejected instead of failing on the broadcasts
+        with self.assertRaises(TypeError):
+            notifications.filter(uid__startswith="a")
+        with self.assertRaises(TypeError):
+            notifications.filter(message__payload__model="User")
+
+    def test_list_endpoint_pages_merged_inbox(self):
+        """Test case for the list endpoint paging the merged inbox"""
+
+        uids = []
+        for page in [1, 2, 3, 4]:
+            response = self.client.get(
+                urlhelpers.get_user_notification_list_url(),
+                {"page": page, "page_size": 4},
+                content_type="application/json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            notifications = response.json()["notifications"]
+            uids += [notification["uid"] for notification in notifications]
+
+        self.assertEqual(uids, self.get_inbox_uids(user=self.user))
+        self.assertIn(str(self.broadcast.uid), uids)
+
+    def test_list_endpoint_cursor_pages_merged_inbox(self):
+        """Test case for keyset paging of the merged inbox on the list endpoint"""
+
+        uids = []
+        url = f"{urlhelpers.get_user_notification_list_url()}?pagination=cursor&page_size=4"
+        while url:
+            response = self.client.get(url, content_type="application/json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+            response_data = response.json()
+            uids += [
+                notification["uid"] for notification in response_data["notifications"]
+            ]
+            url = response_data["next"]
+
+        # The pages hold every item the counts include
+        self.assertEqual(uids, self.get_inbox_uids(user=self.user))
+        self.assertIn(str(self.broadcast.uid), uids)
+        self.assertEqual(len(uids), response_data["total_notifications"])
+
+        # Cursors of another pagination are rejected
+        response = self.client.get(
+            urlhelpers.get_user_notification_list_url(),
+            {"pagination": "cursor", "cursor": "cD0xMA=="},
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_websocket_pages_merged_inbox(self):
+        """Test case for keyset paging of the merged inbox over the websocket"""
+
+        uids = []
+        cursor = None
+        with mock.patch("notifications.utils.ALLOWED_NOTIFICATION_DATA", True):
+            while True:
+                page = async_to_sync(aget_user_notification_page)(
+                    user=self.user, cursor=cursor, page_size=3
+                )
+                uids += [notification["uid"] for notification in page["notifications"]]
+                cursor = page["next"]
+                if cursor is None:
+                    break
+
+        self.assertEqual(uids, self.get_inbox_uids(user=self.user))
+
+    def test_broadcast_state_overrides(self):
+        """Test case for sparse read and removed states of a broadcast"""
+
+        # Reading the broadcast stores the user's state, not a notification
+        response = self.client.get(
+            urlhelpers.get_notification_detail_url(uid=str(self.broadcast.uid)),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Notification.objects.filter(uid=self.broadcast.uid).exists())
+
+        inbox = Notification().get_current_user_notifications(user=self.user)
+        self.assertEqual(inbox["read_notifications"], 1)
+
+        # Removing all notifications removes the broadcast for the user only
+        response = self.client.patch(
+            urlhelpers.get_user_notification_list_url(),
+            json.dumps({"action_choice": NotificationsActionChoices.REMOVED_ALL}),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        self.assertEqual(self.get_inbox_uids(user=self.user), [])
+        self.assertIn(str(self.broadcast.uid), self.get_inbox_uids(user=self.user2))
+
+        # Storage only grows with the interactions
+        self.assertEqual(
+            BroadcastNotificationState.objects.filter(broadcast=self.broadcast).count(),
+            1,
+        )
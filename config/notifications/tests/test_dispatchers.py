@@ -0,0 +1,199 @@
+from unittest import mock
+
+from django.db import transaction
+
+from notifications.choices import NotificationsStatus
+from notifications.dispatchers import (
+    NotificationDispatcher,
+    LocalPushQueue,
+    notification_dispatcher,
+)
+from notifications.models import Notification
+from notifications.utils import update_notification_read_status, get_group_name
+
+from . import base_test
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+
+
+class TestNotificationDispatcher(base_test.BaseTest):
+    """Test case for coalesced websocket pushes"""
+
+    def setUp(self):
+        super().setUp()
+
+    @mock.patch("notifications.utils.add_user_notification_to_group")
+    def test_push_once_per_user_per_transaction(self, mock_push):
+        """Test case for one push per user for a burst of saves"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                for notification in Notification.objects.filter(user=self.user):
+                    notification.is_read = True
+                    notification.save_dirty_fields()
+
+        # Only one recompute and push for the user
+        pushed_users = [call.kwargs["user"] for call in mock_push.call_args_list]
+        self.assertEqual(pushed_users.count(self.user), 1)
+
+    @mock.patch("notifications.utils.add_user_notification_to_group")
+    def test_rolled_back_changes_are_not_pushed(self, mock_push):
+        """Test case for dropping the users marked in a rolled back savepoint"""
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    notification = Notification.objects.filter(user=self.user2).first()
+                    notification.status = NotificationsStatus.REMOVED
+                    notification.save_dirty_fields()
+                    raise RuntimeError("Rolled back")
+            except RuntimeError:
+                pass
+
+            notification = Notification.objects.filter(user=self.user).first()
+            notification.is_read = True
+            notification.save_dirty_fields()
+
+        # Only the committed change is pushed
+        pushed_user_ids = [call.kwargs["user"].pk for call in mock_push.call_args_list]
+        self.assertEqual(pushed_user_ids, [self.user.pk])
+
+    @mock.patch("notifications.dispatchers.threading.Timer")
+    def test_debounce_merges_flushes(self, mock_timer):
+        """Test case for merging flushed users within the debounce window"""
+
+        dispatcher = NotificationDispatcher(debounce=1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatcher.mark_dirty(self.user.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatcher.mark_dirty([self.user.id, self.user2.id])
+
+        # A single timer holds both users
+        self.assertEqual(mock_timer.call_count, 1)
+        self.assertEqual(
+            set(dispatcher._debounced_events), {self.user.id, self.user2.id}
+        )
+
+    @mock.patch.object(notification_dispatcher, "mode", "delta")
+    def test_delta_events_with_sequence_numbers(self):
+        """Test case for delta events pushed instead of snapshots"""
+
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(
+            get_group_name(user=self.user), channel_name
+        )
+        notifications = list(Notification.objects.filter(user=self.user)[:2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            notifications[0].status = NotificationsStatus.REMOVED
+            notifications[0].save_dirty_fields()
+        with self.captureOnCommitCallbacks(execute=True):
+            update_notification_read_status(
+                notifications=Notification.objects.filter(pk=notifications[1].pk),
+                user=self.user,
+            )
+
+        removed = async_to_sync(channel_layer.receive)(channel_name)["events"]
+        read = async_to_sync(channel_layer.receive)(channel_name)["events"]
+
+        # Each change carries only the changed notification and the counts
+        self.assertEqual(
+            [event["event"] for event in removed + read],
+            ["removed", "counts", "read", "counts"],
+        )
+        self.assertEqual(removed[0]["uids"], [str(notifications[0].uid)])
+        self.assertEqual(read[0]["uids"], [str(notifications[1].uid)])
+        self.assertEqual(
+            read[1]["unread_notifications"], self.total_created_notification - 2
+        )
+
+        # Sequence numbers are consecutive across pushes
+        self.assertEqual(
+            [event["seq"] for event in removed + read],
+            list(range(removed[0]["seq"], removed[0]["seq"] + 4)),
+        )
+
+    def test_local_push_queue_batches_and_merges(self):
+        """Test case for batched and merged jobs of the local push queue"""
+
+        handler = mock.Mock()
+        queue = LocalPushQueue(handler=handler, batch_size=2)
+
+        # Hold the worker until every job is queued
+        with queue._condition:
+            queue.put({1: [{"event": "read"}], 2: []})
+            queue.put({1: [{"event": "removed"}], 3: []})
+        self.assertTrue(queue.join(timeout=5))
+
+        batches = [call.args[0] for call in handler.call_args_list]
+        self.assertEqual(
+            batches,
+            [{1: [{"event": "read"}, {"event": "removed"}], 2: []}, {3: []}],
+        )
+
+    def test_local_push_queue_backpressure(self):
+        """Test case for the drop and merge policies of a full push queue"""
+
+        for policy, expected_users, expected_dropped in [
+            ("drop", {1, 2}, 2),
+            ("merge", {1, 2, 3, 4}, 0),
+        ]:
+            handler = mock.Mock()
+            queue = LocalPushQueue(handler=handler, max_size=2, policy=policy)
+
+            with queue._condition:
+                queue.put({1: [], 2: [], 3: [{"event": "read"}]})
+                queue.put({4: [{"event": "read"}]})
+
+                # The queue never holds more than max_size jobs
+                self.assertLessEqual(len(queue._jobs), 2)
+            self.assertTrue(queue.join(timeout=5))
+
+            pushed = {}
+            for call in handler.call_args_list:
+                pushed.update(call.args[0])
+            self.assertEqual(set(pushed), expected_users)
+            self.assertEqual(queue.dropped, expected_dropped)
+
+            # Folded users lose their events and are told to resync
+            if policy == "merge":
+                self.assertEqual(pushed[1], [])
+                for user_id in [2, 3, 4]:
+                    self.assertIsNone(pushed[user_id])
+
+    def test_local_push_queue_resync_batches(self):
+        """Test case for folded users handed to the handler in bounded batches"""
+
+        handler = mock.Mock()
+        queue = LocalPushQueue(handler=handler, max_size=1, batch_size=3)
+
+        with queue._condition:
+            queue.put({user_id: [] for user_id in range(10)})
+            self.assertEqual(len(queue._jobs), 1)
+        self.assertTrue(queue.join(timeout=5))
+
+        # Every folded user is resynced, never more than batch_size at once
+        batches = [call.args[0] for call in handler.call_args_list]
+        self.assertTrue(all(len(batch) <= 3 for batch in batches))
+        self.assertEqual(
+            sorted(user_id for batch in batches for user_id in batch), list(range(10))
+        )
+
+        for options in [{"max_size": 0}, {"batch_size": 0}]:
+            with self.assertRaises(ValueError):
+                LocalPushQueue(handler=handler, **options)
+
+    @mock.patch("notifications.dispatchers.NotificationDispatcher.push")
+    def test_flush_hands_off_to_queue(self, mock_push):
+        """Test case for pushes handed to the queue backend after commit"""
+
+        dispatcher = NotificationDispatcher(queue_class=LocalPushQueue)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            dispatcher.mark_dirty([self.user.id])
+        self.assertTrue(dispatcher.queue.join(timeout=5))
+
+        mock_push.assert_called_once_with({self.user.id: []})
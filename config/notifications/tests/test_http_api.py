@@ -1,8 +1,16 @@
 import json
+import zlib
+from unittest import mock
 
 from rest_framework import status
 
-from notifications.choices import NotificationsActionChoices
+from notifications.choices import NotificationsActionChoices, NotificationsStatus
+from notifications.models import Notification, ArchivedNotification
+from notifications.utils import (
+    create_notification_json,
+    get_notification_cache_metrics,
+    reset_notification_cache_metrics,
+)
 
 from . import urlhelpers, base_test
 
@@ -75,7 +83,9 @@ class TestNotificationHTTPApi(base_test.BaseTest):
     def test_updated_notifications_list_after_seen(self):
         """Test case for update notifications list count after see detail"""
 
-        notification_detail = self.test_get_user_notification_detail()
+        # The detail marks the notification as read, it is visible once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_detail = self.test_get_user_notification_detail()
 
         # Check user notification list endpoint and assert response status code
         response = self.client.get(
@@ -104,11 +114,13 @@ class TestNotificationHTTPApi(base_test.BaseTest):
         payload = {"action_choice": NotificationsActionChoices.REMOVED_ALL}
 
         # Check user notification remove all and assert response status code
-        response = self.client.patch(
-            urlhelpers.get_user_notification_list_url(),
-            json.dumps(payload),
-            content_type="application/json",
-        )
+        # The cache is invalidated once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                urlhelpers.get_user_notification_list_url(),
+                json.dumps(payload),
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Check user notification list endpoint and assert response status code
@@ -130,11 +142,13 @@ class TestNotificationHTTPApi(base_test.BaseTest):
         payload = {"action_choice": NotificationsActionChoices.MARK_ALL_AS_READ}
 
         # Check user notification mark all as read and assert response status code
-        response = self.client.patch(
-            urlhelpers.get_user_notification_list_url(),
-            json.dumps(payload),
-            content_type="application/json",
-        )
+        # The cache is invalidated once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                urlhelpers.get_user_notification_list_url(),
+                json.dumps(payload),
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Check user notification list endpoint and assert response status code
@@ -169,11 +183,13 @@ class TestNotificationHTTPApi(base_test.BaseTest):
         }
 
         # Check user notification mark as read and assert response status code
-        response = self.client.patch(
-            urlhelpers.get_user_notification_list_url(),
-            json.dumps(payload),
-            content_type="application/json",
-        )
+        # The cache is invalidated once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                urlhelpers.get_user_notification_list_url(),
+                json.dumps(payload),
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Check user notification list endpoint and assert response status code
@@ -209,11 +225,13 @@ class TestNotificationHTTPApi(base_test.BaseTest):
         }
 
         # Check user notification mark as removed and assert response status code
-        response = self.client.patch(
-            urlhelpers.get_user_notification_list_url(),
-            json.dumps(payload),
-            content_type="application/json",
-        )
+        # The cache is invalidated once the change commits
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.patch(
+                urlhelpers.get_user_notification_list_url(),
+                json.dumps(payload),
+                content_type="application/json",
+            )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
         # Check user notification list endpoint and assert response status code
@@ -239,6 +257,157 @@ class TestNotificationHTTPApi(base_test.BaseTest):
             - response_data["unread_notifications"],
         )
 
+    def test_get_user_notifications_with_cursor_pagination(self):
+        """Test case for keyset pagination of user notifications"""
+
+        page_size = 4
+        url = (
+            f"{urlhelpers.get_user_notification_list_url()}"
+            f"?pagination=cursor&page_size={page_size}&is_read=false"
+        )
+
+        # Check the first cursor page
+        response = self.client.get(url, content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        first_page = response.json()
+        self.assertEqual(len(first_page["notifications"]), page_size)
+        self.assertEqual(
+            first_page["total_notifications"], self.total_created_notification
+        )
+        self.assertIsNotNone(first_page["next"])
+        self.assertIsNone(first_page["previous"])
+
+        # Follow the opaque cursor to the next page
+        response = self.client.get(first_page["next"], content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        second_page = response.json()
+        self.assertEqual(len(second_page["notifications"]), page_size)
+        self.assertIsNotNone(second_page["previous"])
+
+        # Check the pages are ordered and do not overlap
+        first_ids = [notification["id"] for notification in first_page["notifications"]]
+        second_ids = [
+            notification["id"] for notification in second_page["notifications"]
+        ]
+        self.assertEqual(first_ids, sorted(first_ids, reverse=True))
+        self.assertLess(max(second_ids), min(first_ids))
+
+    @mock.patch("notifications.views.NOTIFICATION_CACHE_COMPRESS", True)
+    @mock.patch("notifications.views.NOTIFICATION_CACHE_MODE", "bytes")
+    def test_get_user_notifications_from_bytes_cache(self):
+        """Test case for the rendered and compressed response cache"""
+
+        # First request renders and caches the response bytes
+        response_data = self.test_get_user_notifications()
+
+        # Cache hit is decompressed for clients without deflate support
+        response = self.client.get(
+            urlhelpers.get_user_notification_list_url(),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json(), response_data)
+
+        # Cache hit is sent compressed to clients accepting deflate
+        response = self.client.get(
+            urlhelpers.get_user_notification_list_url(),
+            content_type="application/json",
+            HTTP_ACCEPT_ENCODING="gzip, deflate",
+        )
+        self.assertEqual(response["Content-Encoding"], "deflate")
+        self.assertEqual(json.loads(zlib.decompress(response.content)), response_data)
+
+        # A change invalidates the cached bytes
+        self.test_mark_all_as_read_notifications()
+
+    @mock.patch("notifications.utils.NOTIFICATION_CACHE_METRICS", True)
+    @mock.patch("notifications.utils.NOTIFICATION_CACHE_STRATEGY", "write_through")
+    def test_write_through_cache_after_seen(self):
+        """Test case for patching the cached first page on read"""
+
+        reset_notification_cache_metrics()
+
+        # Cache the first page and mark a notification as read once committed
+        with self.captureOnCommitCallbacks(execute=True):
+            notification_detail = self.test_get_user_notification_detail()
+
+        # The patched first page is served from the cache
+        response = self.client.get(
+            urlhelpers.get_user_notification_list_url(),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_data = response.json()
+        self.assertEqual(response_data["read_notifications"], 1)
+        self.assertEqual(
+            response_data["unread_notifications"], self.total_created_notification - 1
+        )
+        self.assertEqual(
+            response_data["notifications"][0]["uid"], notification_detail["uid"]
+        )
+        self.assertTrue(response_data["notifications"][0]["is_read"])
+
+        metrics = get_notification_cache_metrics()
+        self.assertEqual(metrics["hits"], 1)
+        self.assertEqual(metrics["misses"], 1)
+        self.assertEqual(metrics["patches"], 1)
+        self.assertEqual(metrics["hit_rate"], 0.5)
+
+    @mock.patch("notifications.utils.NOTIFICATION_CACHE_METRICS", True)
+    @mock.patch("notifications.utils.NOTIFICATION_CACHE_STRATEGY", "write_through")
+    def test_write_through_cache_after_bulk_changes(self):
+        """Test case for patching the cached first page on bulk create and read"""
+
+        reset_notification_cache_metrics()
+        self.test_get_user_notifications()
+
+        # Fan-out a notification and mark all as read once committed
+        notification_data = create_notification_json(
+            message="This is a fan-out notification", instance=self.user
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            Notification().create_notification_for_users(
+                notification_data=notification_data, users=[self.user]
+            )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(
+                urlhelpers.get_user_notification_list_url(),
+                json.dumps(
+                    {"action_choice": NotificationsActionChoices.MARK_ALL_AS_READ}
+                ),
+                content_type="application/json",
+            )
+
+        # The patched first page is served from the cache
+        response = self.client.get(
+            urlhelpers.get_user_notification_list_url(),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        response_data = response.json()
+        self.assertEqual(
+            response_data["total_notifications"], self.total_created_notification + 1
+        )
+        self.assertEqual(response_data["unread_notifications"], 0)
+        self.assertEqual(
+            response_data["notifications"][0]["notification"], notification_data
+        )
+        self.assertTrue(
+            all(
+                notification["is_read"]
+                for notification in response_data["notifications"]
+            )
+        )
+
+        # Only the first request missed the cache
+        metrics = get_notification_cache_metrics()
+        self.assertEqual(metrics["misses"], 1)
+        self.assertEqual(metrics["patches"], 2)
+
     def check_notification_fields(self, notification):
         """Check some fields in notification data"""
 
@@ -257,3 +426,30 @@ class TestNotificationHTTPApi(base_test.BaseTest):
             self.assertIn(field, notification)
 
         return notification
+
+    def test_get_user_archived_notifications(self):
+        """Test case for the opt-in archive of notifications left out of the inbox"""
+
+        notification = Notification.objects.filter(user=self.user).first()
+        notification.status = NotificationsStatus.REMOVED
+        notification.save_dirty_fields()
+        ArchivedNotification().archive_notifications(
+            notifications=Notification.objects.filter(pk=notification.pk)
+        )
+
+        response = self.client.get(
+            urlhelpers.get_user_archived_notification_list_url(),
+            content_type="application/json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # The archive lists the notification with its data
+        response_data = response.json()
+        self.assertEqual(response_data["count"], 1)
+        self.assertEqual(response_data["results"][0]["uid"], str(notification.uid))
+        self.assertEqual(
+            response_data["results"][0]["notification"], notification.notification
+        )
+        self.assertEqual(
+            response_data["results"][0]["status"], NotificationsStatus.REMOVED
+        )
@@ -0,0 +1,570 @@
+import uuid
+from datetime import timedelta
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+
+from django.apps import apps as django_apps
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import IntegrityError, connection
+from django.db.models import F
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from asgiref.sync import async_to_sync
+
+from notifications.choices import NotificationsStatus
+from notifications.models import (
+    Notification,
+    ArchivedNotification,
+    NotificationCounter,
+    NotificationSettings,
+    NotificationMessage,
+)
+from notifications.serializers import get_user_serializer, NotificationSerializer
+from notifications.utils import create_notification_json
+
+from . import base_test
+
+
+class TestNotificationModel(base_test.BaseTest):
+    """Test case for notification model helpers"""
+
+    def setUp(self):
+        super().setUp()
+
+        self.notification_data = create_notification_json(
+            message="This is a bulk notification",
+            method="POST",
+            instance=self.user,
+            serializer=get_user_serializer(),
+        )
+
+    def test_create_notification_for_users_in_chunks(self):
+        """Test case for chunked bulk fan-out"""
+
+        summary = Notification().create_notification_for_users(
+            notification_data=self.notification_data,
+            users=self.user_list,
+            chunk_size=1,
+        )
+
+        # Assert the summary of the fan-out
+        self.assertEqual(summary["created"], self.user_list.count())
+        self.assertEqual(summary["chunks"], self.user_list.count())
+        self.assertGreaterEqual(summary["elapsed"], 0)
+
+        # Assert every user received the notification
+        for user in self.user_list:
+            self.assertTrue(
+                Notification.objects.filter(
+                    user=user, notification=self.notification_data
+                ).exists()
+            )
+
+    def test_create_notification_for_single_user(self):
+        """Test case for fan-out to a single user instance and a list of users"""
+
+        summary = Notification().create_notification_for_users(
+            notification_data=self.notification_data, users=self.user
+        )
+        self.assertEqual(summary["created"], 1)
+        self.assertEqual(summary["chunks"], 1)
+
+        summary = Notification().create_notification_for_users(
+            notification_data=self.notification_data, users=[self.user, self.user2]
+        )
+        self.assertEqual(summary["created"], 2)
+
+    def test_notification_counter_follows_changes(self):
+        """Test case for counters maintained by create, read, remove and delete"""
+
+        counter = NotificationCounter.objects.get(user=self.user)
+        self.assertEqual(counter.total_notifications, self.total_created_notification)
+        self.assertEqual(counter.unread_notifications, self.total_created_notification)
+
+        notifications = list(Notification.objects.filter(user=self.user)[:3])
+
+        # Mark as read
+        notifications[0].is_read = True
+        notifications[0].save_dirty_fields()
+
+        # Mark as removed
+        notifications[1].status = NotificationsStatus.REMOVED
+        notifications[1].save_dirty_fields()
+
+        # Delete
+        notifications[2].delete()
+
+        counts = NotificationCounter().get_user_counts(user=self.user)
+        self.assertEqual(
+            counts["total_notifications"], self.total_created_notification - 2
+        )
+        self.assertEqual(counts["read_notifications"], 1)
+        self.assertEqual(
+            counts["unread_notifications"], self.total_created_notification - 3
+        )
+
+    def test_notification_counter_with_stale_instances(self):
+        """Test case for counters of the same notification saved by two requests"""
+
+        notification = Notification.objects.filter(user=self.user).first()
+
+        # Both requests loaded the notification while it was unread
+        for instance in [
+            Notification.objects.get(pk=notification.pk),
+            Notification.objects.get(pk=notification.pk),
+        ]:
+            instance.is_read = True
+            instance.save_dirty_fields()
+
+        # The counter follows the stored state, the read is only counted once
+        counts = NotificationCounter().get_user_counts(user=self.user)
+        self.assertEqual(counts["read_notifications"], 1)
+        self.assertEqual(
+            counts["unread_notifications"], self.total_created_notification - 1
+        )
+
+    def test_rebuild_notification_counters(self):
+        """Test case for rebuilding missing and drifted counters"""
+
+        NotificationCounter.objects.filter(user=self.user).delete()
+        NotificationCounter.objects.filter(user=self.user2).update(
+            total_notifications=0, unread_notifications=0
+        )
+
+        call_command(
+            "rebuild_notification_counters", batch_size=1, verbosity=0, stdout=StringIO()
+        )
+
+        for user in self.user_list:
+            counter = NotificationCounter.objects.get(user=user)
+            self.assertEqual(
+                counter.total_notifications, self.total_created_notification
+            )
+            self.assertEqual(
+                counter.unread_notifications, self.total_created_notification
+            )
+
+    def test_missing_notification_counters_created(self):
+        """Test case for missing counters created by writes and the migration"""
+
+        # A write creates the missing counter, counting its own change once
+        NotificationCounter.objects.filter(user=self.user).delete()
+        notification = Notification.objects.filter(user=self.user).first()
+        notification.is_read = True
+        notification.save_dirty_fields()
+
+        counter = NotificationCounter.objects.get(user=self.user)
+        self.assertEqual(counter.total_notifications, self.total_created_notification)
+        self.assertEqual(
+            counter.unread_notifications, self.total_created_notification - 1
+        )
+
+        # The read path never overwrites an existing counter
+        NotificationCounter.objects.filter(user=self.user).update(
+            total_notifications=F("total_notifications") + 1
+        )
+        counts = NotificationCounter().get_user_counts(user=self.user)
+        self.assertEqual(
+            counts["total_notifications"], self.total_created_notification + 1
+        )
+
+        # The migration fills in the counters of the existing users only
+        NotificationCounter.objects.filter(user=self.user2).delete()
+        backfill_notification_counters = import_module(
+            "notifications.migrations.0004_notificationcounter"
+        ).backfill_notification_counters
+        backfill_notification_counters(apps=django_apps, schema_editor=None)
+
+        counter = NotificationCounter.objects.get(user=self.user2)
+        self.assertEqual(counter.total_notifications, self.total_created_notification)
+        self.assertEqual(
+            NotificationCounter.objects.get(user=self.user).total_notifications,
+            self.total_created_notification + 1,
+        )
+
+    def test_notification_settings_memoized_and_invalidated(self):
+        """Test case for cached notification settings lookups"""
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+
+        with CaptureQueriesContext(connection) as context:
+            for _ in range(3):
+                self.assertTrue(
+                    NotificationSettings().is_user_enable_notification(user=user)
+                )
+
+        # At most one settings query for repeated lookups
+        settings_queries = [
+            query
+            for query in context.captured_queries
+            if query["sql"].startswith("SELECT")
+            and "notifications_notificationsettings" in query["sql"]
+        ]
+        self.assertLessEqual(len(settings_queries), 1)
+
+        # Saving the settings invalidates the cached flag
+        notification_settings = NotificationSettings.objects.get(user=self.user)
+        notification_settings.is_enable_notification = False
+        notification_settings.save()
+
+        user = get_user_model().objects.get(pk=self.user.pk)
+        with self.assertRaises(ValueError):
+            Notification().get_current_user_notifications(user=user)
+
+    async def test_async_current_user_notifications(self):
+        """Test case for the async inbox lookup used by the consumer"""
+
+        user = await get_user_model().objects.aget(pk=self.user.pk)
+        result = await Notification().aget_current_user_notifications(user=user)
+
+        self.assertEqual(len(result["notifications"]), self.total_created_notification)
+        self.assertEqual(
+            result["total_notifications"], self.total_created_notification
+        )
+        self.assertEqual(
+            result["unread_notifications"], self.total_created_notification
+        )
+
+        # Counts only, a missing counter is rebuilt
+        await NotificationCounter.objects.filter(user=user).adelete()
+        result = await Notification().aget_current_user_notifications(
+            user=user, with_notifications=False
+        )
+        self.assertEqual(result["notifications"], [])
+        self.assertEqual(result["read_notifications"], 0)
+        self.assertEqual(
+            result["total_notifications"], self.total_created_notification
+        )
+
+    def test_create_notification_for_users_with_shared_payload(self):
+        """Test case for fan-out storing the notification data once"""
+
+        summary = Notification().create_notification_for_users(
+            notification_data=self.notification_data,
+            users=self.user_list,
+            shared_payload=True,
+        )
+
+        # One message and recipient rows without their own copy of the data
+        message = NotificationMessage.objects.get()
+        notifications = Notification.objects.filter(message=message)
+        self.assertEqual(notifications.count(), summary["created"])
+        self.assertFalse(notifications.filter(notification__isnull=False).exists())
+
+        # The data is read through the message
+        notification = (
+            Notification()
+            .get_current_user_notifications(user=self.user)["notifications"]
+            .get(message=message)
+        )
+        self.assertEqual(
+            NotificationSerializer(notification).data["notification"],
+            self.notification_data,
+        )
+
+        # Identical data reuses the message
+        Notification().create_notification_for_users(
+            notification_data=self.notification_data,
+            users=self.user,
+            shared_payload=True,
+        )
+        self.assertEqual(NotificationMessage.objects.count(), 1)
+
+        # A racing fan-out cannot store the same data twice
+        with self.assertRaises(IntegrityError):
+            NotificationMessage.objects.create(
+                notification=self.notification_data,
+                payload_hash=message.payload_hash,
+            )
+
+    def test_unused_messages_deleted_with_their_notifications(self):
+        """Test case for messages deleted once no row references them"""
+
+        Notification().create_notification_for_users(
+            notification_data=self.notification_data,
+            users=self.user_list,
+            shared_payload=True,
+        )
+        message = NotificationMessage.objects.get()
+        notifications = list(Notification.objects.filter(message=message))
+        self.assertEqual(len(notifications), 2)
+
+        # The message stays while a notification references it
+        Notification.objects.filter(pk=notifications[0].pk).update(
+            status=NotificationsStatus.REMOVED
+        )
+        Notification().purge_notifications()
+        self.assertTrue(NotificationMessage.objects.filter(pk=message.pk).exists())
+
+        # An archived row keeps the message it references
+        Notification.objects.filter(pk=notifications[1].pk).update(
+            status=NotificationsStatus.REMOVED
+        )
+        ArchivedNotification().archive_notifications(
+            notifications=Notification.objects.filter(pk=notifications[1].pk)
+        )
+        self.assertTrue(NotificationMessage.objects.filter(pk=message.pk).exists())
+
+        # The message is deleted with the last purged notification
+        Notification().create_notification_for_users(
+            notification_data={**self.notification_data, "message": "Purged"},
+            users=self.user_list,
+            shared_payload=True,
+        )
+        message = NotificationMessage.objects.exclude(pk=message.pk).get()
+        Notification.objects.filter(message=message).update(
+            status=NotificationsStatus.REMOVED
+        )
+        Notification().purge_notifications()
+        self.assertFalse(NotificationMessage.objects.filter(pk=message.pk).exists())
+
+    def test_normalize_notification_messages(self):
+        """Test case for moving existing notification data to shared messages"""
+
+        def serialize_inbox():
+            return NotificationSerializer(
+                Notification()
+                .get_current_user_notifications(user=self.user)["notifications"],
+                many=True,
+            ).data
+
+        inbox = serialize_inbox()
+        payloads = {
+            NotificationMessage.get_payload_hash(notification)
+            for notification in Notification.objects.values_list(
+                "notification", flat=True
+            )
+        }
+
+        call_command(
+            "normalize_notification_messages",
+            batch_size=3,
+            verbosity=0,
+            stdout=StringIO(),
+        )
+
+        # Every row references the message of its data, the inbox is unchanged
+        self.assertFalse(Notification.objects.filter(message__isnull=True).exists())
+        self.assertEqual(NotificationMessage.objects.count(), len(payloads))
+        self.assertEqual(serialize_inbox(), inbox)
+
+    def test_archive_notifications(self):
+        """Test case for moving removed and old read notifications to the archive"""
+
+        notifications = list(Notification.objects.filter(user=self.user).order_by("pk"))
+        old_created_at = timezone.now() - timedelta(days=100)
+
+        # Removed, old read and old unread notifications
+        Notification.objects.filter(pk=notifications[0].pk).update(
+            status=NotificationsStatus.REMOVED
+        )
+        Notification.objects.filter(pk=notifications[1].pk).update(
+            is_read=True, created_at=old_created_at
+        )
+        Notification.objects.filter(pk=notifications[2].pk).update(
+            created_at=old_created_at
+        )
+        NotificationCounter().rebuild_counters(user_ids=[self.user.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                "archive_notifications",
+                older_than_days=90,
+                batch_size=1,
+                verbosity=0,
+                stdout=StringIO(),
+            )
+
+        # Archived rows keep their id and leave the notification table
+        archived_ids = set(ArchivedNotification.objects.values_list("id", flat=True))
+        self.assertEqual(archived_ids, {notifications[0].pk, notifications[1].pk})
+        self.assertFalse(Notification.objects.filter(pk__in=archived_ids).exists())
+
+        # The old unread notification stays in the inbox
+        inbox = Notification().get_current_user_notifications(user=self.user)
+        self.assertTrue(inbox["notifications"].filter(pk=notifications[2].pk).exists())
+
+        # The counters follow the archived active row and match a rebuild
+        counts = NotificationCounter().get_user_counts(user=self.user)
+        self.assertEqual(
+            counts["total_notifications"], self.total_created_notification - 2
+        )
+        self.assertEqual(
+            counts["unread_notifications"], self.total_created_notification - 2
+        )
+        NotificationCounter().rebuild_counters(user_ids=[self.user.pk])
+        self.assertEqual(NotificationCounter().get_user_counts(user=self.user), counts)
+
+        # A second run has nothing left to archive
+        call_command("archive_notifications", verbosity=0, stdout=StringIO())
+        self.assertEqual(ArchivedNotification.objects.count(), 2)
+
+    def test_archive_notifications_keeps_conflicting_rows(self):
+        """Test case for rows that cannot be archived staying in the inbox"""
+
+        notification = Notification.objects.filter(user=self.user).first()
+        ArchivedNotification.objects.create(
+            id=notification.pk,
+            uid=uuid.uuid4(),
+            user=self.user,
+            notification={"message": "Another notification"},
+            status=NotificationsStatus.REMOVED,
+            created_at=timezone.now(),
+            updated_at=timezone.now(),
+        )
+
+        # The row is not removed unless its own copy is archived
+        with self.assertRaises(IntegrityError):
+            ArchivedNotification().archive_notifications(
+                notifications=Notification.objects.filter(pk=notification.pk)
+            )
+        self.assertTrue(Notification.objects.filter(pk=notification.pk).exists())
+        self.assertEqual(
+            ArchivedNotification.objects.get(pk=notification.pk).notification,
+            {"message": "Another notification"},
+        )
+
+    def test_purge_notifications(self):
+        """Test case for batched purge of removed and deleted notifications"""
+
+        user_notifications = list(
+            Notification.objects.filter(user=self.user).order_by("pk")[:3]
+        )
+        user2_notification = Notification.objects.filter(user=self.user2).first()
+        for notification, status in (
+            (user_notifications[0], NotificationsStatus.REMOVED),
+            (user_notifications[2], NotificationsStatus.DELETED),
+            (user2_notification, NotificationsStatus.REMOVED),
+        ):
+            notification.status = status
+            notification.save_dirty_fields()
+        counts = NotificationCounter().get_user_counts(user=self.user)
+
+        batches = []
+        with mock.patch(
+            "notifications.utils.refresh_users_notifications"
+        ) as mock_refresh, mock.patch(
+            "notifications.signals.refresh_user_notification_change"
+        ) as mock_change:
+            summary = Notification().purge_notifications(
+                batch_size=2, progress=batches.append
+            )
+
+        # Only the removed and deleted rows are gone
+        self.assertEqual(summary["purged"], 3)
+        self.assertEqual(summary["users"], 2)
+        self.assertEqual(sum(batches), 3)
+        self.assertEqual(summary["batches"], len(batches))
+        self.assertFalse(
+            Notification.objects.exclude(status=NotificationsStatus.ACTIVE).exists()
+        )
+        self.assertTrue(
+            Notification.objects.filter(pk=user_notifications[1].pk).exists()
+        )
+
+        # No per-row signal, one refresh of the affected users at the end
+        mock_change.assert_not_called()
+        mock_refresh.assert_called_once()
+        self.assertEqual(
+            set(mock_refresh.call_args.kwargs["user_ids"]),
+            {self.user.pk, self.user2.pk},
+        )
+
+        # Inactive rows were not counted, the counters stay the same
+        self.assertEqual(NotificationCounter().get_user_counts(user=self.user), counts)
+
+        # The command purges nothing on a second run
+        output = StringIO()
+        call_command("purge_notifications", verbosity=0, stdout=output)
+        self.assertIn("purged 0 notifications", output.getvalue())
+
+    def test_purge_notifications_skips_empty_ranges(self):
+        """Test case for the purge jumping over the ids without purged rows"""
+
+        notifications = list(Notification.objects.filter(user=self.user).order_by("pk"))
+        Notification.objects.filter(pk=notifications[-1].pk).update(
+            id=notifications[-1].pk + 10**6
+        )
+        Notification.objects.filter(
+            pk__in=[notifications[0].pk, notifications[-1].pk + 10**6]
+        ).update(status=NotificationsStatus.REMOVED)
+
+        # The million empty ranges between the rows are skipped at once
+        with CaptureQueriesContext(connection) as context:
+            summary = Notification().purge_notifications(batch_size=2)
+
+        self.assertEqual(summary["purged"], 2)
+        self.assertEqual(summary["batches"], 2)
+        # Three windows read, the id range and a single jump over the empty
+        # ranges, ignoring the profiler's EXPLAIN queries
+        windows = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith("SAVEPOINT")
+        ]
+        jumps = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('SELECT MIN("notifications_notification"."id")')
+        ]
+        self.assertEqual(len(windows), 3)
+        self.assertEqual(len(jumps), 2)
+        self.assertFalse(
+            Notification.objects.exclude(status=NotificationsStatus.ACTIVE).exists()
+        )
+
+    def test_expired_notifications_left_out_and_swept(self):
+        """Test case for expired notifications hidden from the inbox and swept"""
+
+        notifications = list(Notification.objects.filter(user=self.user).order_by("pk"))
+        expired_pks = [notifications[0].pk, notifications[1].pk]
+        Notification.objects.filter(pk__in=expired_pks).update(
+            expires_at=timezone.now() - timedelta(minutes=1)
+        )
+        Notification.objects.filter(pk=notifications[2].pk).update(
+            expires_at=timezone.now() + timedelta(hours=1)
+        )
+        expected_count = self.total_created_notification - 2
+
+        def assert_inbox(result):
+            self.assertEqual(len(result["notifications"]), expected_count)
+            self.assertEqual(result["total_notifications"], expected_count)
+            self.assertEqual(result["unread_notifications"], expected_count)
+
+        with mock.patch("notifications.models.NOTIFICATION_EXPIRY", True):
+            # Expired rows are left out before the sweep, on both paths
+            result = Notification().get_current_user_notifications(user=self.user)
+            self.assertFalse(
+                result["notifications"].filter(pk__in=expired_pks).exists()
+            )
+            assert_inbox(result)
+            assert_inbox(
+                async_to_sync(Notification().aget_current_user_notifications)(
+                    user=self.user
+                )
+            )
+
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command(
+                    "expire_notifications",
+                    batch_size=1,
+                    verbosity=0,
+                    stdout=StringIO(),
+                )
+
+            # The sweep flips the rows, the counts are not subtracted twice
+            self.assertEqual(
+                Notification.objects.filter(
+                    pk__in=expired_pks, status=NotificationsStatus.INACTIVE
+                ).count(),
+                2,
+            )
+            assert_inbox(Notification().get_current_user_notifications(user=self.user))
+
+        # The stored counters follow the sweep
+        counts = NotificationCounter().get_user_counts(user=self.user)
+        self.assertEqual(counts["total_notifications"], expected_count)
+        self.assertEqual(counts["unread_notifications"], expected_count)
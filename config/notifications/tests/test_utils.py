@@ -0,0 +1,276 @@
+import json
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.core import serializers
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import m2m_changed, post_save
+from django.test.utils import CaptureQueriesContext, isolate_apps
+
+from rest_framework_simplejwt.tokens import AccessToken
+
+from dirtyfields import DirtyFieldsMixin
+
+from notifications.choices import NotificationsStatus
+from notifications.models import Notification
+from notifications.signals import connect_m2m_change_tracker
+from notifications.utils import (
+    update_notification_read_status,
+    update_notification_status,
+    generate_cache_key,
+    get_user_cache_notifications,
+    set_user_notifications_in_cache,
+    invalidate_user_notifications_cache,
+    refresh_users_notifications,
+    get_user_cache_version,
+    model_to_notification_dict,
+    create_notification_json,
+    create_notification_json_batch,
+    get_changed_fields,
+    track_m2m_changes,
+    validate_token,
+    decoded_token_cache,
+    NotificationPrincipal,
+)
+
+from . import base_test
+
+from asgiref.sync import async_to_sync
+
+
+class TestNotificationUtils(base_test.BaseTest):
+    """Test case for notification utils"""
+
+    def setUp(self):
+        super().setUp()
+
+    @mock.patch("notifications.signals.refresh_users_notifications")
+    def test_update_notification_read_status_in_one_statement(self, mock_refresh):
+        """Test case for set-based mark as read scoped to the user"""
+
+        notifications = Notification().get_active_notifications().filter(is_read=False)
+
+        with CaptureQueriesContext(connection) as context:
+            updated = update_notification_read_status(
+                notifications=notifications, user=self.user
+            )
+
+        # A single UPDATE of the notifications, ignoring the profiler's EXPLAIN queries
+        statements = [
+            query["sql"]
+            for query in context.captured_queries
+            if query["sql"].startswith('UPDATE "notifications_notification"')
+        ]
+        self.assertEqual(len(statements), 1)
+
+        # The locked rows are selected with a subquery, not a list of their pks
+        for pk in Notification.objects.filter(user=self.user).values_list(
+            "pk", flat=True
+        ):
+            self.assertNotIn(f"IN ({pk}", statements[0])
+        self.assertIn("IN (SELECT", statements[0])
+
+        # Only the user's notifications are updated
+        self.assertEqual(updated, self.total_created_notification)
+        self.assertFalse(
+            Notification.objects.filter(user=self.user, is_read=False).exists()
+        )
+        self.assertTrue(
+            Notification.objects.filter(user=self.user2, is_read=False).exists()
+        )
+
+        # One bulk change event for the user
+        mock_refresh.assert_called_once_with(
+            user_ids=[self.user.pk], events=None, changes=None
+        )
+
+    @mock.patch("notifications.signals.refresh_users_notifications")
+    def test_update_notification_status_without_user(self, mock_refresh):
+        """Test case for set-based status update across users"""
+
+        updated = update_notification_status(
+            notifications=Notification().get_active_notifications(),
+            status=NotificationsStatus.REMOVED,
+        )
+
+        self.assertEqual(updated, Notification.objects.count())
+        mock_refresh.assert_called_once()
+        self.assertCountEqual(
+            mock_refresh.call_args.kwargs["user_ids"], [self.user.pk, self.user2.pk]
+        )
+
+    def test_versioned_cache_invalidation(self):
+        """Test case for per-page cache keys invalidated by a version bump"""
+
+        cache_kwargs = {"user": self.user, "query_params": None, "page_number": 1}
+        set_user_notifications_in_cache(queryset={"total_notifications": 1}, **cache_kwargs)
+        old_cache_key = generate_cache_key(**cache_kwargs)
+
+        self.assertEqual(
+            get_user_cache_notifications(**cache_kwargs), {"total_notifications": 1}
+        )
+        self.assertTrue(old_cache_key.startswith(f"notif:{self.user.id}:v"))
+
+        invalidate_user_notifications_cache(user_id=self.user.id)
+
+        # The new version misses while the old page is left to expire
+        self.assertIsNone(get_user_cache_notifications(**cache_kwargs))
+        self.assertNotEqual(generate_cache_key(**cache_kwargs), old_cache_key)
+        self.assertIsNotNone(cache.get(old_cache_key))
+
+    def test_cache_invalidated_after_commit(self):
+        """Test case for the cache version bumped once the change commits"""
+
+        version = get_user_cache_version(self.user.id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            refresh_users_notifications(user_ids=[self.user.id])
+
+            # Readers before the commit keep caching under the current version
+            self.assertEqual(get_user_cache_version(self.user.id), version)
+
+        self.assertEqual(get_user_cache_version(self.user.id), version + 1)
+
+    def test_model_to_notification_dict_matches_json_serializer(self):
+        """Test case for the direct model serializer against Django's json serializer"""
+
+        self.user.groups.add(Group.objects.create(name="test_group"))
+        notification = Notification.objects.filter(user=self.user).first()
+
+        for instance in [self.user, notification]:
+            self.assertEqual(
+                model_to_notification_dict(instance),
+                json.loads(serializers.serialize("json", [instance]))[0],
+            )
+
+    def test_create_notification_json_batch(self):
+        """Test case for building notification payloads of many instances"""
+
+        notifications = create_notification_json_batch(
+            message="This is a batch notification",
+            method="PATCH",
+            instances=self.user_list,
+        )
+
+        self.assertEqual(len(notifications), self.user_list.count())
+        for user, notification in zip(self.user_list, notifications):
+            self.assertEqual(
+                notification,
+                create_notification_json(
+                    message="This is a batch notification",
+                    method="PATCH",
+                    instance=user,
+                ),
+            )
+
+    def test_get_changed_fields_from_dirty_fields(self):
+        """Test case for the query-free dirty fields diff"""
+
+        notification = Notification.objects.filter(user=self.user).first()
+        original_message = notification.notification["message"]
+
+        notification.is_read = True
+        notification.user = self.user2
+        notification.notification = {**notification.notification, "message": "changed"}
+        track_m2m_changes(notification, "tags", "post_add", {1, 2})
+        track_m2m_changes(notification, "tags", "post_remove", {2, 3})
+
+        with self.assertNumQueries(0):
+            changed_data = get_changed_fields(notification, use_dirty_fields=True)
+
+        self.assertEqual(changed_data["is_read"], {"original": False, "new": True})
+        self.assertEqual(
+            changed_data["user"], {"original": self.user.pk, "new": self.user2.pk}
+        )
+        self.assertEqual(
+            changed_data["notification"],
+            {"message": {"original": original_message, "new": "changed"}},
+        )
+        self.assertEqual(changed_data["tags"], {"added": [1], "removed": [3]})
+
+        # The snapshot resets once the instance is saved
+        notification.save()
+        self.assertEqual(get_changed_fields(notification, use_dirty_fields=True), {})
+
+    @isolate_apps("notifications")
+    def test_m2m_changes_tracked_from_relation(self):
+        """Test case for the M2M changes tracked from a real relation"""
+
+        class DirtyUser(DirtyFieldsMixin, get_user_model()):
+            class Meta:
+                proxy = True
+
+        connect_m2m_change_tracker(DirtyUser)
+        self.addCleanup(
+            post_save.disconnect,
+            sender=DirtyUser,
+            dispatch_uid="m2m_change_tracker_reset",
+        )
+        self.addCleanup(
+            m2m_changed.disconnect,
+            sender=DirtyUser.groups.through,
+            dispatch_uid="m2m_change_tracker",
+        )
+
+        groups = Group.objects.bulk_create(
+            [Group(name=f"group_{index}") for index in range(4)]
+        )
+        user = DirtyUser.objects.get(pk=self.user.pk)
+        user.groups.add(groups[0], groups[1])
+        user.save()
+
+        user.groups.add(groups[2])
+        user.groups.remove(groups[0])
+        self.assertEqual(
+            get_changed_fields(user, use_dirty_fields=True)["groups"],
+            {"added": [groups[2].pk], "removed": [groups[0].pk]},
+        )
+
+        # Clearing removes the members that were not added since the save
+        user.save()
+        user.groups.add(groups[3])
+        user.groups.clear()
+        changed_data = get_changed_fields(user, use_dirty_fields=True)
+        self.assertIsNone(changed_data["groups"]["added"])
+        self.assertCountEqual(
+            changed_data["groups"]["removed"], [groups[1].pk, groups[2].pk]
+        )
+
+        # The tracked changes reset once the instance is saved
+        user.save()
+        self.assertNotIn("groups", get_changed_fields(user, use_dirty_fields=True))
+
+    def test_validate_token_reuses_decoded_tokens(self):
+        """Test case for the decoded token cache"""
+
+        decoded_token_cache.clear()
+        token = self.user_token["access"]
+
+        with mock.patch(
+            "notifications.utils.AccessToken", wraps=AccessToken
+        ) as access_token:
+            self.assertEqual(validate_token(token), self.user.id)
+            self.assertEqual(validate_token(token), self.user.id)
+
+        # The signature is only verified once
+        self.assertEqual(access_token.call_count, 1)
+
+        # Invalid tokens are not cached
+        self.assertIsNone(validate_token("invalid-token"))
+        self.assertIsNone(decoded_token_cache.get("invalid-token"))
+
+    def test_notification_principal(self):
+        """Test case for the principal built from token claims"""
+
+        principal = NotificationPrincipal({"user_id": self.user.id})
+        self.assertEqual(principal.pk, self.user.id)
+
+        counts = Notification().get_current_user_notifications(user=principal)
+        self.assertEqual(
+            counts["total_notifications"], self.total_created_notification
+        )
+
+        # The full user is loaded lazily
+        self.assertEqual(async_to_sync(principal.aget_user)(), self.user)
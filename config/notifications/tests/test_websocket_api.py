@@ -1,6 +1,13 @@
+from unittest import mock
+
+from notifications.models import Notification, NotificationSettings
+from notifications.utils import get_broadcast_group_name
+
 from . import urlhelpers, test_helpers, base_test
 
 from config.asgi import application
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
 from channels.testing import WebsocketCommunicator
 
 
@@ -63,3 +70,143 @@ class TestNotificationWebSocketApi(base_test.BaseTest):
 
         # Disconnect from the WebSocket
         await communicator.disconnect()
+
+    async def test_stateless_auth_skips_user_query(self):
+        """Connect with a principal built from the token claims"""
+
+        with mock.patch(
+            "notifications.consumers.NOTIFICATION_WS_STATELESS_AUTH", True
+        ), mock.patch("notifications.consumers.get_user") as get_user:
+            communicator = await self.test_connect_notification_consumer()
+            response = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        # The user is never loaded on connect
+        get_user.assert_not_called()
+        self.assertEqual(
+            response["total_notifications"], self.total_created_notification
+        )
+
+    async def test_delta_mode_snapshot_carries_sequence_number(self):
+        """Receive a snapshot with the last sequence number in delta mode"""
+
+        with mock.patch(
+            "notifications.consumers.notification_dispatcher.mode", "delta"
+        ):
+            communicator = await self.test_connect_notification_consumer()
+            response = await communicator.receive_json_from()
+
+            # The resync command sends the snapshot again
+            await communicator.send_json_to({"command": "resync"})
+            resync = await communicator.receive_json_from()
+            await communicator.disconnect()
+
+        self.assertEqual(response["event"], "snapshot")
+        self.assertEqual(response["seq"], 0)
+        self.assertEqual(resync, response)
+
+    @mock.patch("notifications.consumers.NOTIFICATION_BROADCASTS", True)
+    async def test_broadcast_snapshot_reads_current_settings(self):
+        """Receive a broadcast snapshot after the user's settings changed"""
+
+        communicator = await self.test_connect_notification_consumer()
+        response = await communicator.receive_json_from()
+        self.assertNotIn("error", response)
+
+        # The user turns notifications off while connected
+        notification_settings = await NotificationSettings.objects.aget(
+            user=self.user
+        )
+        notification_settings.is_enable_notification = False
+        await database_sync_to_async(notification_settings.save)()
+
+        await get_channel_layer().group_send(
+            get_broadcast_group_name(), {"type": "notification_broadcast"}
+        )
+        response = await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        self.assertIn("error", response)
+
+    @mock.patch("notifications.utils.NOTIFICATION_WS_SNAPSHOT_SIZE", 4)
+    @mock.patch("notifications.utils.ALLOWED_NOTIFICATION_DATA", True)
+    async def test_windowed_snapshot_and_fetch_page(self):
+        """Receive the latest notifications and page the older ones"""
+
+        communicator = await self.test_connect_notification_consumer()
+        response = await communicator.receive_json_from()
+
+        # Only the latest window with a cursor, counts cover the whole inbox
+        self.assertEqual(len(response["notifications"]), 4)
+        self.assertEqual(
+            response["total_notifications"], self.total_created_notification
+        )
+
+        ids = [notification["id"] for notification in response["notifications"]]
+        cursor = response["next"]
+        while cursor:
+            await communicator.send_json_to(
+                {"command": "fetch_page", "cursor": cursor}
+            )
+            page = await communicator.receive_json_from()
+            self.assertEqual(page["event"], "page")
+            ids += [notification["id"] for notification in page["notifications"]]
+            cursor = page["next"]
+
+        await communicator.disconnect()
+
+        # Every notification is paged once, newest first
+        self.assertEqual(len(ids), self.total_created_notification)
+        self.assertEqual(ids, sorted(ids, reverse=True))
+
+    async def test_command_protocol(self):
+        """Send ping, action and unknown commands over the socket"""
+
+        communicator = await self.test_connect_notification_consumer()
+        await communicator.receive_json_from()
+
+        await communicator.send_json_to({"command": "ping"})
+        self.assertEqual(await communicator.receive_json_from(), {"event": "pong"})
+
+        # Mark a notification as read through the bulk update path
+        notification = await Notification.objects.filter(user=self.user).afirst()
+        await communicator.send_json_to(
+            {"command": "mark_read", "uids": [str(notification.uid)]}
+        )
+        response = await communicator.receive_json_from()
+        self.assertEqual(
+            response, {"event": "ack", "command": "mark_read", "updated": 1}
+        )
+        await notification.arefresh_from_db()
+        self.assertTrue(notification.is_read)
+
+        # Marking as read requires uids
+        await communicator.send_json_to({"command": "mark_read"})
+        response = await communicator.receive_json_from()
+        self.assertIn("notification_uids", response["error"])
+
+        await communicator.send_json_to({"command": "remove_everything"})
+        self.assertEqual(
+            await communicator.receive_json_from(), {"error": "Unknown command."}
+        )
+
+        await communicator.disconnect()
+
+    @mock.patch("notifications.consumers.NOTIFICATION_WS_COMMAND_BURST", 2)
+    @mock.patch("notifications.consumers.NOTIFICATION_WS_COMMAND_RATE", 0.01)
+    async def test_command_rate_limit(self):
+        """Reject commands over the per-connection rate limit"""
+
+        communicator = await self.test_connect_notification_consumer()
+        await communicator.receive_json_from()
+
+        responses = []
+        for _ in range(3):
+            await communicator.send_json_to({"command": "ping"})
+            responses.append(await communicator.receive_json_from())
+        await communicator.disconnect()
+
+        self.assertEqual(
+            responses,
+            [{"event": "pong"}, {"event": "pong"}, {"error": "Too many commands."}],
+        )
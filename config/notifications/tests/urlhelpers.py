@@ -5,6 +5,10 @@ def get_user_notification_list_url():
     return reverse("user-notification-list")
 
 
+def get_user_archived_notification_list_url():
+    return reverse("user-archived-notification-list")
+
+
 def get_notification_detail_url(uid: str):
     return reverse("user-notification-detail", args=[uid])
 
@@ -6,6 +6,11 @@ from notifications import views
 
 urlpatterns = [
     path("", views.UserNotificationList.as_view(), name="user-notification-list"),
+    path(
+        "/archive",
+        views.UserArchivedNotificationList.as_view(),
+        name="user-archived-notification-list",
+    ),
     path("/<uuid:uid>", views.UserNotificationDetail.as_view(), name="user-notification-detail"),
     # path("/create-noti", views.CreateBulkNotification.as_view(), name="user-notification-bulk-create"),
 ]
@@ -1,55 +1,180 @@
+import hashlib
 import logging
 import jsonschema
 import json
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from functools import lru_cache
 
 from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.core import serializers
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db.models.query import QuerySet
 from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from django.forms.models import model_to_dict
+from django.utils import timezone
+from django.utils.encoding import is_protected_type
 
+from rest_framework_simplejwt.models import TokenUser
 from rest_framework_simplejwt.tokens import AccessToken
+from dirtyfields import DirtyFieldsMixin
 from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
 
 from notifications.choices import NotificationsStatus
+from notifications.dispatchers import notification_dispatcher
 from notifications.schema_validations import NOTIFICATION_SCHEMA
-from notifications.models import Notification
-from notifications.serializers import UserNotificationListWithCountSerializer
+from notifications.inbox import get_inbox_cursor, parse_inbox_cursor
+from notifications.models import (
+    Notification,
+    NotificationCounter,
+    NOTIFICATION_BROADCASTS,
+)
+from notifications.paginations import CustomPagination
+from notifications.serializers import (
+    UserNotificationListWithCountSerializer,
+    NotificationSerializer,
+)
 
-from channels.db import database_sync_to_async
 from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 
 
 User = get_user_model()
 logger = logging.getLogger(__name__)
 ALLOWED_NOTIFICATION_DATA = getattr(settings, "ALLOWED_NOTIFICATION_DATA", False)
 CACHE_TIMEOUT = getattr(settings, "CACHE_TIMEOUT", 60 * 60)
+# Latest notifications in the websocket snapshot, None sends the whole inbox
+NOTIFICATION_WS_SNAPSHOT_SIZE = getattr(settings, "NOTIFICATION_WS_SNAPSHOT_SIZE", None)
+# "invalidate" drops all cached pages on change, "write_through" patches the first page
+NOTIFICATION_CACHE_STRATEGY = getattr(settings, "NOTIFICATION_CACHE_STRATEGY", "invalidate")
+NOTIFICATION_CACHE_METRICS = getattr(settings, "NOTIFICATION_CACHE_METRICS", False)
+DJANGO_JSON_ENCODER = DjangoJSONEncoder()
+BROADCAST_CACHE_VERSION_KEY = "notif:broadcast:version"
+# Decoded access tokens are reused for reconnects, 0 disables the cache
+NOTIFICATION_TOKEN_CACHE_SIZE = getattr(settings, "NOTIFICATION_TOKEN_CACHE_SIZE", 1024)
+NOTIFICATION_TOKEN_CACHE_TIMEOUT = getattr(
+    settings, "NOTIFICATION_TOKEN_CACHE_TIMEOUT", 60 * 5
+)
+
+
+class DecodedTokenCache:
+    """
+    Small in-process LRU cache of decoded access token payloads.
 
+    Entries are keyed by the token hash and expire after ``timeout`` seconds,
+    or when the token itself expires if that comes first.
+    """
+
+    def __init__(self, max_size=1024, timeout=300):
+        self.max_size = max_size
+        self.timeout = timeout
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token):
+        key = self.get_key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            payload, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, token, payload):
+        if not self.max_size or not self.timeout:
+            return
+
+        key = self.get_key(token)
+        expires_at = min(time.time() + self.timeout, payload.get("exp", float("inf")))
+        with self._lock:
+            self._entries[key] = (payload, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    @staticmethod
+    def get_key(token):
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+decoded_token_cache = DecodedTokenCache(
+    max_size=NOTIFICATION_TOKEN_CACHE_SIZE, timeout=NOTIFICATION_TOKEN_CACHE_TIMEOUT
+)
+
+
+class NotificationPrincipal(TokenUser):
+    """
+    Lightweight websocket user built from the access token claims.
+
+    The full user instance is only loaded when it is actually needed.
+    """
+
+    def __getattr__(self, attr):
+        # Memoized private attributes are never token claims
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return super().__getattr__(attr)
+
+    async def aget_user(self):
+        """Load the full user instance once"""
+        if not hasattr(self, "_user"):
+            self._user = await get_user(self.id)
+        return self._user
+
+
+def get_token_payload(token):
+    """Validate the token and return its payload, skipping repeated verification"""
+    payload = decoded_token_cache.get(token)
+    if payload is not None:
+        return payload
 
-def validate_token(token):
-    """Validate the token and return the user_id"""
     try:
-        access_token = AccessToken(token)
-        user_id = access_token.payload["user_id"]
-        return user_id
+        payload = AccessToken(token).payload
     except Exception as e:
         logger.error(f"{e}")
         return None
 
+    decoded_token_cache.set(token, payload)
+    return payload
+
+
+def validate_token(token):
+    """Validate the token and return the user_id"""
+    payload = get_token_payload(token)
+    if payload is None:
+        return None
+
+    return payload.get("user_id")
+
 
 def get_group_name(user):
     """Create a group name for the user"""
     return f"user_{user.id}"
 
 
-@database_sync_to_async
-def get_user(user_id):
+def get_broadcast_group_name():
+    """Get the group name every connected user joins for broadcasts"""
+    return "notification_broadcasts"
+
+
+async def get_user(user_id):
     """Get user from the database"""
-    try:
-        return User.objects.get(id=user_id)
-    except User.DoesNotExist:
-        return None
+    return await User.objects.filter(id=user_id).afirst()
 
 
 def serialized_notifications(notifications):
@@ -57,6 +182,19 @@ def serialized_notifications(notifications):
     return UserNotificationListWithCountSerializer(notifications).data
 
 
+def get_notification_window(notifications, size):
+    """
+    Trim notifications fetched with one extra row to ``size`` and return them
+    with the cursor of the next window, None when there are no more.
+    """
+    notifications = list(notifications)
+    if len(notifications) <= size:
+        return notifications, None
+
+    notifications = notifications[:size]
+    return notifications, get_inbox_cursor(notifications[-1])
+
+
 def get_user_serialized_notifications(user):
     """Get notifications for the user and return serialized data"""
     try:
@@ -64,6 +202,15 @@ def get_user_serialized_notifications(user):
     except ValueError as e:
         return {"error": str(e)}
 
+    # Only the latest notifications and a cursor to page the older ones
+    if ALLOWED_NOTIFICATION_DATA and NOTIFICATION_WS_SNAPSHOT_SIZE:
+        notifications["notifications"], notifications["next"] = (
+            get_notification_window(
+                notifications["notifications"][: NOTIFICATION_WS_SNAPSHOT_SIZE + 1],
+                size=NOTIFICATION_WS_SNAPSHOT_SIZE,
+            )
+        )
+
     serialized_notification = serialized_notifications(notifications)
 
     # Check is the user want to get the notification data in websocket response
@@ -75,33 +222,180 @@ def get_user_serialized_notifications(user):
     return serialized_notification
 
 
-def update_notification_read_status(notifications, is_read=True):
-    """Update the read status of the notifications"""
-    for notification in notifications:
-        notification.is_read = is_read
-        notification.save_dirty_fields()
+async def aget_user_serialized_notifications(user):
+    """
+    Async version of ``get_user_serialized_notifications``.
 
-    return notifications
+    The queries go through the async ORM and the notifications are only
+    fetched when they are part of the websocket response.
+    """
+    size = NOTIFICATION_WS_SNAPSHOT_SIZE
+    try:
+        notifications = await Notification().aget_current_user_notifications(
+            user=user,
+            with_notifications=ALLOWED_NOTIFICATION_DATA,
+            limit=size + 1 if size else None,
+        )
+    except ValueError as e:
+        return {"error": str(e)}
 
+    if ALLOWED_NOTIFICATION_DATA and size:
+        notifications["notifications"], notifications["next"] = (
+            get_notification_window(notifications["notifications"], size=size)
+        )
 
-def update_notification_status(notifications, status: NotificationsStatus):
-    """Update the status of the notifications"""
-    for notification in notifications:
-        notification.status = status
-        notification.save_dirty_fields()
+    serialized_notification = serialized_notifications(notifications)
 
-    return notifications
+    if not ALLOWED_NOTIFICATION_DATA:
+        serialized_notification.pop("notifications")
+
+    return serialized_notification
+
+
+async def aget_user_notification_page(user, cursor, page_size=None):
+    """
+    Get the user's notifications older than the ``cursor`` for the websocket
+    ``fetch_page`` command, with the cursor of the next page.
+    """
+    if not ALLOWED_NOTIFICATION_DATA:
+        return {"error": "Notification data is not allowed over the websocket."}
+
+    try:
+        before = parse_inbox_cursor(cursor) if cursor is not None else None
+        size = int(
+            page_size or NOTIFICATION_WS_SNAPSHOT_SIZE or CustomPagination.page_size
+        )
+    except (TypeError, ValueError):
+        return {"error": "Invalid cursor or page size."}
+    size = max(1, min(size, CustomPagination.max_page_size))
+
+    try:
+        notifications = await Notification().aget_current_user_notifications(
+            user=user, limit=size + 1, before=before
+        )
+    except ValueError as e:
+        return {"error": str(e)}
+
+    notifications, next_cursor = get_notification_window(
+        notifications["notifications"], size=size
+    )
+    return {
+        "event": "page",
+        "notifications": NotificationSerializer(notifications, many=True).data,
+        "next": next_cursor,
+    }
+
+
+def update_notification_read_status(notifications, is_read=True, user=None):
+    """
+    Update the read status of the notifications in a single statement
+
+    Returns:
+        int: Number of updated notifications.
+    """
+    return bulk_update_notifications(notifications, user=user, is_read=is_read)
+
+
+def update_notification_status(notifications, status: NotificationsStatus, user=None):
+    """
+    Update the status of the notifications in a single statement
+
+    Returns:
+        int: Number of updated notifications.
+    """
+    return bulk_update_notifications(notifications, user=user, status=status)
+
+
+def bulk_update_notifications(notifications, user=None, **fields):
+    """
+    Apply a set-based update to the notifications, adjust the counters and
+    fire one bulk change event for the affected users instead of a post_save
+    per row.
+
+    When ``user`` is given the update is scoped to that user's notifications.
+    """
+    from notifications.signals import notification_bulk_change
+
+    if user is not None:
+        notifications = notifications.filter(user_id=user.pk)
+
+    with transaction.atomic():
+        # Lock the rows first, concurrent updates of the same rows wait and then
+        # count from the committed state instead of subtracting it twice
+        max_pk = None
+        for pk in (
+            notifications.select_for_update()
+            .order_by()
+            .values_list("pk", flat=True)
+            .iterator()
+        ):
+            max_pk = pk if max_pk is None or pk > max_pk else max_pk
+        if max_pk is None:
+            return 0
+
+        # The locked rows are selected with a subquery instead of a list of
+        # their pks, bounded by the highest pk so rows inserted since are left out
+        notifications = Notification.objects.filter(
+            pk__in=notifications.filter(pk__lte=max_pk).order_by().values("pk")
+        )
+
+        # Counter deltas, events and cache changes are computed from the rows
+        # before they change, the update may take them out of the queryset
+        deltas = NotificationCounter().get_update_deltas(notifications, **fields)
+        events = get_bulk_notification_events(notifications, **fields)
+        # QuerySet.update() skips auto_now, so set updated_at explicitly
+        updated_at = timezone.now()
+        changes = get_bulk_notification_changes(
+            notifications, user_ids=list(deltas), updated_at=updated_at, **fields
+        )
+
+        updated = notifications.update(updated_at=updated_at, **fields)
+        NotificationCounter().apply_deltas(deltas=deltas)
+
+        if updated:
+            notification_bulk_change.send(
+                sender=Notification,
+                user_ids=list(deltas),
+                fields=fields,
+                events=events,
+                changes=changes,
+            )
+
+    return updated
+
+
+@lru_cache(maxsize=None)
+def get_notification_validator():
+    """
+    Build the JSON schema validator of the notification field once.
+
+    ``jsonschema.validate`` checks the schema and creates a validator on
+    every call, the compiled validator is reused instead.
+    """
+    validator_class = jsonschema.validators.validator_for(NOTIFICATION_SCHEMA)
+    validator_class.check_schema(NOTIFICATION_SCHEMA)
+    return validator_class(NOTIFICATION_SCHEMA)
 
 
 def validate_notification(notification_data: dict, use_for_model=False):
     """
     Perform JSON schema validation for the notification field.
     """
+    validate_notifications([notification_data], use_for_model=use_for_model)
+
+
+def validate_notifications(notifications_data: list, use_for_model=False):
+    """
+    Perform JSON schema validation for many notification fields in one pass.
+    """
     from django.core.exceptions import ValidationError
 
-    try:
-        jsonschema.validate(instance=notification_data, schema=NOTIFICATION_SCHEMA)
-    except jsonschema.exceptions.ValidationError as e:
+    validator = get_notification_validator()
+
+    for notification_data in notifications_data:
+        if validator.is_valid(notification_data):
+            continue
+
         # Create a readable message for notification message
         valid_schema_message = {
             "message": "Your Message you want to send in notification",
@@ -116,8 +410,23 @@ def validate_notification(notification_data: dict, use_for_model=False):
         raise ValueError(message)
 
 
-def get_changed_fields(model_instance):
-    """Get the changed fields of a model instance"""
+def get_changed_fields(
+    model_instance, use_dirty_fields=False, m2m_pk_only=False, m2m_max_ids=None
+):
+    """
+    Get the changed fields of a model instance
+
+    With ``use_dirty_fields`` the diff is built from the in-memory dirty
+    fields snapshot of a ``DirtyFieldsMixin`` instance without any query.
+    Relations are compared by primary key and many-to-many changes come from
+    the tracked add/remove/clear signals since the last save. The snapshot
+    resets on save, so call it before saving the instance.
+
+    ``m2m_pk_only`` and ``m2m_max_ids`` select the primary key only M2M
+    comparison, see ``handle_many_to_many_field_comparison``.
+    """
+    if use_dirty_fields:
+        return get_dirty_changed_fields(model_instance)
 
     changed_data = {}
 
@@ -164,16 +473,108 @@ def get_changed_fields(model_instance):
     # Handle M2M relationship changes
     if model_instance._meta.many_to_many:
         changed_data = handle_many_to_many_field_comparison(
-            changed_data, model_instance, original_instance
+            changed_data,
+            model_instance,
+            original_instance,
+            pk_only=m2m_pk_only,
+            max_ids=m2m_max_ids,
         )
 
     return changed_data
 
 
+def get_dirty_changed_fields(model_instance):
+    """Get the changed fields of a model instance from its dirty fields snapshot"""
+    if not isinstance(model_instance, DirtyFieldsMixin):
+        raise ValueError(
+            "Provided model instance to get dirty changed fields must use DirtyFieldsMixin"
+        )
+
+    if model_instance._state.adding:
+        raise ValueError(
+            "Provided model instance to get changed fields is not found in the database"
+        )
+
+    changed_data = {}
+    dirty_fields = model_instance.get_dirty_fields(check_relationship=True)
+
+    for field_name, original_value in dirty_fields.items():
+        field = model_instance._meta.get_field(field_name)
+
+        # Compare relationships by primary key without loading the related objects
+        if field.remote_field:
+            current_value = getattr(model_instance, field.attname)
+        else:
+            current_value = getattr(model_instance, field_name)
+
+        # Handle JSONField comparison
+        if field.__class__.__name__ == "JSONField":
+            changed_json_fields = compare_json_fields(
+                original_value or {}, current_value or {}
+            )
+            if changed_json_fields:
+                changed_data[field_name] = changed_json_fields
+            continue
+
+        changed_data[field_name] = {
+            "original": original_value,
+            "new": current_value,
+        }
+
+    # Handle the tracked M2M relationship changes
+    tracked_m2m_changes = getattr(model_instance, "_tracked_m2m_changes", {})
+    for field_name, m2m_changes in tracked_m2m_changes.items():
+        if m2m_changes["added"] or m2m_changes["removed"]:
+            changed_data[field_name] = {
+                "added": [to_json_value(pk) for pk in m2m_changes["added"]] or None,
+                "removed": [to_json_value(pk) for pk in m2m_changes["removed"]]
+                or None,
+            }
+
+    return changed_data
+
+
+def track_m2m_changes(instance, field_name, action, pk_set=None):
+    """
+    Track the added and removed primary keys of a many-to-many relation on the
+    instance until its next save, for dirty fields based diffs.
+    """
+    tracked_m2m_changes = instance.__dict__.setdefault("_tracked_m2m_changes", {})
+    m2m_changes = tracked_m2m_changes.setdefault(
+        field_name, {"added": set(), "removed": set()}
+    )
+
+    if action == "post_add":
+        # Re-adding a removed member cancels out
+        m2m_changes["added"] |= pk_set - m2m_changes["removed"]
+        m2m_changes["removed"] -= pk_set
+
+    elif action in ["post_remove", "pre_clear"]:
+        # Removing an added member cancels out
+        m2m_changes["removed"] |= pk_set - m2m_changes["added"]
+        m2m_changes["added"] -= pk_set
+
+
+def reset_tracked_m2m_changes(instance):
+    """Forget the tracked many-to-many changes of the instance"""
+    instance.__dict__.pop("_tracked_m2m_changes", None)
+
+
 def handle_many_to_many_field_comparison(
-    changed_data, model_instance, original_instance
+    changed_data, model_instance, original_instance, pk_only=False, max_ids=None
 ):
-    """Handle the many to many field comparison"""
+    """
+    Handle the many to many field comparison
+
+    With ``pk_only`` only the related primary keys are loaded and compared,
+    and the payload holds the added and removed ids, capped to ``max_ids``
+    each, with their counts instead of the full original and new rows.
+    """
+    if pk_only:
+        return handle_many_to_many_field_pk_comparison(
+            changed_data, model_instance, original_instance, max_ids=max_ids
+        )
+
     for m2m_field in model_instance._meta.many_to_many:
         field_name = m2m_field.name
 
@@ -204,6 +605,36 @@ def handle_many_to_many_field_comparison(
     return changed_data
 
 
+def handle_many_to_many_field_pk_comparison(
+    changed_data, model_instance, original_instance, max_ids=None
+):
+    """Handle the many to many field comparison by primary keys"""
+    for m2m_field in model_instance._meta.many_to_many:
+        field_name = m2m_field.name
+
+        original_ids = set(
+            getattr(original_instance, field_name).values_list("pk", flat=True)
+        )
+        current_ids = set(
+            getattr(model_instance, field_name).values_list("pk", flat=True)
+        )
+
+        # Find the added and removed ids
+        added = sorted(current_ids - original_ids)
+        removed = sorted(original_ids - current_ids)
+
+        # Compare the M2M ids
+        if added or removed:
+            changed_data[field_name] = {
+                "added": [to_json_value(pk) for pk in added[:max_ids]] or None,
+                "removed": [to_json_value(pk) for pk in removed[:max_ids]] or None,
+                "added_count": len(added),
+                "removed_count": len(removed),
+            }
+
+    return changed_data
+
+
 def compare_json_fields(original, current):
     """Compare two JSON objects and return only the changed fields."""
     changes = {}
@@ -228,11 +659,11 @@ def create_notification_json(
         if not field_value:
             raise ValidationError(f"{field_name} is required for notification")
 
-    # Serialize the queryset/model to JSON
+    # Serialize the queryset/model to JSON compatible data
     if serializer:
         serialized_model = serializer(instance).data
     else:
-        serialized_model = json.loads(serializers.serialize("json", [instance]))[0]
+        serialized_model = model_to_notification_dict(instance)
 
     # Arrange the notification object
     notification = {
@@ -249,6 +680,123 @@ def create_notification_json(
     return notification
 
 
+def create_notification_json_batch(
+    message: str = None,
+    instances: list = None,
+    serializer=None,
+    method="UNDEFINED",
+    changed_data: dict = {},
+):
+    """
+    Create notification field json data for many instances of the same model.
+
+    Many-to-many relations are prefetched once and the payloads are
+    validated in a single pass.
+    """
+
+    # Handle the required fields error
+    required_fields = {"message": message, "instances": instances}
+    for field_name, field_value in required_fields.items():
+        if not field_value:
+            raise ValidationError(f"{field_name} is required for notification")
+
+    instances = list(instances)
+
+    # Serialize the models to JSON compatible data
+    if serializer:
+        serialized_models = serializer(instances, many=True).data
+    else:
+        _, _, m2m_fields = get_model_field_plan(instances[0].__class__)
+        prefetch_related_objects(instances, *(field.name for field in m2m_fields))
+        serialized_models = [
+            model_to_notification_dict(instance) for instance in instances
+        ]
+
+    # Arrange the notification objects
+    notifications = [
+        {
+            "message": message,
+            "model": instance.__class__.__name__,
+            "instance": serialized_model,
+            "method": method,
+            "changed_data": changed_data,
+        }
+        for instance, serialized_model in zip(instances, serialized_models)
+    ]
+
+    # Validate the notifications against the schema
+    validate_notifications(notifications)
+
+    return notifications
+
+
+@lru_cache(maxsize=None)
+def get_model_field_plan(model):
+    """
+    Get the fields the Django "json" serializer would dump for a model.
+
+    Returns:
+        tuple: Model label, concrete fields and many-to-many fields.
+    """
+    concrete_model = model._meta.concrete_model
+
+    fields = tuple(
+        field for field in concrete_model._meta.local_fields if field.serialize
+    )
+    m2m_fields = tuple(
+        field
+        for field in concrete_model._meta.local_many_to_many
+        if field.serialize and field.remote_field.through._meta.auto_created
+    )
+
+    return str(model._meta), fields, m2m_fields
+
+
+def model_to_notification_dict(instance):
+    """
+    Convert a model instance to the same data as decoding its Django "json"
+    serialization, without the encode/decode roundtrip.
+    """
+    label, fields, m2m_fields = get_model_field_plan(instance.__class__)
+
+    serialized_fields = {
+        field.name: get_json_field_value(instance, field) for field in fields
+    }
+
+    for field in m2m_fields:
+        prefetched_objects = getattr(instance, "_prefetched_objects_cache", {})
+        if field.name in prefetched_objects:
+            related_pks = [related.pk for related in prefetched_objects[field.name]]
+        else:
+            related_pks = getattr(instance, field.name).values_list("pk", flat=True)
+        serialized_fields[field.name] = [to_json_value(pk) for pk in related_pks]
+
+    return {
+        "model": label,
+        "pk": get_json_field_value(instance, instance._meta.pk),
+        "fields": serialized_fields,
+    }
+
+
+def get_json_field_value(instance, field):
+    """Get the JSON compatible value of a model field like Django's serializers"""
+    value = field.value_from_object(instance)
+
+    # Protected types are passed through as is, others are converted to string
+    if not is_protected_type(value):
+        value = field.value_to_string(instance)
+
+    return to_json_value(value)
+
+
+def to_json_value(value):
+    """Convert a value the way DjangoJSONEncoder encodes it"""
+    if value is None or isinstance(value, (str, int, float, list, dict)):
+        return value
+
+    return DJANGO_JSON_ENCODER.default(value)
+
+
 def add_user_notification_to_group(user, channel_layer):
     """Add user notification to the group for broadcasting"""
 
@@ -266,6 +814,474 @@ def add_user_notification_to_group(user, channel_layer):
     )
 
 
+def add_user_notification_events_to_group(user, events, channel_layer):
+    """
+    Send the user's notification change events, followed by the user's
+    counts, to the group. Every event carries the next sequence number of
+    the user so clients can detect a gap and ask for a resync.
+
+    ``events`` is None when they were discarded on the way, the client is
+    then told to resync.
+    """
+    if events is None:
+        events = [{"event": "resync"}]
+
+    try:
+        notification_counts = Notification().get_current_user_notifications(
+            user=user
+        )
+    except ValueError as e:
+        notification_counts = {"error": str(e)}
+
+    group_name = get_group_name(user=user)
+    if "error" in notification_counts:
+        async_to_sync(channel_layer.group_send)(
+            group_name,
+            {
+                "type": "notification.update",
+                "user_notifications": notification_counts,
+            },
+        )
+        return
+
+    notification_counts.pop("notifications")
+    events = [*events, {"event": "counts", **notification_counts}]
+    first_seq = reserve_user_notification_seqs(user_id=user.id, count=len(events))
+
+    async_to_sync(channel_layer.group_send)(
+        group_name,
+        {
+            "type": "notification.delta",
+            "events": [
+                {**event, "seq": seq}
+                for seq, event in enumerate(events, start=first_seq)
+            ],
+        },
+    )
+
+
+def get_user_notification_seq_key(user_id):
+    """Get the cache key of the user's last pushed event sequence number"""
+    return f"notif:{user_id}:seq"
+
+
+def reserve_user_notification_seqs(user_id, count):
+    """Reserve ``count`` consecutive sequence numbers and return the first one"""
+    seq_key = get_user_notification_seq_key(user_id=user_id)
+    cache.add(seq_key, 0, timeout=None)
+
+    try:
+        last_seq = cache.incr(seq_key, count)
+    except ValueError:
+        # The key was evicted in between, start over
+        cache.set(seq_key, count, timeout=None)
+        last_seq = count
+
+    return last_seq - count + 1
+
+
+def get_created_notification_event(notification):
+    """Build the created event of a notification"""
+    return {
+        "event": "created",
+        "notification": dict(NotificationSerializer(notification).data),
+    }
+
+
+def get_notification_events(instance, created=False, deleted=False):
+    """
+    Build the change events of a saved or deleted notification.
+
+    Dirty fields still hold the saved values until the save signals complete,
+    so the previous user and status are read from them.
+
+    Returns:
+        dict: Events keyed by user id, or None when delta pushes are disabled.
+    """
+    if notification_dispatcher.mode != "delta":
+        return None
+
+    removed_event = {"event": "removed", "uids": [str(instance.uid)]}
+    is_active = instance.status == NotificationsStatus.ACTIVE
+
+    if deleted:
+        return {instance.user_id: [removed_event]} if is_active else {}
+
+    if created:
+        if not is_active:
+            return {}
+        return {instance.user_id: [get_created_notification_event(instance)]}
+
+    dirty_fields = instance.get_dirty_fields(check_relationship=True)
+    previous_user_id = dirty_fields.get("user", instance.user_id)
+    was_active = (
+        dirty_fields.get("status", instance.status) == NotificationsStatus.ACTIVE
+    )
+
+    # The notification moved in or out of an inbox
+    if previous_user_id != instance.user_id or was_active != is_active:
+        events = {}
+        if was_active:
+            events[previous_user_id] = [removed_event]
+        if is_active:
+            events.setdefault(instance.user_id, []).append(
+                get_created_notification_event(instance)
+            )
+        return events
+
+    if not is_active:
+        return {}
+
+    if instance.is_read and set(dirty_fields) <= {"is_read", "updated_at"}:
+        return {instance.user_id: [{"event": "read", "uids": [str(instance.uid)]}]}
+
+    return {
+        instance.user_id: [
+            {
+                "event": "updated",
+                "notification": dict(NotificationSerializer(instance).data),
+            }
+        ]
+    }
+
+
+def get_created_notification_events(notifications):
+    """
+    Build the created events of bulk created notifications.
+
+    Returns:
+        dict: Events keyed by user id, or None when delta pushes are disabled.
+    """
+    if notification_dispatcher.mode != "delta":
+        return None
+
+    events = {}
+    for notification in notifications:
+        if notification.status == NotificationsStatus.ACTIVE:
+            events.setdefault(notification.user_id, []).append(
+                get_created_notification_event(notification)
+            )
+
+    return events
+
+
+def get_bulk_notification_events(notifications, **fields):
+    """
+    Build the change events of a set-based update before it is applied.
+
+    Returns:
+        dict: Events keyed by user id, or None when delta pushes are disabled.
+    """
+    if notification_dispatcher.mode != "delta":
+        return None
+
+    if "status" in fields and fields["status"] != NotificationsStatus.ACTIVE:
+        event = "removed"
+    elif fields.get("is_read") is True and "status" not in fields:
+        event = "read"
+    else:
+        # Other updates only push the fresh counts
+        return {}
+
+    uids = {}
+    for user_id, uid in notifications.values_list("user_id", "uid"):
+        uids.setdefault(user_id, []).append(str(uid))
+
+    return {
+        user_id: [{"event": event, "uids": user_uids}]
+        for user_id, user_uids in uids.items()
+    }
+
+
+def get_removed_notification_events(notifications):
+    """
+    Build the removed events of notification rows taken out of the table,
+    given as dicts with their ``user_id``, ``uid`` and ``status``.
+
+    Returns:
+        dict: Events keyed by user id, or None when delta pushes are disabled.
+    """
+    if notification_dispatcher.mode != "delta":
+        return None
+
+    uids = {}
+    for notification in notifications:
+        if notification["status"] == NotificationsStatus.ACTIVE:
+            uids.setdefault(notification["user_id"], []).append(
+                str(notification["uid"])
+            )
+
+    return {
+        user_id: [{"event": "removed", "uids": user_uids}]
+        for user_id, user_uids in uids.items()
+    }
+
+
+def get_created_notification_changes(notifications):
+    """
+    Build the write-through cache changes of bulk created notifications.
+
+    Returns:
+        dict: ``(change, notification)`` pairs keyed by user id, or None when
+        the cache is invalidated instead.
+    """
+    if NOTIFICATION_CACHE_STRATEGY != "write_through":
+        return None
+
+    # Backends that do not return the ids of bulk created rows are invalidated
+    if any(notification.pk is None for notification in notifications):
+        return None
+
+    changes = {}
+    for notification in sorted(notifications, key=lambda notification: notification.pk):
+        if notification.status == NotificationsStatus.ACTIVE:
+            changes.setdefault(notification.user_id, []).append(
+                ("created", notification)
+            )
+
+    return changes
+
+
+def get_bulk_notification_changes(notifications, user_ids, **fields):
+    """
+    Build the write-through cache changes of a set-based update before it is
+    applied, with the updated ``fields`` set on the notifications. Only the
+    latest updated notifications of each user can be on the cached first
+    page, so only those are read.
+
+    Returns:
+        dict: ``(change, notification)`` pairs keyed by user id, or None when
+        the cache is invalidated instead.
+    """
+    if NOTIFICATION_CACHE_STRATEGY != "write_through":
+        return None
+
+    # Status and user changes move rows in or out of the inbox
+    if {"status", "user", "user_id"} & set(fields):
+        return None
+
+    notifications = notifications.select_related("user", "created_by", "message")
+    changes = {}
+    for user_id in user_ids:
+        changes[user_id] = []
+        for notification in notifications.filter(user_id=user_id).order_by("-pk")[
+            : CustomPagination.page_size
+        ]:
+            for field, value in fields.items():
+                setattr(notification, field, value)
+            changes[user_id].append(("updated", notification))
+
+    return changes
+
+
+def refresh_broadcasts(using=None):
+    """
+    Invalidate the cached inbox of every user at once by bumping the
+    broadcast version, and tell the connected users to refresh, once the
+    transaction commits.
+    """
+    transaction.on_commit(invalidate_broadcasts_cache, using=using)
+    transaction.on_commit(push_broadcasts, using=using)
+
+
+def invalidate_broadcasts_cache():
+    """Invalidate the cached inbox of every user by bumping the broadcast version"""
+    try:
+        cache.incr(BROADCAST_CACHE_VERSION_KEY)
+    except ValueError:
+        # Nothing cached against a broadcast version yet
+        pass
+
+
+def push_broadcasts():
+    """Send a broadcast change to every connected user"""
+    async_to_sync(get_channel_layer().group_send)(
+        get_broadcast_group_name(), {"type": "notification.broadcast"}
+    )
+
+
+def refresh_users_notifications(user_ids, using=None, events=None, changes=None):
+    """
+    Refresh the cache of the given users and push their fresh notifications,
+    or their change ``events``, to the websocket groups once the transaction
+    commits.
+
+    The cached first page of the users with write-through ``changes`` is
+    patched, the cache of the other users is invalidated. Both happen after
+    the commit, a reader caching the old rows in between would otherwise
+    store them under the new version.
+    """
+    user_ids = set(user_ids)
+    changes = changes or {}
+
+    def refresh_cache():
+        for user_id in user_ids:
+            if changes.get(user_id):
+                write_through_user_notifications_cache(
+                    user=changes[user_id][0][1].user, changes=changes[user_id]
+                )
+            else:
+                invalidate_user_notifications_cache(user_id=user_id)
+
+    transaction.on_commit(refresh_cache, using=using)
+    notification_dispatcher.mark_dirty(user_ids, using=using, events=events)
+
+
+def refresh_user_notification_change(instance, change, using=None, events=None):
+    """
+    Refresh the user's cache for a single notification change and push the
+    user's fresh notifications, or the change ``events``, once the
+    transaction commits.
+
+    With the write-through strategy the cached first page is patched after
+    the commit, otherwise the user's cache is invalidated after the commit.
+    """
+    if NOTIFICATION_CACHE_STRATEGY == "write_through":
+        transaction.on_commit(
+            lambda: write_through_user_notifications_cache(
+                user=instance.user, changes=[(change, instance)]
+            ),
+            using=using,
+        )
+    else:
+        transaction.on_commit(
+            lambda: invalidate_user_notifications_cache(user_id=instance.user_id),
+            using=using,
+        )
+
+    user_ids = {instance.user_id, *(events or {})}
+    notification_dispatcher.mark_dirty(user_ids, using=using, events=events)
+
+
+def get_notification_change(instance, created=False, deleted=False):
+    """
+    Classify a saved or deleted notification for the cache refresh.
+
+    Returns:
+        str: "created" or "updated" for changes the cached first page can be
+        patched with, "structural" for changes that move rows in or out of
+        the inbox, or None when the inbox does not change.
+    """
+    if deleted:
+        return "structural"
+
+    if created:
+        if instance.status == NotificationsStatus.ACTIVE:
+            return "created"
+        return None
+
+    # Dirty fields still hold the saved values until the save signals complete
+    dirty_fields = instance.get_dirty_fields(check_relationship=True)
+    if "status" in dirty_fields or "user" in dirty_fields:
+        return "structural"
+
+    return "updated"
+
+
+def write_through_user_notifications_cache(user, changes):
+    """
+    Patch the cached first page and counts of the user with changed
+    notifications, given as ``(change, notification)`` pairs in the order
+    they happened, and invalidate the other pages.
+
+    Falls back to invalidation for structural changes, when the first page
+    is not cached or when another change bumped the version concurrently.
+    """
+    page_size = CustomPagination.page_size
+    cache_kwargs = {"user": user, "query_params": None}
+    page_numbers = [1, "bytes:1"]
+
+    # Read the cached first pages before bumping the version
+    old_version = get_user_cache_version(user.id)
+    old_cache_keys = {
+        generate_cache_key(
+            page_number=page_number, version=old_version, **cache_kwargs
+        ): page_number
+        for page_number in page_numbers
+    }
+    cached_pages = cache.get_many(list(old_cache_keys))
+
+    new_version = invalidate_user_notifications_cache(user_id=user.id)
+
+    if (
+        any(change == "structural" for change, _ in changes)
+        or not cached_pages
+        or new_version != old_version + 1
+    ):
+        return
+
+    try:
+        counts = Notification().get_current_user_notifications(user=user)
+    except ValueError:
+        return
+    counts.pop("notifications")
+
+    for cache_key, page in cached_pages.items():
+        page_number = old_cache_keys[cache_key]
+        patch_kwargs = {
+            "page": page,
+            "changes": changes,
+            "counts": counts,
+            "page_size": page_size,
+        }
+
+        if isinstance(page, bytes):
+            page = patch_cached_bytes_page(**patch_kwargs)
+        else:
+            page = patch_cached_page(**patch_kwargs)
+
+        cache.set(
+            generate_cache_key(
+                page_number=page_number, version=new_version, **cache_kwargs
+            ),
+            page,
+            CACHE_TIMEOUT,
+        )
+        incr_cache_metric("patches")
+
+
+def patch_cached_page(page, changes, counts, page_size, serialize=None):
+    """Patch a cached page dict with created or updated notifications"""
+    notifications = list(page["notifications"])
+
+    # Serialized notifications are dicts, cached objects are model instances
+    def get_id(item):
+        return item["id"] if serialize else item.pk
+
+    for change, instance in changes:
+        notification = serialize(instance) if serialize else instance
+
+        if change == "created":
+            notifications = [notification, *notifications][:page_size]
+        else:
+            notifications = [
+                notification if get_id(item) == instance.pk else item
+                for item in notifications
+            ]
+
+    return {**page, **counts, "notifications": notifications}
+
+
+def patch_cached_bytes_page(page, changes, counts, page_size):
+    """Patch a cached rendered page, keeping its compression"""
+    is_compressed = not page.startswith(b"{")
+    if is_compressed:
+        page = zlib.decompress(page)
+
+    page = patch_cached_page(
+        page=json.loads(page),
+        changes=changes,
+        counts=counts,
+        page_size=page_size,
+        serialize=lambda notification: json.loads(
+            JSONRenderer().render(NotificationSerializer(notification).data)
+        ),
+    )
+    page = JSONRenderer().render(page)
+
+    return zlib.compress(page) if is_compressed else page
+
+
 def get_token_from_scope(scope):
     """Extract the token from the scope."""
 
@@ -285,35 +1301,114 @@ def get_token_from_scope(scope):
         return None
 
 
-def generate_sub_key(query_params, page_number):
-    """Generate a sub-key based on the query parameters and page number"""
-    return f"{query_params}_{page_number}"
+def get_user_cache_version_key(user_id):
+    """Get the cache key of the user's notifications cache version"""
+    return f"notif:{user_id}:version"
 
 
-def get_user_cache_notifications(user, query_params, page_number):
-    """Get the user's notifications from the cache"""
-    cache_key = user.id
+def get_user_cache_version(user_id):
+    """Get the current version of the user's notifications cache"""
+    version_key = get_user_cache_version_key(user_id)
 
-    # Fetch the cached data for the user
-    user_cache = cache.get(cache_key, {})
+    version = cache.get(version_key)
+    if version is None:
+        # Start from a timestamp so an evicted version never reuses old page keys
+        cache.add(version_key, int(time.time() * 1000), None)
+        version = cache.get(version_key)
 
-    sub_key = generate_sub_key(query_params, page_number)
+    return version
 
-    # Try to get the cached data from the user's cache
-    if sub_key in user_cache:
-        return user_cache[sub_key]
 
-    return None
+def get_broadcast_cache_version():
+    """Get the current version of the broadcasts merged into every cached inbox"""
+    version = cache.get(BROADCAST_CACHE_VERSION_KEY)
+    if version is None:
+        # Start from a timestamp so an evicted version never reuses old page keys
+        cache.add(BROADCAST_CACHE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(BROADCAST_CACHE_VERSION_KEY)
 
+    return version
 
-def set_user_notifications_in_cache(user, query_params, page_number, queryset):
-    """Cache the user's notifications"""
-    user_cache = cache.get(user.id, {})
 
-    sub_key = generate_sub_key(query_params, page_number)
+def generate_cache_key(user, query_params, page_number, version=None):
+    """Generate a versioned cache key based on the query parameters and page number"""
+    if version is None:
+        version = get_user_cache_version(user.id)
+
+    # Broadcasts change the inbox of every user, they are versioned once for all
+    if NOTIFICATION_BROADCASTS:
+        version = f"{version}:b{get_broadcast_cache_version()}"
+
+    return f"notif:{user.id}:v{version}:{query_params}:{page_number}"
+
+
+def get_user_cache_notifications(user, query_params, page_number):
+    """Get the user's notifications page from the cache"""
+    cache_key = generate_cache_key(user, query_params, page_number)
+    cached_notifications = cache.get(cache_key)
 
-    # Cache the queryset
-    user_cache[sub_key] = queryset
-    cache.set(user.id, user_cache, CACHE_TIMEOUT)
+    incr_cache_metric("misses" if cached_notifications is None else "hits")
+
+    return cached_notifications
+
+
+def set_user_notifications_in_cache(user, query_params, page_number, queryset):
+    """Cache the user's notifications page"""
+    cache_key = generate_cache_key(user, query_params, page_number)
+    cache.set(cache_key, queryset, CACHE_TIMEOUT)
 
     return
+
+
+def invalidate_user_notifications_cache(user_id):
+    """
+    Invalidate the cached notifications of the user by bumping the cache
+    version, the pages of older versions are left to expire.
+
+    Returns:
+        int: The new cache version, or None if nothing is cached for the user.
+    """
+    incr_cache_metric("invalidations")
+
+    try:
+        return cache.incr(get_user_cache_version_key(user_id))
+    except ValueError:
+        # No version yet, so nothing is cached for the user
+        return None
+
+
+def incr_cache_metric(name):
+    """Increment a notification cache metric when metrics are enabled"""
+    if not NOTIFICATION_CACHE_METRICS:
+        return
+
+    metric_key = f"notif:metrics:{name}"
+    try:
+        cache.incr(metric_key)
+    except ValueError:
+        # Create the metric, another process may have created it meanwhile
+        if not cache.add(metric_key, 1, None):
+            cache.incr(metric_key)
+
+
+def get_notification_cache_metrics():
+    """
+    Get the notification cache metrics.
+
+    Returns:
+        dict: Hits, misses, patches and invalidations counts and the hit rate.
+    """
+    names = ["hits", "misses", "patches", "invalidations"]
+    cached_metrics = cache.get_many([f"notif:metrics:{name}" for name in names])
+    metrics = {name: cached_metrics.get(f"notif:metrics:{name}", 0) for name in names}
+
+    lookups = metrics["hits"] + metrics["misses"]
+    metrics["hit_rate"] = metrics["hits"] / lookups if lookups else 0.0
+
+    return metrics
+
+
+def reset_notification_cache_metrics():
+    """Reset the notification cache metrics"""
+    names = ["hits", "misses", "patches", "invalidations"]
+    cache.delete_many([f"notif:metrics:{name}" for name in names])
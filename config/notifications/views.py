@@ -1,20 +1,36 @@
 """Views for notification"""
 
+import zlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
 from rest_framework import generics
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.exceptions import ValidationError, NotFound
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.urls import replace_query_param
 
-from notifications.models import Notification
+from notifications.inbox import NotificationInbox, parse_inbox_cursor
+from notifications.models import Notification, ArchivedNotification
 from notifications.serializers import (
     UserNotificationListWithCountSerializer,
     NotificationSerializer,
+    ArchivedNotificationSerializer,
 )
-from notifications.paginations import CustomPagination
+from notifications.paginations import CustomPagination, CustomCursorPagination
 from notifications.utils import (
+    get_notification_window,
     get_user_cache_notifications,
     set_user_notifications_in_cache,
 )
 
+NOTIFICATION_PAGINATION_MODE = getattr(settings, "NOTIFICATION_PAGINATION_MODE", "page")
+# "object" caches the page data, "bytes" caches the rendered JSON response
+NOTIFICATION_CACHE_MODE = getattr(settings, "NOTIFICATION_CACHE_MODE", "object")
+NOTIFICATION_CACHE_COMPRESS = getattr(settings, "NOTIFICATION_CACHE_COMPRESS", False)
+
 
 class UserNotificationList(generics.RetrieveUpdateAPIView):
     """Views for user notification list"""
@@ -23,57 +39,172 @@ class UserNotificationList(generics.RetrieveUpdateAPIView):
     serializer_class = UserNotificationListWithCountSerializer
     pagination_class = CustomPagination
 
-    def get_object(self):
-        try:
-            # Get user, query parameters, and page number
-            user = self.request.user
-            query_params = self.request.query_params.get("is_read")
-            page_number = self.request.query_params.get("page", 1)
+    def retrieve(self, request, *args, **kwargs):
+        # Serve JSON responses from rendered bytes when the bytes cache mode is on
+        if NOTIFICATION_CACHE_MODE != "bytes" or not isinstance(
+            request.accepted_renderer, JSONRenderer
+        ):
+            return super().retrieve(request, *args, **kwargs)
+
+        # Try to get the rendered user notifications from the cache
+        cache_kwargs = self.get_cache_kwargs(prefix="bytes")
+        content = get_user_cache_notifications(**cache_kwargs)
+
+        if content is None:
+            try:
+                queryset = self.get_notifications_page(
+                    query_params=cache_kwargs["query_params"]
+                )
+            except ValueError as e:
+                raise ValidationError({"detail": str(e)})
+
+            content = request.accepted_renderer.render(
+                self.get_serializer(queryset).data,
+                renderer_context=self.get_renderer_context(),
+            )
+            if NOTIFICATION_CACHE_COMPRESS:
+                content = zlib.compress(content)
 
-            # Modify query params
-            acceptable_value = {"true": True, "false": False}
-            if query_params:
-                query_params = acceptable_value.get(query_params.lower())
+            # Update the user's cache
+            set_user_notifications_in_cache(queryset=content, **cache_kwargs)
+
+        return self.get_bytes_response(content=content)
 
+    def get_object(self):
+        try:
             # Try to get user notifications from the cache
-            user_cached_notifications = get_user_cache_notifications(
-                user=user, page_number=page_number, query_params=query_params
-            )
+            cache_kwargs = self.get_cache_kwargs()
+            user_cached_notifications = get_user_cache_notifications(**cache_kwargs)
             if user_cached_notifications:
                 return user_cached_notifications
 
             # Retrieve notifications from the database
-            queryset = Notification().get_current_user_notifications(user=user)
-            notifications = queryset["notifications"].all()
+            queryset = self.get_notifications_page(
+                query_params=cache_kwargs["query_params"]
+            )
+
+            # Update the user's cache
+            set_user_notifications_in_cache(queryset=queryset, **cache_kwargs)
+
+            return queryset
 
-            # If valid query params found then filter
-            if isinstance(query_params, bool):
-                notifications = notifications.filter(is_read=query_params)
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})
 
-            # Paginate the notifications list
-            paginator = CustomPagination()
-            paginated_notifications = paginator.paginate_queryset(
-                notifications, self.request
+    def get_cache_kwargs(self, prefix=None):
+        """Get the user, query parameters and page number of the cached page"""
+        query_params = self.request.query_params.get("is_read")
+        page_number = self.get_page_number(paginator=self.get_notification_paginator())
+
+        # Modify query params
+        acceptable_value = {"true": True, "false": False}
+        if query_params:
+            query_params = acceptable_value.get(query_params.lower())
+
+        return {
+            "user": self.request.user,
+            "query_params": query_params,
+            "page_number": f"{prefix}:{page_number}" if prefix else page_number,
+        }
+
+    def get_notifications_page(self, query_params):
+        """Get the counts and the requested page of the user's notifications"""
+        queryset = Notification().get_current_user_notifications(user=self.request.user)
+        notifications = queryset["notifications"].all()
+
+        # If valid query params found then filter
+        if isinstance(query_params, bool):
+            notifications = Notification.filter_by_read_status(
+                notifications, is_read=query_params
             )
 
-            # Add pagination data to the response
-            paginated_response = paginator.get_paginated_response(
-                paginated_notifications
+        # Paginate the notifications list
+        paginator = self.get_notification_paginator()
+
+        # Keyset pages of the merged inbox use the inbox cursors
+        if isinstance(paginator, CustomCursorPagination) and isinstance(
+            notifications, NotificationInbox
+        ):
+            queryset.update(
+                self.get_inbox_cursor_page(inbox=notifications, paginator=paginator)
             )
-            queryset["notifications"] = paginated_response.data["results"]
+            return queryset
 
-            # Update the user's cache
-            set_user_notifications_in_cache(
-                user=user,
-                page_number=page_number,
-                query_params=query_params,
-                queryset=queryset,
+        queryset["notifications"] = paginator.paginate_queryset(
+            notifications, self.request
+        )
+
+        # Cursor pages skip the COUNT query and link to the next/previous page
+        if isinstance(paginator, CustomCursorPagination):
+            queryset["next"] = paginator.get_next_link()
+            queryset["previous"] = paginator.get_previous_link()
+
+        return queryset
+
+    def get_inbox_cursor_page(self, inbox, paginator):
+        """
+        Get a keyset page of the merged inbox and the link to the next page,
+        with the cursors of the websocket ``fetch_page`` command. The inbox
+        is paged forward only, there is no link to the previous page.
+
+        Raises:
+            ValueError: If the cursor is malformed.
+        """
+        cursor = self.request.query_params.get(paginator.cursor_query_param)
+        before = parse_inbox_cursor(cursor) if cursor else None
+        page_size = paginator.get_page_size(self.request)
+
+        notifications, next_cursor = get_notification_window(
+            inbox.get_window(limit=page_size + 1, before=before), size=page_size
+        )
+        next_link = None
+        if next_cursor is not None:
+            next_link = replace_query_param(
+                self.request.build_absolute_uri(),
+                paginator.cursor_query_param,
+                next_cursor,
             )
 
-            return queryset
+        return {"notifications": notifications, "next": next_link, "previous": None}
 
-        except ValueError as e:
-            raise ValidationError({"detail": str(e)})
+    def get_bytes_response(self, content):
+        """Build the response of cached JSON bytes, compressed or not"""
+        # zlib output never starts with "{", the first byte of the JSON object
+        is_compressed = not content.startswith(b"{")
+        accept_encoding = self.request.META.get("HTTP_ACCEPT_ENCODING", "")
+
+        if is_compressed and "deflate" in accept_encoding:
+            # Send the zlib stream as is, it is the "deflate" content coding
+            response = HttpResponse(content, content_type="application/json")
+            response["Content-Encoding"] = "deflate"
+        else:
+            if is_compressed:
+                content = zlib.decompress(content)
+            response = HttpResponse(content, content_type="application/json")
+
+        patch_vary_headers(response, ["Accept-Encoding"])
+        return response
+
+    def get_notification_paginator(self):
+        """Get the paginator, cursor mode is opt-in by settings or ?pagination=cursor"""
+        pagination_mode = self.request.query_params.get(
+            "pagination", NOTIFICATION_PAGINATION_MODE
+        )
+        if pagination_mode == "cursor":
+            return CustomCursorPagination()
+
+        return CustomPagination()
+
+    def get_page_number(self, paginator):
+        """Get the page identifier of the request used as the cache sub-key"""
+        page_size = self.request.query_params.get(paginator.page_size_query_param)
+
+        if isinstance(paginator, CustomCursorPagination):
+            cursor = self.request.query_params.get(paginator.cursor_query_param, "")
+            return f"cursor:{cursor}:{page_size}"
+
+        page_number = self.request.query_params.get(paginator.page_query_param, 1)
+        return f"{page_number}:{page_size}" if page_size else page_number
 
 
 class UserNotificationDetail(generics.RetrieveUpdateAPIView):
@@ -105,3 +236,20 @@ class UserNotificationDetail(generics.RetrieveUpdateAPIView):
 
         except ValueError as e:
             raise ValidationError({"detail": str(e)})
+
+
+class UserArchivedNotificationList(generics.ListAPIView):
+    """Views for user archived notification list"""
+
+    permission_classes = [IsAuthenticated]
+    serializer_class = ArchivedNotificationSerializer
+    pagination_class = CustomPagination
+
+    def get_queryset(self):
+        try:
+            return ArchivedNotification().get_user_archived_notifications(
+                user=self.request.user
+            )
+
+        except ValueError as e:
+            raise ValidationError({"detail": str(e)})